@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: fused single-pass analyze_abstract vs. the legacy three-scan
+analyze_abstract_legacy (and its parts) on realistic abstracts.
+Abstracts come from the saved problem2 outputs, padded with synthetic ones.
+Usage: bench_abstract_analysis.py [repeats]
+"""
+
+import glob
+import json
+import os
+import random
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "problem2"))
+import arxiv_processor as ap  # noqa: E402
+
+VOCAB = ("we propose a novel GPU-based method for self-supervised learning of CNN and RNN "
+         "models on 3D point clouds with state-of-the-art accuracy on ImageNet-1k in 2021 "
+         "the results show that our approach outperforms prior work by 12% it's robust").split()
+
+def load_abstracts(min_count: int = 200) -> list[str]:
+    # Real abstracts from saved outputs, topped up with synthetic ones
+    abstracts = []
+    for path in glob.glob(os.path.join(HERE, "..", "problem2", "output_*", "papers.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            abstracts += [p["abstract"] for p in json.load(f)]
+    rnd = random.Random(0)
+    while len(abstracts) < min_count:
+        sentences = []
+        for _ in range(rnd.randint(4, 10)):
+            words = [rnd.choice(VOCAB) for _ in range(rnd.randint(8, 30))]
+            sentences.append(" ".join(words).capitalize() + rnd.choice([".", ".", "!", "?"]))
+        abstracts.append("\n".join(sentences))
+    return abstracts
+
+def bench(name: str, fn, abstracts: list[str], repeats: int) -> float:
+    # Best-of-repeats microseconds per abstract
+    best = min(timeit.repeat(lambda: [fn(a) for a in abstracts], number=1, repeat=repeats))
+    per = best / len(abstracts) * 1e6
+    print(f"{name:<28} {per:8.1f} us/abstract")
+    return per
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    abstracts = load_abstracts()
+    mismatches = sum(ap.analyze_abstract(a) != ap.analyze_abstract_legacy(a) for a in abstracts)
+    print(f"{len(abstracts)} abstracts, avg {sum(map(len, abstracts)) // len(abstracts)} chars, "
+          f"{mismatches} output mismatches")
+    bench("  legacy word_stats", ap.word_stats, abstracts, repeats)
+    bench("  legacy sentence_stats", ap.sentence_stats, abstracts, repeats)
+    bench("  legacy technical_terms", ap.technical_terms, abstracts, repeats)
+    legacy = bench("legacy analyze_abstract", ap.analyze_abstract_legacy, abstracts, repeats)
+    fused = bench("fused analyze_abstract", ap.analyze_abstract, abstracts, repeats)
+    print(f"speedup: {legacy / fused:.2f}x")
+
+if __name__ == "__main__":
+    main()
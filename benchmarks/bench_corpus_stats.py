@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental CorpusStats (problem3 analyzer) vs. the original
+full-recomputation analyzer, scaling from 10 to 100k documents.
+Similarity is excluded here (it is quadratic in either version); this measures
+word/bigram/trigram counting, unique words and readability.
+Usage: bench_corpus_stats.py [max_docs] [tokens_per_doc]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "analyzer"))
+import analyze as an  # noqa: E402
+
+LEGACY_MAX_DOCS = 10000  # sum(list_of_lists, []) is quadratic; larger runs take hours
+
+def synthetic_docs(n: int, tokens_per_doc: int, vocab_size: int = 50000) -> list[list[str]]:
+    # Zipf-like token streams so counters see realistic skew
+    rnd = random.Random(0)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    return [rnd.choices(vocab, weights, k=tokens_per_doc) for _ in range(n)]
+
+def legacy_stats(docs: list[list[str]]) -> dict:
+    # The original analyzer's aggregation (minus similarity)
+    counter = Counter(); [counter.update(t) for t in docs]
+    top100 = counter.most_common(100)
+    big = Counter(); tri = Counter()
+    for t in docs:
+        big.update(an.ngrams(t, 2)); tri.update(an.ngrams(t, 3))
+    uniq = len(set(sum(docs, [])))
+    uniq_again = len(set(sum(docs, [])))  # readability() recomputed it
+    return {"top": top100, "b": big.most_common(50), "t": tri.most_common(50), "u": uniq + uniq_again}
+
+def incremental_stats(docs: list[list[str]], names: list[str]) -> an.CorpusStats:
+    state = an.CorpusStats()
+    for name, toks in zip(names, docs):
+        state.add(name, toks, 10)
+    state.top(state.words, 100, 1)
+    state.top(state.bigrams, 50, 2)
+    state.top(state.trigrams, 50, 3)
+    state.readability()
+    return state
+
+def main():
+    max_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per_doc = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    all_docs = synthetic_docs(max_docs, per_doc)
+    all_names = [f"page_{i}.json" for i in range(max_docs)]
+    print(f"{'docs':>8} {'legacy_s':>10} {'incremental_s':>14} {'add_10_more_s':>14}")
+    n = 10
+    while n <= max_docs:
+        docs, names = all_docs[:n], all_names[:n]
+        legacy = "skipped"
+        if n <= LEGACY_MAX_DOCS:
+            t0 = time.perf_counter(); legacy_stats(docs); legacy = f"{time.perf_counter() - t0:.3f}"
+        t0 = time.perf_counter(); state = incremental_stats(docs, names); inc = time.perf_counter() - t0
+        # Marginal cost: fold 10 new documents into the existing state
+        extra = synthetic_docs(10, per_doc)
+        t0 = time.perf_counter()
+        for i, toks in enumerate(extra):
+            state.add(f"extra_{i}.json", toks, 10)
+        add10 = time.perf_counter() - t0
+        print(f"{n:>8} {legacy:>10} {inc:>14.3f} {add10:>14.4f}")
+        n *= 10
+
+if __name__ == "__main__":
+    main()
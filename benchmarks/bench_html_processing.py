@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: problem3 processor HTML extraction. Compares the original
+strip_html + count_stats regex passes with the processor's extract +
+text_stats, checks both give identical results (exits 1 if not), and
+times the processor's version on a process pool.
+Pages come from a directory of saved .html files; without one, large
+synthetic pages are generated. Hand-written edge cases (escaped markup,
+'>' in attributes, overlapping script/style blocks) are always checked.
+Usage: bench_html_processing.py [pages_dir] [workers]
+"""
+
+import glob
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "processor"))
+import process as pr  # noqa: E402
+
+# The processor's original implementation, kept as the reference
+def strip_html(html):
+    html = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.S | re.I)
+    html = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.S | re.I)
+    links = re.findall(r'href=[\'"]?([^\'" >]+)', html, flags=re.I)
+    images = re.findall(r'src=[\'"]?([^\'" >]+)', html, flags=re.I)
+    text = re.sub(r"<[^>]+>", " ", html)
+    text = unescape(text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text, links, images
+
+def count_stats(text):
+    words = re.findall(r"[A-Za-z]+(?:'[A-Za-z]+)?", text.lower())
+    sentences = re.split(r"[.!?]+", text)
+    paras = [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+    wc = len(words); sc = len([s for s in sentences if s.strip()]); pc = max(len(paras), 1)
+    avg = (sum(len(w) for w in words) / wc) if wc else 0.0
+    return {"word_count": wc, "sentence_count": sc, "paragraph_count": pc, "avg_word_length": round(avg, 4)}
+
+EDGE_CASES = [
+    "<pre>&lt;a href=&quot;x&quot;&gt;link&lt;/a&gt; and src=y.png</pre>",
+    '<a onclick="if(a>b)go()" href="x">t</a>',
+    '<img href=src=x alt=1><img HREF=src=Y>',
+    "<style>a{}<script>x</style>mid</script>after",
+    "<script>a</script><style>b<script>c</style>d</script>e",
+    "<SCRIPT>x</script><Style>y</STYLE> <A HREF=Z SRC='q'>\u017fRC=k</A>",
+    'a<b c="d>e" href=f>g <!-- <a href="c"> -->',
+    "Mr. Smith!! went... home?\n\n  New para\u00a0\u2003text \u0130stanbul don't",
+    "<p>unterminated <a href='x",
+    "",
+]
+
+def synthetic_page(seed: int, size: int = 400_000) -> str:
+    # Text, links, images, inline scripts and entities in roughly web-page proportions
+    rnd = random.Random(seed)
+    words = "the quick brown fox jumps over lazy dog it's data &amp; more &lt;tags&gt; e.g. Mr. Smith".split()
+    out = ["<html><head><style>body{color:red}</style><script>var a='<p>x</p>';</script></head><body>"]
+    n = 0
+    while n < size:
+        k = rnd.random()
+        if k < 0.1:
+            s = f'<a href="https://example.com/{rnd.randint(0, 10**6)}" class="l">{rnd.choice(words)}</a>'
+        elif k < 0.13:
+            s = f"<img src='/img/{rnd.randint(0, 999)}.png' alt=\"x\">"
+        elif k < 0.15:
+            s = f"<script>if(a<b){{x='{rnd.random()}'}}</script>"
+        elif k < 0.3:
+            s = "<p>" + " ".join(rnd.choices(words, k=20)) + ".</p>\n"
+        else:
+            s = " ".join(rnd.choices(words, k=8)) + rnd.choice([". ", "! ", "? ", ", ", "\n\n"])
+        out.append(s)
+        n += len(s)
+    out.append("</body></html>")
+    return "".join(out)
+
+def load_pages(pages_dir: str | None) -> list[str]:
+    if pages_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            with open(path, errors="ignore") as f:
+                pages.append(f.read())
+        return pages
+    return [synthetic_page(i) for i in range(32)]
+
+def legacy(html: str) -> tuple:
+    text, links, images = strip_html(html)
+    return text, links, images, count_stats(text)
+
+def processor(html: str) -> tuple:
+    text, links, images = pr.extract(html)
+    return text, links, images, pr.text_stats(text)
+
+def main():
+    pages_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else len(os.sched_getaffinity(0))
+    pages = load_pages(pages_dir)
+    mb = sum(len(p) for p in pages) / 1e6
+    print(f"{len(pages)} pages, {mb:.1f} MB")
+
+    bad = [p for p in EDGE_CASES if legacy(p) != processor(p)]
+    for p in bad:
+        print(f"MISMATCH {p!r}:\n  legacy    {legacy(p)}\n  processor {processor(p)}")
+
+    t0 = time.perf_counter(); old = [legacy(p) for p in pages]; old_s = time.perf_counter() - t0
+    t0 = time.perf_counter(); new = [processor(p) for p in pages]; new_s = time.perf_counter() - t0
+    print(f"identical output: {old == new} ({len(EDGE_CASES) - len(bad)}/{len(EDGE_CASES)} edge cases)")
+    print(f"legacy      serial   {old_s:7.3f}s  {mb / old_s:7.1f} MB/s")
+    print(f"processor   serial   {new_s:7.3f}s  {mb / new_s:7.1f} MB/s")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(processor, pages, chunksize=max(1, len(pages) // (workers * 4))))
+        pool_s = time.perf_counter() - t0
+    print(f"processor   {workers:>2} procs {pool_s:7.3f}s  {mb / pool_s:7.1f} MB/s")
+    if bad or old != new:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: problem3 processor -> analyzer handoff as per-page JSON versus the
+compact token format (PROCESSED_FORMAT=tokens). Writes the same synthetic
+pages both ways into a temp directory, then compares bytes on disk and the
+analyzer-side cost of turning every page back into its token list.
+Usage: bench_intermediate_format.py [pages] [words_per_page]
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3")
+sys.path.insert(0, os.path.join(ROOT, "processor"))
+sys.path.insert(0, os.path.join(ROOT, "analyzer"))
+import analyze as an  # noqa: E402
+import process as pr  # noqa: E402
+
+def synthetic_texts(n: int, words: int, vocab_size: int = 30000) -> list[str]:
+    rnd = random.Random(0)
+    # Letter-only words of English-like lengths, so the tokenizer keeps all of them
+    vocab = ["".join(rnd.choices("abcdefghijklmnopqrstuvwxyz", k=rnd.randint(3, 12))) for _ in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    return [" ".join(rnd.choices(vocab, weights, k=words)) + "." for _ in range(n)]
+
+def write_json(texts: list[str], out_dir: str) -> int:
+    size = 0
+    for i, text in enumerate(texts):
+        stats = pr.text_stats(text)
+        out = {"source_file": f"page_{i}.html", "text": text, "statistics": stats, "links": [], "images": [],
+               "processed_at": "2026-01-01T00:00:00+00:00"}
+        path = os.path.join(out_dir, f"page_{i}.json")
+        pr.write_atomic(path, json.dumps(out, indent=2))
+        size += os.path.getsize(path)
+    return size
+
+def write_tokens(texts: list[str], path: str) -> int:
+    writer = pr.TokenWriter(path)
+    for i, text in enumerate(texts):
+        local = {}
+        ids = array("I", [local.setdefault(w, len(local)) for w in pr.tokenize(text)])
+        writer.add(f"page_{i}.json", list(local), ids, pr.text_stats(text)["sentence_count"],
+                   hashlib.sha256(text.encode()).digest())
+    writer.close()
+    return os.path.getsize(path)
+
+def load_json(out_dir: str, n: int) -> int:
+    # What the analyzer does per JSON page: parse, tokenize, hash the text
+    total = 0
+    for i in range(n):
+        with open(os.path.join(out_dir, f"page_{i}.json")) as f:
+            text = json.load(f)["text"]
+        total += len(an.tokenize(text))
+        hashlib.sha256(text.encode()).hexdigest()
+    return total
+
+def load_tokens(path: str, n: int) -> int:
+    store = an.TokenStore(path)
+    return sum(len(store.load(f"page_{i}.json")[0]) for i in range(n) if f"page_{i}.json" in store)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    texts = synthetic_texts(n, words)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_bytes = write_json(texts, tmp)
+        tok_path = os.path.join(tmp, "corpus.tok")
+        tok_bytes = write_tokens(texts, tok_path)
+        t0 = time.perf_counter(); a = load_json(tmp, n); json_s = time.perf_counter() - t0
+        t0 = time.perf_counter(); b = load_tokens(tok_path, n); tok_s = time.perf_counter() - t0
+    print(f"{n} pages x {words} words, same tokens: {a == b}")
+    print(f"json    {json_bytes / 1e6:8.1f} MB on disk  load {json_s:7.3f}s")
+    print(f"tokens  {tok_bytes / 1e6:8.1f} MB on disk  load {tok_s:7.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: problem3 analyzer n-gram counting. Compares the original analyzer
+(Counter.update(ngrams(toks, n)) over joined-string keys, then most_common),
+the packed integer-id counting in CorpusStats with its report-time top_terms(),
+and the bounded Space-Saving tables (NGRAM_CAPACITY). For the bounded tables it
+checks the top-50 bigrams/trigrams against exact counts: recall, the largest
+count error, and whether every error stays within the reported bound (exits 1
+if not). tests/test_ngram_bounds.py asserts the full guarantees, merge included.
+Usage: bench_ngram_counting.py [docs] [tokens_per_doc]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "analyzer"))
+import analyze as an  # noqa: E402
+
+def synthetic_docs(n: int, tokens_per_doc: int, vocab_size: int = 20000) -> list[list[str]]:
+    rnd = random.Random(0)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    return [rnd.choices(vocab, weights, k=tokens_per_doc) for _ in range(n)]
+
+def measure(fn, repeat: int = 3):
+    # Best of untraced runs, since tracemalloc slows allocation-heavy code unevenly; then one traced run for the peak
+    elapsed = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = min(elapsed, time.perf_counter() - t0)
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+def string_counts(docs: list[list[str]]) -> tuple[Counter, Counter]:
+    # The original analyzer: joined-string keys, ties left to most_common() over name-ordered docs
+    big, tri = Counter(), Counter()
+    for toks in docs:
+        big.update(an.ngrams(toks, 2))
+        tri.update(an.ngrams(toks, 3))
+    big.most_common(50), tri.most_common(50)
+    return big, tri
+
+def packed_counts(docs: list[list[str]], capacity: int) -> an.CorpusStats:
+    # The n-gram tables and the id arrays top_terms() rescans, so the comparison with
+    # string_counts() is like for like
+    state = an.CorpusStats(capacity=capacity)
+    for i, toks in enumerate(docs):
+        ids = state._ids(toks)
+        state._count(state.bigrams, an.pack_ngrams(ids, 2), state.floor_b)
+        state._count(state.trigrams, an.pack_ngrams(ids, 3), state.floor_t)
+        state.floor_b = state._prune(state.bigrams, state.floor_b)
+        state.floor_t = state._prune(state.trigrams, state.floor_t)
+        state.docs[f"page_{i:06d}.json"] = {"ids": an.array("I", ids)}
+    return state
+
+def top_ngrams(state: an.CorpusStats) -> tuple[an.CorpusStats, list, list]:
+    return state, state.top_terms(state.bigrams, 50, 2), state.top_terms(state.trigrams, 50, 3)
+
+def accuracy(exact: Counter, approx: list[tuple[str, int]], bound: int) -> tuple[float, int, bool]:
+    truth = {g for g, _ in exact.most_common(len(approx))}
+    recall = len(truth & {g for g, _ in approx}) / len(truth) if truth else 1.0
+    errors = [c - exact[g] for g, c in approx]
+    return recall, max(errors, default=0), all(0 <= e <= bound for e in errors)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    per_doc = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    docs = synthetic_docs(n, per_doc)
+    (big, tri), s_time, s_mb = measure(lambda: string_counts(docs))
+    print(f"{n} docs x {per_doc} tokens: {len(big)} distinct bigrams, {len(tri)} distinct trigrams")
+    print(f"{'mode':>22} {'time_s':>8} {'peak_mb':>8} {'bi_recall':>9} {'bi_err':>6} {'tri_recall':>10} {'tri_err':>7} {'in_bound':>8}")
+    print(f"{'strings':>22} {s_time:8.2f} {s_mb:8.1f}")
+    ok = True
+    for capacity in (0, 100000, 20000, 5000):
+        (state, top_b, top_t), t, mb = measure(lambda: top_ngrams(packed_counts(docs, capacity)))
+        rb, eb, okb = accuracy(big, top_b, state.floor_b)
+        rt, et, okt = accuracy(tri, top_t, state.floor_t)
+        label = "packed ids exact" if not capacity else f"space-saving {capacity}"
+        print(f"{label:>22} {t:8.2f} {mb:8.1f} {rb:9.2f} {eb:6d} {rt:10.2f} {et:7d} {str(okb and okt):>8}")
+        ok = ok and okb and okt
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: problem2 PaperStore (PAPER_STORE / --search) at scale. Ingests
+synthetic papers in the processor's batch size, then times re-upserts
+(unchanged and changed papers) and lookups by author, category, term,
+date range and facets, against a linear scan of the same papers as JSON
+lines. Stats are real analyze_abstract output, computed for a pool of
+abstracts and reused, so store size is realistic without hours of analysis.
+Usage: bench_paper_store.py [papers] [store_path]
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem2"))
+import arxiv_processor as ap  # noqa: E402
+
+STATS_POOL = 4096
+QUERIES = 50
+
+def zipf_picker(items: list, rnd: random.Random):
+    cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(items))))
+    return lambda k=1: rnd.choices(items, cum_weights=cum, k=k)
+
+def synthetic_papers(n: int, seed: int = 0):
+    # Zipf-distributed authors, categories and abstract words; dates spread over 2000-2024
+    rnd = random.Random(seed)
+    author = zipf_picker([f"Author {i}" for i in range(200000)], rnd)
+    category = zipf_picker([f"{a}.{b}" for a in ("cs", "math", "stat", "physics", "q-bio")
+                            for b in ("LG", "AI", "CV", "CL", "ST", "NA", "OC", "IT")], rnd)
+    word = zipf_picker([f"w{i}" for i in range(30000)], rnd)
+    for i in range(n):
+        day = rnd.randrange(25 * 365)
+        published = f"{2000 + day // 365}-{day % 365 // 31 % 12 + 1:02d}-{day % 28 + 1:02d}T00:00:00Z"
+        yield {"arxiv_id": f"{i // 100000:04d}.{i % 100000:05d}v1", "title": " ".join(word(8)),
+               "authors": sorted(set(author(rnd.randint(1, 5)))), "abstract": " ".join(word(rnd.randint(100, 180))) + ".",
+               "categories": sorted(set(category(2))), "published": published, "updated": published}
+
+def timed_queries(fn, params: list[dict]) -> dict:
+    times = []
+    for p in params:
+        t = time.perf_counter()
+        fn(**p)
+        times.append((time.perf_counter() - t) * 1000)
+    times.sort()
+    return {"p50_ms": round(times[len(times) // 2], 2), "p95_ms": round(times[int(len(times) * 0.95)], 2),
+            "max_ms": round(times[-1], 2)}
+
+def linear_scan(path: str, author=None, category=None, term=None, since=None, until=None) -> int:
+    # The offline alternative without a store: read every paper and filter
+    words = term.split() if term else []
+    n = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            p = json.loads(line)
+            text = (p["title"] + " " + p["abstract"]).split()
+            if ((not author or author in p["authors"]) and (not category or category in p["categories"])
+                    and (not since or p["published"] >= since) and all(w in text for w in words)):
+                n += 1
+    return n
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tmp = tempfile.TemporaryDirectory()
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tmp.name, "papers.db")
+    jsonl = os.path.join(tmp.name, "papers.jsonl")
+    pool = [ap.analyze_abstract(p["abstract"]) for p in synthetic_papers(STATS_POOL, seed=1)]
+
+    store = ap.PaperStore(path)
+    t0 = time.perf_counter()
+    with open(jsonl, "w", encoding="utf-8") as out:
+        papers = synthetic_papers(n)
+        i = 0
+        while batch := list(itertools.islice(papers, ap.ANALYSIS_BATCH)):
+            store.upsert_many(batch, [{"arxiv_id": p["arxiv_id"], **pool[(i + k) % STATS_POOL]}
+                                      for k, p in enumerate(batch)])
+            out.writelines(json.dumps(p) + "\n" for p in batch)
+            i += len(batch)
+            if i % 100_000 < ap.ANALYSIS_BATCH:
+                print(f"  {i} papers, {i / (time.perf_counter() - t0):.0f}/s", flush=True)
+    ingest_s = time.perf_counter() - t0
+    store.close()
+    size = sum(os.path.getsize(path + s) for s in ("", "-wal") if os.path.exists(path + s))
+    print(f"ingest: {n} papers in {ingest_s:.1f}s ({n / ingest_s:.0f}/s), store {size / 2**20:.0f} MB, "
+          f"jsonl {os.path.getsize(jsonl) / 2**20:.0f} MB")
+
+    store = ap.PaperStore(path)
+    sample = list(synthetic_papers(min(n, 20000)))
+    rnd = random.Random(2)
+    picks = rnd.sample(sample, min(len(sample), ap.ANALYSIS_BATCH))
+    t = time.perf_counter()
+    store.upsert_many(picks, [None] * len(picks))
+    print(f"re-upsert {len(picks)} unchanged: {(time.perf_counter() - t) * 1000:.1f} ms")
+    changed = [{**p, "title": p["title"] + " revised", "updated": "2025-01-01T00:00:00Z"} for p in picks]
+    t = time.perf_counter()
+    store.upsert_many(changed, [None] * len(changed))
+    print(f"re-upsert {len(changed)} changed:   {(time.perf_counter() - t) * 1000:.1f} ms")
+
+    def params(k: int) -> dict:
+        p = rnd.choice(sample)
+        words = p["abstract"].rstrip(".").split()
+        return [{"author": p["authors"][0]},
+                {"category": p["categories"][0], "term": rnd.choice(words)},
+                {"term": " ".join(rnd.sample(words, 2))},
+                {"author": p["authors"][0], "category": p["categories"][0], "since": p["published"][:4]},
+                {"category": p["categories"][0], "since": p["published"][:7]}][k]
+    names = ["author", "category+term", "two terms", "author+category+since", "category+since"]
+    print(f"{'query':>24} {'search p50':>10} {'p95':>8} {'max':>8} {'facets p50':>10} {'p95':>8} {'linear scan':>11}")
+    for k, name in enumerate(names):
+        qs = [params(k) for _ in range(QUERIES)]
+        s = timed_queries(store.search, qs)
+        f = timed_queries(store.facets, qs)
+        t = time.perf_counter()
+        linear_scan(jsonl, **qs[0])
+        scan_ms = (time.perf_counter() - t) * 1000
+        print(f"{name:>24} {s['p50_ms']:10.2f} {s['p95_ms']:8.2f} {s['max_ms']:8.2f} "
+              f"{f['p50_ms']:10.2f} {f['p95_ms']:8.2f} {scan_ms:11.0f}")
+    store.close()
+    tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
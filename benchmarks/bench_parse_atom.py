@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming parse_atom/iter_atom vs. the original ET.fromstring parser
+on a large synthetic Atom feed. Reports total time, time to first paper and
+peak traced memory. Usage: bench_parse_atom.py [num_entries]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem2"))
+import arxiv_processor as ap  # noqa: E402
+
+def synthetic_feed(n: int) -> bytes:
+    # Build an Atom feed with n realistic-looking entries
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<feed xmlns="http://www.w3.org/2005/Atom">'
+             f"<title>synthetic</title><totalResults>{n}</totalResults>"]
+    abstract = ("We propose a novel GPU-based method for training CNN and RNN models on 3D data. "
+                "Results show state-of-the-art accuracy on ImageNet in 2020! ") * 6
+    for i in range(n):
+        parts.append(
+            f"<entry><id>http://arxiv.org/abs/2001.{i:05d}v1</id>"
+            "<updated>2020-01-01T00:00:00Z</updated><published>2020-01-01T00:00:00Z</published>"
+            f"<title>Paper {i}</title><summary>{abstract}</summary>"
+            f"<author><name>Author {i % 97}</name></author><author><name>Coauthor {i % 13}</name></author>"
+            '<category term="cs.LG"/><category term="stat.ML"/></entry>')
+    parts.append("</feed>")
+    return "".join(parts).encode("utf-8")
+
+def legacy_parse(xml_bytes: bytes):
+    # The original approach: build the whole tree, then walk it
+    root = ET.fromstring(xml_bytes)
+    for entry in root.findall("atom:entry", ap.ATOM_NS):
+        try:
+            yield ap.entry_to_paper(entry)
+        except ValueError:
+            pass
+
+def measure(name: str, make_iter) -> dict:
+    # Run one parser to completion under tracemalloc
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    first = None
+    count = 0
+    for _ in make_iter():
+        if first is None:
+            first = time.perf_counter() - t0
+        count += 1
+    total = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"parser": name, "papers": count, "total_s": round(total, 3),
+            "first_result_s": round(first or 0.0, 4), "peak_mb": round(peak / 2**20, 1)}
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    feed = synthetic_feed(n)
+    log = ap.Logger(os.path.join(tempfile.mkdtemp(), "bench.log"))
+    print(f"feed: {n} entries, {len(feed) / 2**20:.1f} MB")
+    for row in (measure("legacy ET.fromstring", lambda: legacy_parse(feed)),
+                measure("streaming iter_atom", lambda: ap.iter_atom(feed, log))):
+        print(row)
+    log.close()
+
+if __name__ == "__main__":
+    main()
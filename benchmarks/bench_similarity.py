@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: exact all-pairs Jaccard vs. MinHash + LSH banding in the problem3
+analyzer. The corpus is random documents plus mutated near-duplicates, so
+some pairs are genuinely similar. Reports runtime, the recall of pairs at or
+above the threshold, and the mean absolute error of the MinHash estimate
+against exact Jaccard. tests/test_minhash.py asserts the error bound and the
+recall above the threshold with the default bins and bands.
+Usage: bench_similarity.py [docs] [threshold] [bins] [bands]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "analyzer"))
+import analyze as an  # noqa: E402
+
+def synthetic_state(n: int, tokens_per_doc: int = 150, vocab_size: int = 20000) -> an.CorpusStats:
+    # A third of the documents are edits of an earlier one (10-60% of tokens replaced)
+    rnd = random.Random(0)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    docs = []
+    for i in range(n):
+        if docs and i % 3 == 0:
+            toks = list(rnd.choice(docs))
+            for k in rnd.sample(range(len(toks)), int(len(toks) * rnd.uniform(0.1, 0.6))):
+                toks[k] = rnd.choice(vocab)
+        else:
+            toks = rnd.choices(vocab, k=tokens_per_doc)
+        docs.append(toks)
+    state = an.CorpusStats()
+    for i, toks in enumerate(docs):
+        state.add(f"page_{i}.json", toks, 10)
+    return state
+
+def pair_key(p: dict) -> tuple:
+    return p["doc1"], p["doc2"]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    bins = int(sys.argv[3]) if len(sys.argv) > 3 else 128
+    bands = int(sys.argv[4]) if len(sys.argv) > 4 else 32
+    state = synthetic_state(n)
+
+    t0 = time.perf_counter()
+    exact = state.similarity(mode="exact", top_k=0, min_sim=threshold)
+    exact_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    approx = state.similarity(mode="minhash", top_k=0, min_sim=threshold, bins=bins, bands=bands, exact=True)
+    approx_s = time.perf_counter() - t0
+    estimated = state.similarity(mode="minhash", top_k=0, min_sim=0, bins=bins, bands=bands, exact=False)
+
+    truth = {pair_key(p): p["similarity"] for p in state.similarity(mode="exact", top_k=0, min_sim=1e-9)}
+    found = {pair_key(p) for p in approx}
+    recall = len(found & {pair_key(p) for p in exact}) / len(exact) if exact else 1.0
+    errors = [abs(p["similarity"] - truth.get(pair_key(p), 0.0)) for p in estimated]
+    mae = sum(errors) / len(errors) if errors else 0.0
+
+    print(f"docs={n} threshold={threshold} bins={bins} bands={bands}")
+    print(f"exact:   {exact_s:8.3f}s  pairs>=threshold={len(exact)}")
+    print(f"minhash: {approx_s:8.3f}s  pairs>=threshold={len(approx)}  recall={recall:.4f}")
+    print(f"estimate mean abs error over {len(estimated)} candidate pairs: {mae:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite. Starts a local stand-in server that serves synthetic
+HTML pages (configurable latency, size, status code and charset) and a canned
+arXiv Atom API, then runs problem1's fetcher, problem2's arXiv processor and
+the problem3 pipeline against it at one or more scales. Each run records wall
+clock, throughput, peak RSS (from wait4, so older versions without METRICS
+still report it) and the tool's own metrics.json stages, and everything goes
+to one JSON file. Run the same suite on two checkouts (--repo) and pass the
+older result as --baseline to print the differences.
+
+problem3 writes to the hard-coded /shared tree, so it only runs when asked for
+with --tools and when /shared is writable; its pipeline directories are wiped
+first.
+
+Usage: bench_suite.py [--tools problem1,problem2] [--items 10,1000] [--latency-ms 5]
+                      [--out bench_results.json] [--baseline old.json] [--env KEY=VALUE ...]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from xml.sax.saxutils import escape
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHARED = "/shared"
+SHARED_DIRS = ("input", "raw", "processed", "queue", "status", "analysis")
+
+# Paragraphs pages are assembled from; the accented words exercise charset decoding
+WORDS = ("the of and to in a is that for it as was with be by on not he this are or his from at which "
+         "data model network learning results method paper system approach performance training "
+         "café naïve résumé Grüße façade").split()
+
+def paragraph(rnd: random.Random) -> str:
+    words = rnd.choices(WORDS, k=rnd.randint(20, 80))
+    return "<p>" + " ".join(words).capitalize() + ". " + " ".join(rnd.choices(WORDS, k=12)) + "!</p>\n"
+
+PARAGRAPHS = [paragraph(random.Random(i)) for i in range(256)]
+
+def html_page(i: int, size: int) -> str:
+    # Deterministic page of roughly size characters with links, images and a script
+    rnd = random.Random(i)
+    parts = [f"<html><head><title>Page {i}</title><script>var n={i};</script></head><body>\n"]
+    n = len(parts[0])
+    while n < size:
+        k = rnd.random()
+        if k < 0.1:
+            s = f'<a href="/page/{rnd.randrange(10**6)}">link {rnd.randrange(100)}</a>\n'
+        elif k < 0.13:
+            s = f'<img src="/img/{rnd.randrange(1000)}.png" alt="">\n'
+        else:
+            s = PARAGRAPHS[rnd.randrange(len(PARAGRAPHS))]
+        parts.append(s)
+        n += len(s)
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+def atom_feed(query: str, start: int, count: int, total: int) -> bytes:
+    # One page of an arXiv API response, entries numbered from start
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+             f"<title>ArXiv Query: {escape(query)}</title>"
+             f"<opensearch:totalResults>{total}</opensearch:totalResults>"
+             f"<opensearch:startIndex>{start}</opensearch:startIndex>"]
+    for i in range(start, min(start + count, total)):
+        rnd = random.Random(i)
+        abstract = " ".join(rnd.choices(WORDS, k=rnd.randint(80, 200))) + ". We use GPU and CNN models in 2020."
+        parts.append(
+            f"<entry><id>http://arxiv.org/abs/{2000 + i // 100000}.{i % 100000:05d}v1</id>"
+            "<updated>2020-01-02T00:00:00Z</updated><published>2020-01-01T00:00:00Z</published>"
+            f"<title>{escape(' '.join(rnd.choices(WORDS, k=8)).title())}</title>"
+            f"<summary>{escape(abstract)}</summary>"
+            f"<author><name>Author {i % 997}</name></author><author><name>Coauthor {i % 131}</name></author>"
+            '<category term="cs.LG"/><category term="stat.ML"/></entry>')
+    parts.append("</feed>\n")
+    return "".join(parts).encode("utf-8")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # /page/<i>?size=&delay=&status=&charset= and /api/query; every knob is in the URL,
+    # so a URL list fully describes a workload. fail=N answers the first N requests for a
+    # URL with fail_status (default 503), plus a Retry-After header when retry_after is given.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, delayed ACKs add ~40 ms to each response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        q = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if "fail" in q:
+            with self.server.lock:
+                seen = self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            if seen <= int(q["fail"]):
+                retry = {"Retry-After": q["retry_after"]} if "retry_after" in q else {}
+                return self.reply(int(q.get("fail_status", 503)), "text/plain", b"try again", retry)
+        if parts.path == "/api/query":
+            time.sleep(self.server.feed_delay)
+            start, count = int(q.get("start", 0)), int(q.get("max_results", 10))
+            body = atom_feed(q.get("search_query", ""), start, count, self.server.feed_total)
+            return self.reply(200, "application/atom+xml; charset=utf-8", body)
+        if not parts.path.startswith("/page/"):
+            return self.reply(404, "text/plain", b"not found")
+        time.sleep(float(q.get("delay", 0)) / 1000)
+        i = int(parts.path.rsplit("/", 1)[1])
+        status = int(q.get("status", 200))
+        if status in (301, 302, 307, 308):
+            q.pop("status")
+            return self.reply(status, "text/plain", b"", {"Location": f"/page/{i}?{urlencode(q)}"})
+        if status != 200:
+            return self.reply(status, "text/plain", f"error {status}".encode())
+        charset = q.get("charset", "utf-8")
+        body = html_page(i, int(q.get("size", 10000))).encode(charset, errors="xmlcharrefreplace")
+        self.reply(200, f"text/html; charset={charset}", body)
+
+    def reply(self, status: int, ctype: str, body: bytes, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, feed_total: int, feed_delay_ms: float):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.feed_total = feed_total
+        self.feed_delay = feed_delay_ms / 1000
+        self.hits: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+def make_urls(base: str, n: int, args) -> list[str]:
+    # Log-normal sizes around --size-kb, uniform jitter, a share of errors and redirects
+    rnd = random.Random(args.seed)
+    charsets = args.charsets.split(",")
+    urls = []
+    for i in range(n):
+        q = {"size": int(rnd.lognormvariate(0, 0.5) * args.size_kb * 1024),
+             "delay": round(args.latency_ms + rnd.uniform(0, args.jitter_ms), 1),
+             "charset": charsets[i % len(charsets)]}
+        k = rnd.random()
+        if k < args.error_rate:
+            q["status"] = rnd.choice((404, 500, 503))
+        elif k < args.error_rate + args.redirect_rate:
+            q["status"] = 301
+        urls.append(f"{base}/page/{i}?{urlencode(q)}")
+    return urls
+
+def run_process(cmd: list[str], env: dict, log_path: str) -> tuple[int, float, float]:
+    # (exit code, wall seconds, peak RSS in MB) for one child process
+    t0 = time.perf_counter()
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, time.perf_counter() - t0, usage.ru_maxrss / 1024
+
+def read_json(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def stage_summary(metrics: dict | None, prefix: str = "") -> dict:
+    # Keep the comparable parts of a tool's metrics.json stages
+    keep = ("count", "p50_ms", "p95_ms", "p99_ms", "items_per_sec", "bytes_per_sec")
+    stages = (metrics or {}).get("stages", {})
+    return {prefix + name: {k: s[k] for k in keep if k in s} for name, s in stages.items()}
+
+def result(tool: str, items: int, code: int, wall: float, rss: float, stages: dict, **extra) -> dict:
+    return {"tool": tool, "items": items, "exit_code": code, "wall_seconds": round(wall, 3),
+            "items_per_second": round(items / wall, 1) if wall else 0.0, "peak_rss_mb": round(rss, 1),
+            "stages": stages, **extra}
+
+def bench_problem1(repo: str, server: StandInServer, n: int, env: dict, work: str, args) -> dict:
+    urls_path = os.path.join(work, "urls.txt")
+    with open(urls_path, "w") as f:
+        f.write("\n".join(make_urls(server.base, n, args)) + "\n")
+    out = os.path.join(work, "out")
+    code, wall, rss = run_process([sys.executable, os.path.join(repo, "problem1", "fetch_and_process.py"),
+                                   urls_path, out], env, os.path.join(work, "run.log"))
+    summary = read_json(os.path.join(out, "summary.json")) or {}
+    return result("problem1", n, code, wall, rss, stage_summary(read_json(os.path.join(out, "metrics.json"))),
+                  successful=summary.get("successful_requests"), bytes=summary.get("total_bytes_downloaded"))
+
+def bench_problem2(repo: str, server: StandInServer, n: int, env: dict, work: str, args) -> dict:
+    server.feed_total = n
+    env = {"ARXIV_ENDPOINT": f"{server.base}/api/query", "ARXIV_MIN_INTERVAL": str(args.arxiv_interval), **env}
+    out = os.path.join(work, "out")
+    code, wall, rss = run_process([sys.executable, os.path.join(repo, "problem2", "arxiv_processor.py"),
+                                   "cat:cs.LG", str(n), out], env, os.path.join(work, "run.log"))
+    stats = read_json(os.path.join(out, "stats.json")) or {}
+    return result("problem2", n, code, wall, rss, stage_summary(read_json(os.path.join(out, "metrics.json"))),
+                  papers=stats.get("total_papers"))
+
+def bench_problem3(repo: str, server: StandInServer, n: int, env: dict, work: str, args) -> dict:
+    for d in SHARED_DIRS:
+        shutil.rmtree(os.path.join(SHARED, d), ignore_errors=True)
+    os.makedirs(os.path.join(SHARED, "input"))
+    with open(os.path.join(SHARED, "input", "urls.txt"), "w") as f:
+        f.write("\n".join(make_urls(server.base, n, args)) + "\n")
+    runs = {}
+    def stage(name: str, script: str):
+        runs[name] = run_process([sys.executable, os.path.join(repo, "problem3", name, script)],
+                                 env, os.path.join(work, f"{name}.log"))
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=stage, args=a) for a in
+               (("fetcher", "fetch.py"), ("processor", "process.py"), ("analyzer", "analyze.py"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    status = os.path.join(SHARED, "status")
+    stages = {}
+    for name, prefix in (("fetcher", "fetch"), ("processor", "process"), ("analyzer", "analyze")):
+        stages.update(stage_summary(read_json(os.path.join(status, f"{prefix}_metrics.json")), prefix + "."))
+    report = read_json(os.path.join(SHARED, "analysis", "final_report.json")) or {}
+    return result("problem3", n, max((r[0] for r in runs.values()), key=abs), wall,
+                  max(r[2] for r in runs.values()), stages,
+                  stage_wall_seconds={k: round(r[1], 3) for k, r in runs.items()},
+                  documents=report.get("documents_processed"))
+
+def shared_writable() -> bool:
+    try:
+        os.makedirs(SHARED, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(SHARED, os.W_OK)
+
+BENCHES = {"problem1": bench_problem1, "problem2": bench_problem2, "problem3": bench_problem3}
+
+def git_revision(repo: str) -> str | None:
+    try:
+        out = subprocess.run(["git", "-C", repo, "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        dirty = subprocess.run(["git", "-C", repo, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except OSError:
+        return None
+
+def compare(current: dict, baseline: dict):
+    # Print throughput, memory and per-stage p95 changes for runs present in both files
+    def pct(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+    old_runs = {(r["tool"], r["items"]): r for r in baseline["results"]}
+    print(f"\nvs baseline {baseline.get('revision')} ({baseline.get('created')})")
+    for r in current["results"]:
+        old = old_runs.get((r["tool"], r["items"]))
+        if not old or "skipped" in r or "skipped" in old:
+            continue
+        print(f"{r['tool']} x{r['items']}: items/s {old['items_per_second']} -> {r['items_per_second']} "
+              f"({pct(r['items_per_second'], old['items_per_second'])}), "
+              f"peak RSS {old['peak_rss_mb']} -> {r['peak_rss_mb']} MB ({pct(r['peak_rss_mb'], old['peak_rss_mb'])})")
+        for name, s in r["stages"].items():
+            o = old["stages"].get(name)
+            if o and "p95_ms" in s and "p95_ms" in o:
+                print(f"    {name:<24} p95 {o['p95_ms']:>10} -> {s['p95_ms']:>10} ms ({pct(s['p95_ms'], o['p95_ms'])})")
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark suite for problem1-3")
+    ap.add_argument("--repo", default=os.path.dirname(HERE), help="checkout whose scripts are benchmarked")
+    ap.add_argument("--tools", default="problem1,problem2", help="comma list of problem1,problem2,problem3")
+    ap.add_argument("--items", default="10,1000", help="comma list of scales (URLs or papers)")
+    ap.add_argument("--latency-ms", type=float, default=5.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--size-kb", type=float, default=20.0, help="median page size")
+    ap.add_argument("--error-rate", type=float, default=0.05, help="share of 404/500/503 pages")
+    ap.add_argument("--redirect-rate", type=float, default=0.02)
+    ap.add_argument("--charsets", default="utf-8,iso-8859-1,windows-1252,shift_jis")
+    ap.add_argument("--feed-delay-ms", type=float, default=50.0, help="latency of each arXiv API page")
+    ap.add_argument("--arxiv-interval", type=float, default=0.0, help="ARXIV_MIN_INTERVAL for problem2")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for every tool")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="earlier results file to compare against")
+    args = ap.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    tools = [t for t in args.tools.split(",") if t]
+    scales = [int(n) for n in args.items.split(",")]
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", "METRICS": "1", "NO_PROXY": "127.0.0.1,localhost",
+           "no_proxy": "127.0.0.1,localhost", **dict(kv.split("=", 1) for kv in args.env)}
+    server = StandInServer(0, args.feed_delay_ms)
+    doc = {"created": datetime.datetime.now(datetime.timezone.utc).isoformat(), "revision": git_revision(repo),
+           "repo": repo, "python": platform.python_version(), "platform": platform.platform(),
+           "cpus": os.cpu_count(), "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+           "results": []}
+    try:
+        for tool in tools:
+            for n in scales:
+                if tool == "problem3" and not shared_writable():
+                    doc["results"].append({"tool": tool, "items": n, "skipped": f"{SHARED} is not writable"})
+                    continue
+                with tempfile.TemporaryDirectory(prefix=f"bench_{tool}_") as work:
+                    r = BENCHES[tool](repo, server, n, env, work, args)
+                    if r["exit_code"]:
+                        with open(os.path.join(work, sorted(f for f in os.listdir(work) if f.endswith(".log"))[0]),
+                                  errors="replace") as f:
+                            r["log_tail"] = f.read()[-2000:]
+                doc["results"].append(r)
+                print(f"{tool:<9} x{n:<7} exit={r['exit_code']} {r['wall_seconds']:9.2f}s "
+                      f"{r['items_per_second']:9.1f} items/s  peak {r['peak_rss_mb']:7.1f} MB", flush=True)
+    finally:
+        server.shutdown()
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+    print(f"wrote {args.out}")
+    if args.baseline:
+        compare(doc, read_json(args.baseline))
+
+if __name__ == "__main__":
+    main()
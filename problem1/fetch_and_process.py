@@ -3,11 +3,33 @@
 
 import sys
 import os
+import codecs
+import cProfile
+import hashlib
+import heapq
 import json
+import math
+import pstats
+import random
 import re
+import socket
 import time
 import datetime
-from urllib import request, error
+import http.client
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from urllib import error
+from urllib.parse import urlsplit, urljoin
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 # ISO-8601 UTC format with 'Z'
 ISO_FMT = "%Y-%m-%dT%H:%M:%S.%fZ"
@@ -16,6 +38,63 @@ def utc_now_iso() -> str:
     # Return current UTC time as ISO-8601 string
     return datetime.datetime.utcnow().strftime(ISO_FMT)
 
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    # Read an integer setting from the environment (clamped to minimum)
+    try:
+        return max(minimum, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+def env_float(name: str, default: float, minimum: float = 0.0) -> float:
+    # Read a float setting from the environment (clamped to minimum)
+    try:
+        return max(minimum, float(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+# Concurrency limits (FETCH_WORKERS=1 restores the old one-at-a-time behavior)
+FETCH_WORKERS = env_int("FETCH_WORKERS", 8)
+FETCH_PER_HOST = env_int("FETCH_PER_HOST", 2)
+
+# Bodies are streamed in chunks; FETCH_MAX_BODY caps bytes read per URL (0 = no cap)
+CHUNK_SIZE = 64 * 1024
+FETCH_MAX_BODY = env_int("FETCH_MAX_BODY", 0, minimum=0)
+
+# OUTPUT_FORMAT=jsonl streams records to responses.jsonl instead of one responses.json at the end
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "json").lower()
+JSONL_FLUSH_EVERY = env_int("JSONL_FLUSH_EVERY", 50)
+
+# RESUME=1 skips URLs already fetched successfully according to <output_dir>/manifest.json
+RESUME = os.environ.get("RESUME", "0") == "1"
+
+# Keep-alive connections idle longer than this are closed rather than reused
+POOL_IDLE_SEC = env_int("POOL_IDLE_SEC", 30)
+
+# Retries: up to FETCH_MAX_ATTEMPTS tries for 429/5xx responses and connection errors, waiting
+# FETCH_BACKOFF_BASE_MS doubling per try (capped at FETCH_BACKOFF_CAP_SEC, full jitter) or the
+# server's Retry-After if longer. Only the failing host waits. FETCH_HOST_RATE > 0 limits requests
+# per second per host (bursts of FETCH_HOST_BURST). No retry starts after FETCH_DEADLINE_SEC (0 = never).
+FETCH_MAX_ATTEMPTS = env_int("FETCH_MAX_ATTEMPTS", 3)
+FETCH_BACKOFF_BASE_MS = env_int("FETCH_BACKOFF_BASE_MS", 500, minimum=0)
+FETCH_BACKOFF_CAP_SEC = env_float("FETCH_BACKOFF_CAP_SEC", 30.0)
+FETCH_HOST_RATE = env_float("FETCH_HOST_RATE", 0.0)
+FETCH_HOST_BURST = env_int("FETCH_HOST_BURST", 1)
+FETCH_DEADLINE_SEC = env_float("FETCH_DEADLINE_SEC", 0.0)
+
+# FETCH_CACHE_DIR enables the on-disk conditional-request cache (size budget in MB)
+FETCH_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", "")
+FETCH_CACHE_MAX_MB = env_int("FETCH_CACHE_MAX_MB", 256)
+
+# METRICS=1 writes <output_dir>/metrics.json: per-stage latency percentiles, throughput and
+# peak RSS. PROFILE=1 writes a cProfile dump covering every thread to <output_dir>/profile.pstats
+METRICS_ENABLED = os.environ.get("METRICS", "0") == "1"
+PROFILE_ENABLED = os.environ.get("PROFILE", "0") == "1"
+
+# Request behavior matching urllib.request.urlopen defaults
+USER_AGENT = "Python-urllib/%d.%d" % sys.version_info[:2]
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
 # Regex to detect "words" in text (letters/numbers)
 _word_re = re.compile(r"[A-Za-z0-9]+")
 
@@ -37,26 +116,563 @@ def extract_charset(content_type: str | None) -> str | None:
             return None
     return None
 
-def count_words_from_bytes(body: bytes, preferred_encoding: str | None) -> int:
-    # Decode response body into text and count words
-    enc_candidates = []
-    if preferred_encoding:
-        enc_candidates.append(preferred_encoding)
-    enc_candidates += ["utf-8", "latin-1"]
+def pick_encoding(preferred_encoding: str | None) -> str:
+    # First known text codec among the declared charset and the fallbacks. bytes.decode()
+    # rejects bytes-to-bytes codecs such as base64 or zlib, so they fall back like unknown names.
+    for enc in (preferred_encoding, "utf-8", "latin-1"):
+        if not enc:
+            continue
+        try:
+            if codecs.lookup(enc)._is_text_encoding:
+                return enc
+        except LookupError:
+            continue
+    return "latin-1"
 
-    text = None
-    for enc in enc_candidates:
+def _is_word_char(c: str) -> bool:
+    # Same character class as _word_re
+    return c.isascii() and c.isalnum()
+
+class WordCounter:
+    # Count words over a byte stream one chunk at a time.
+    # The incremental decoder keeps multibyte characters split across chunks
+    # intact, and _in_word makes a word split across chunks count once.
+    def __init__(self, encoding: str):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+        self._in_word = False
+        self.count = 0
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        text = self._decoder.decode(chunk, final)
+        if not text:
+            return
+        n = sum(1 for _ in _word_re.finditer(text))
+        if n and self._in_word and _is_word_char(text[0]):
+            n -= 1
+        self.count += n
+        self._in_word = _is_word_char(text[-1])
+
+def peak_rss_mb() -> dict:
+    # Peak resident set size of this process and of its finished children, in MB
+    if resource is None:
+        return {"self": None, "children": None}
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    return {"self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)}
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+class Metrics:
+    # Opt-in instrumentation: latency samples plus item/byte counts per named stage.
+    # Thread-safe; a disabled instance ignores every call, so call sites stay unconditional.
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict] = {}
+        self._started = time.perf_counter()
+
+    def observe(self, stage: str, seconds: float | None = None, items: int = 0, nbytes: int = 0) -> None:
+        # Record one latency sample (if given) and add items/bytes to the stage totals
+        if not self.enabled:
+            return
+        with self._lock:
+            st = self._stages.setdefault(stage, {"samples": [], "items": 0, "bytes": 0})
+            if seconds is not None:
+                st["samples"].append(seconds)
+            st["items"] += items
+            st["bytes"] += nbytes
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 0, nbytes: int = 0):
+        # Time the enclosed block as one sample of stage
+        t = time.perf_counter()
         try:
-            text = body.decode(enc, errors="ignore")
-            break
-        except Exception:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t, items, nbytes)
+
+    def snapshot(self) -> dict:
+        # Percentiles in ms per stage; rates are over the wall time since the instance was created
+        wall = time.perf_counter() - self._started
+        stages = {}
+        with self._lock:
+            for name, st in self._stages.items():
+                samples = sorted(st["samples"])
+                row = {"count": len(samples), "total_sec": round(sum(samples), 6)}
+                if samples:
+                    row.update({f"p{p}_ms": round(percentile(samples, p) * 1000, 3) for p in (50, 95, 99)})
+                    row["max_ms"] = round(samples[-1] * 1000, 3)
+                if st["items"]:
+                    row["items"] = st["items"]
+                    row["items_per_sec"] = round(st["items"] / wall, 3) if wall > 0 else 0.0
+                if st["bytes"]:
+                    row["bytes"] = st["bytes"]
+                    row["bytes_per_sec"] = round(st["bytes"] / wall, 1) if wall > 0 else 0.0
+                stages[name] = row
+        return {"wall_clock_seconds": round(wall, 3), "peak_rss_mb": peak_rss_mb(), "stages": stages}
+
+    def write(self, path: str, **extra) -> None:
+        # Write metrics.json (no-op when disabled)
+        if not self.enabled:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**extra, **self.snapshot()}, f, ensure_ascii=False, indent=2)
+
+class Profiler:
+    # Opt-in cProfile: the main thread between start() and dump(), plus every call made
+    # through wrap() (worker threads get their own profiler), merged into one pstats file
+    def __init__(self, enabled: bool = PROFILE_ENABLED):
+        self.enabled = enabled
+        self._main = cProfile.Profile() if enabled else None
+        self._lock = threading.Lock()
+        self._workers: list = []
+
+    def start(self) -> None:
+        if self._main is not None:
+            self._main.enable()
+
+    def wrap(self, fn):
+        # Return fn profiled per call, or fn itself when profiling is off
+        if not self.enabled:
+            return fn
+
+        def run(*args, **kwargs):
+            prof = cProfile.Profile()
+            try:
+                return prof.runcall(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._workers.append(prof)
+        return run
+
+    def dump(self, path: str) -> None:
+        if self._main is None:
+            return
+        self._main.disable()
+        stats = pstats.Stats(self._main)
+        for prof in self._workers:
+            stats.add(prof)
+        stats.dump_stats(path)
+
+METRICS = Metrics()
+PROFILER = Profiler()
+
+# Thread-local time at which the last TCP connect on this thread finished (for TLS timing)
+_conn_times = threading.local()
+
+def timed_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    # socket.create_connection with DNS lookup and TCP connect recorded as separate stages
+    host, port = address
+    t = time.perf_counter()
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    resolved = time.perf_counter()
+    METRICS.observe("dns", resolved - t)
+    err: OSError | None = None
+    for family, _, _, _, sockaddr in infos:
+        try:
+            sock = socket.create_connection(sockaddr[:2], timeout, source_address)
+        except OSError as ex:
+            err = ex
             continue
-    if text is None:
-        return 0
-    return len(_word_re.findall(text))
+        _conn_times.tcp_done = time.perf_counter()
+        METRICS.observe("tcp_connect", _conn_times.tcp_done - resolved)
+        return sock
+    raise err or OSError(f"getaddrinfo returned no addresses for {host}")
+
+class ConnectionPool:
+    # Reuse persistent http.client connections keyed by (scheme, host, port).
+    # At most max_per_host idle connections are kept per key; connections idle
+    # longer than idle_sec are closed instead of reused. Errors are raised as
+    # urllib.error.HTTPError/URLError, exactly like urlopen.
+    def __init__(self, max_per_host: int = FETCH_PER_HOST, idle_sec: float = POOL_IDLE_SEC):
+        self.max_per_host = max_per_host
+        self.idle_sec = idle_sec
+        self._idle: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _checkout(self, key: tuple, timeout: float):
+        # Take a live idle connection for key, or create a new one
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if conn.sock is not None and now - last_used <= self.idle_sec:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+            self.opened += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=timeout)
+        if METRICS.enabled:
+            conn._create_connection = timed_create_connection
+        return conn, False
+
+    def _checkin(self, key: tuple, conn, resp) -> None:
+        # Keep the connection only if its response was fully read and the server allows reuse
+        if resp.isclosed() and not resp.will_close:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_per_host:
+                    idle.append((conn, time.monotonic()))
+                    return
+        conn.close()
+
+    def _discard(self, key: tuple, conn, resp) -> None:
+        # Drain a small unwanted body (redirect/error page) so the connection can be reused
+        resp.read(CHUNK_SIZE)
+        self._checkin(key, conn, resp)
+
+    def _send(self, key: tuple, target: str, headers: dict, timeout: float):
+        # Send one GET; a reused connection the server has closed is retried once fresh
+        while True:
+            conn, reused = self._checkout(key, timeout)
+            try:
+                if not reused and METRICS.enabled and key[0] == "https":
+                    # Connect up front so the TLS handshake can be told apart from the request
+                    conn.connect()
+                    METRICS.observe("tls_handshake", time.perf_counter() - _conn_times.tcp_done)
+                sent = time.perf_counter()
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+                METRICS.observe("ttfb", time.perf_counter() - sent)
+                return conn, resp
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                if not reused:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+    @contextmanager
+    def open(self, url: str, timeout: float, headers: dict | None = None):
+        # GET url following redirects; yields an http.client.HTTPResponse
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ("http", "https"):
+                raise ValueError(f"unknown url type: {url!r}")
+            if not parts.hostname:
+                raise error.URLError("no host given")
+            key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            try:
+                conn, resp = self._send(key, target, {"User-Agent": USER_AGENT, **(headers or {})}, timeout)
+            except OSError as ex:
+                raise error.URLError(ex) from ex
+
+            location = resp.getheader("Location")
+            if resp.status in REDIRECT_CODES and location:
+                self._discard(key, conn, resp)
+                url = urljoin(url, location)
+                continue
+            # Like urlopen: anything but 2xx is an error, except 304 answering our own validators
+            conditional = any(h in (headers or {}) for h in ("If-None-Match", "If-Modified-Since"))
+            if resp.status >= 300 and not (resp.status == 304 and conditional):
+                self._discard(key, conn, resp)
+                raise error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            try:
+                yield resp
+            except BaseException:
+                conn.close()
+                raise
+            self._checkin(key, conn, resp)
+            return
+        raise error.URLError(f"too many redirects (>{MAX_REDIRECTS})")
+
+    def close(self) -> None:
+        # Close every idle connection
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+# Shared by every fetch_one call
+POOL = ConnectionPool()
+
+class ResponseCache:
+    # On-disk cache of response bodies plus their ETag/Last-Modified validators.
+    # index.json lists entries in LRU order (oldest first); each body lives in its
+    # own uniquely named file, so a crash before the index is saved never pairs
+    # old validators with a new body. Entries are evicted oldest first once the
+    # total body size exceeds max_bytes.
+    INDEX_SAVE_EVERY = 50
+
+    def __init__(self, root: str, max_bytes: int):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, dict] = OrderedDict()
+        self._unsaved = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for key, meta in json.load(f):
+                    body = os.path.join(root, meta["file"])
+                    if os.path.exists(body) and os.path.getsize(body) == meta["size"]:
+                        self._index[key] = meta
+        # Drop bodies the index does not reference (e.g. from a crashed run)
+        live = {m["file"] for m in self._index.values()}
+        for name in os.listdir(root):
+            if (name.endswith(".body") or name.endswith(".tmp")) and name not in live:
+                os.remove(os.path.join(root, name))
+        self.total_bytes = sum(m["size"] for m in self._index.values())
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
 
-def fetch_one(url: str, timeout_sec: float = 10.0) -> dict:
-    # Fetch a single URL and collect metrics
+    def lookup(self, url: str):
+        # Return (metadata, open body file) for url, or (None, None).
+        # The open handle keeps the body readable even if it is evicted meanwhile.
+        key = self._key(url)
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return None, None
+            self._index.move_to_end(key)
+            try:
+                return meta, open(os.path.join(self.root, meta["file"]), "rb")
+            except FileNotFoundError:
+                return None, None
+
+    @staticmethod
+    def validators(meta: dict | None) -> dict:
+        # Conditional request headers for a cached entry
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    @staticmethod
+    def cacheable(resp) -> bool:
+        # Only full 200 responses that carry a validator and allow storing
+        if resp.status != 200:
+            return False
+        if "no-store" in (resp.getheader("Cache-Control") or "").lower():
+            return False
+        return bool(resp.getheader("ETag") or resp.getheader("Last-Modified"))
+
+    def open_temp(self):
+        # Temporary file the body is streamed into before commit()
+        fd, path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        return path, os.fdopen(fd, "wb")
+
+    def commit(self, url: str, tmp_path: str, resp) -> None:
+        # Move a fully written body into the cache and evict down to the size budget
+        key = self._key(url)
+        name = f"{key}-{uuid.uuid4().hex[:8]}.body"
+        os.replace(tmp_path, os.path.join(self.root, name))
+        meta = {
+            "url": url,
+            "file": name,
+            "size": os.path.getsize(os.path.join(self.root, name)),
+            "etag": resp.getheader("ETag"),
+            "last_modified": resp.getheader("Last-Modified"),
+            "content_type": resp.getheader("Content-Type", ""),
+            "status": resp.status,
+        }
+        stale = []
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old["size"]
+                stale.append(old["file"])
+            self._index[key] = meta
+            self.total_bytes += meta["size"]
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                _, evicted = self._index.popitem(last=False)
+                self.total_bytes -= evicted["size"]
+                stale.append(evicted["file"])
+            self._unsaved += 1
+            if self._unsaved >= self.INDEX_SAVE_EVERY:
+                self._save_locked()
+        for name in stale:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def discard(self, tmp_path: str) -> None:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _save_locked(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self._index.items()), f, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+        self._unsaved = 0
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+# Shared by every fetch_one call (None when caching is off)
+CACHE = ResponseCache(FETCH_CACHE_DIR, FETCH_CACHE_MAX_MB * 1024 * 1024) if FETCH_CACHE_DIR else None
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Rate limiting/overload: the whole host waits, not just the URL that got the answer
+THROTTLE_STATUS = (429, 503)
+
+def parse_retry_after(value: str | None) -> float:
+    # Seconds requested by a Retry-After header (delta-seconds or HTTP-date), 0.0 if absent or invalid
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+def retry_hint(ex: BaseException) -> tuple[float, bool] | None:
+    # None if the failure is not worth retrying, else (the server's Retry-After delay or 0.0,
+    # whether the whole host should back off)
+    if isinstance(ex, error.HTTPError):
+        if ex.code not in RETRY_STATUS:
+            return None
+        wait = parse_retry_after(ex.headers.get("Retry-After") if ex.headers else None)
+        return wait, ex.code in THROTTLE_STATUS or wait > 0
+    if isinstance(ex, error.URLError):
+        # DNS failures and redirect loops will not fix themselves; refused/reset/timeouts may
+        reason = ex.reason
+        return (0.0, False) if isinstance(reason, OSError) and not isinstance(reason, socket.gaierror) else None
+    if isinstance(ex, (TimeoutError, ConnectionError, http.client.HTTPException)):
+        return 0.0, False
+    return None
+
+class RetryScheduler:
+    # Decides when each host may be sent its next request and when failed URLs are retried.
+    # Every host has a token bucket (rate per second, burst) and a backoff time. A retry waits
+    # exponential backoff with full jitter, or the server's Retry-After if longer; throttling
+    # answers push the whole host's next slot out by that delay, other failures only delay
+    # the URL itself. Retries that could not start before the deadline are dropped.
+    def __init__(self, max_attempts: int = FETCH_MAX_ATTEMPTS, base_sec: float = FETCH_BACKOFF_BASE_MS / 1000,
+                 cap_sec: float = FETCH_BACKOFF_CAP_SEC, rate: float = FETCH_HOST_RATE,
+                 burst: int = FETCH_HOST_BURST, budget_sec: float = FETCH_DEADLINE_SEC, rng=None):
+        self.max_attempts = max_attempts
+        self.base_sec = base_sec
+        self.cap_sec = cap_sec
+        self.rate = rate
+        self.burst = burst
+        self.deadline = time.monotonic() + budget_sec if budget_sec > 0 else math.inf
+        self.rng = rng or random.Random()
+        self._hosts: dict[str, list] = {}  # host -> [tokens, last refill, not before]
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.gave_up = 0
+
+    def _state(self, host: str, now: float) -> list:
+        st = self._hosts.get(host)
+        if st is None:
+            st = self._hosts[host] = [float(self.burst), now, 0.0]
+        elif self.rate > 0:
+            st[0] = min(float(self.burst), st[0] + (now - st[1]) * self.rate)
+        st[1] = now
+        return st
+
+    def ready_at(self, host: str) -> float:
+        # Earliest time.monotonic() at which host may be sent a request (in the past if already free)
+        with self._lock:
+            now = time.monotonic()
+            st = self._state(host, now)
+            t = st[2]
+            if self.rate > 0 and st[0] < 1:
+                t = max(t, now + (1 - st[0]) / self.rate)
+            return t
+
+    def take(self, host: str) -> None:
+        # Spend one of host's tokens (call when a request is actually sent)
+        with self._lock:
+            st = self._state(host, time.monotonic())
+            if self.rate > 0:
+                st[0] -= 1
+
+    def wait(self, host: str) -> None:
+        # Block until host is ready, then take its token
+        while (delay := self.ready_at(host) - time.monotonic()) > 0:
+            time.sleep(delay)
+        self.take(host)
+
+    def backoff(self, host: str, attempt: int, hint: tuple[float, bool] | None) -> float | None:
+        # After failed attempt number attempt (1-based) with retry_hint() hint: the delay
+        # before retrying, or None to give up
+        if hint is None or attempt >= self.max_attempts:
+            return None
+        retry_after, host_wide = hint
+        delay = max(retry_after, self.rng.uniform(0, min(self.cap_sec, self.base_sec * 2 ** (attempt - 1))))
+        with self._lock:
+            now = time.monotonic()
+            if now + delay > self.deadline:
+                self.gave_up += 1
+                return None
+            if host_wide:
+                st = self._state(host, now)
+                st[2] = max(st[2], now + delay)
+            self.retries += 1
+        return delay
+
+# Shared by every fetch in the run, so its deadline budget starts with the process
+SCHEDULER = RetryScheduler()
+
+def read_body(stream, rec: dict, ctype: str, max_body: int, sink=None) -> None:
+    # Stream a body chunk by chunk, filling content_length/word_count/content_sha256.
+    # Never holds more than one chunk in memory; sink optionally receives every chunk.
+    charset = extract_charset(ctype)
+
+    # Only count words for textual content
+    counter = WordCounter(pick_encoding(charset)) if is_text_content(ctype) else None
+
+    clen = 0
+    digest = hashlib.sha256()
+    while True:
+        want = CHUNK_SIZE
+        if max_body:
+            want = min(want, max_body - clen)
+            if want <= 0:
+                rec["truncated"] = bool(stream.read(1))
+                break
+        chunk = stream.read(want)
+        if not chunk:
+            break
+        clen += len(chunk)
+        digest.update(chunk)
+        if sink is not None:
+            sink.write(chunk)
+        if counter is not None:
+            counter.feed(chunk)
+    if counter is not None:
+        counter.feed(b"", final=True)
+
+    rec["content_length"] = int(clen)
+    rec["content_sha256"] = digest.hexdigest()
+    rec["word_count"] = int(counter.count) if counter is not None else None
+
+def fetch_attempt(url: str, timeout_sec: float = 10.0, max_body: int = FETCH_MAX_BODY,
+                  cache: ResponseCache | None = None) -> tuple[dict, tuple[float, bool] | None]:
+    # Fetch a single URL once and collect metrics; also returns retry_hint() of the failure
+    cache = cache or CACHE
+    hint = None
     started = time.perf_counter()
     ts = utc_now_iso()
     rec: dict = {
@@ -67,40 +683,313 @@ def fetch_one(url: str, timeout_sec: float = 10.0) -> dict:
         "word_count": None,
         "timestamp": ts,
         "error": None,
+        "truncated": False,
+        "content_sha256": None,
+        "cache": None,
     }
-    req = request.Request(url, method="GET")
+    cached, cached_body = cache.lookup(url) if cache else (None, None)
     try:
-        with request.urlopen(req, timeout=timeout_sec) as resp:
-            body = resp.read()
-            elapsed_ms = (time.perf_counter() - started) * 1000.0
-
-            status = getattr(resp, "status", None) or resp.getcode()
-            ctype = resp.headers.get("Content-Type", "")
-            clen = len(body)
-            charset = extract_charset(ctype)
-
-            rec["status_code"] = int(status)
-            rec["response_time_ms"] = float(elapsed_ms)
-            rec["content_length"] = int(clen)
-
-            # Only count words for textual content
-            if is_text_content(ctype):
-                rec["word_count"] = int(count_words_from_bytes(body, charset))
+        with POOL.open(url, timeout=timeout_sec, headers=ResponseCache.validators(cached)) as resp:
+            if resp.status == 304 and cached is not None:
+                # Not modified: serve the stored body
+                resp.read()
+                rec["cache"] = "hit"
+                with METRICS.timer("cache_read"):
+                    read_body(cached_body, rec, cached["content_type"], max_body)
+                rec["status_code"] = int(cached["status"])
             else:
-                rec["word_count"] = None
+                if cache:
+                    rec["cache"] = "miss"
+                tmp_path, sink = cache.open_temp() if cache and cache.cacheable(resp) else (None, None)
+                complete = False
+                try:
+                    t = time.perf_counter()
+                    read_body(resp, rec, resp.headers.get("Content-Type", ""), max_body, sink)
+                    METRICS.observe("body", time.perf_counter() - t, nbytes=rec["content_length"])
+                    complete = not rec["truncated"]
+                finally:
+                    # Only complete bodies are cached
+                    if sink is not None:
+                        sink.close()
+                        if complete:
+                            cache.commit(url, tmp_path, resp)
+                        else:
+                            cache.discard(tmp_path)
+                rec["status_code"] = int(resp.status)
+            rec["response_time_ms"] = float((time.perf_counter() - started) * 1000.0)
 
     except Exception as ex:
         # Handle network/timeout/invalid URL errors
         elapsed_ms = (time.perf_counter() - started) * 1000.0
         rec["response_time_ms"] = float(elapsed_ms)
         rec["error"] = str(ex)
+        hint = retry_hint(ex)
+    finally:
+        if cached_body is not None:
+            cached_body.close()
+
+    METRICS.observe("request", rec["response_time_ms"] / 1000.0, items=1, nbytes=rec["content_length"])
+    return rec, hint
+
+def fetch_one(url: str, timeout_sec: float = 10.0, max_body: int = FETCH_MAX_BODY,
+              cache: ResponseCache | None = None, scheduler: RetryScheduler | None = None) -> dict:
+    # Fetch a single URL, sleeping through backoff between the retries the scheduler allows
+    scheduler = scheduler or SCHEDULER
+    host = host_key(url)
+    attempt = 0
+    while True:
+        attempt += 1
+        scheduler.wait(host)
+        rec, hint = fetch_attempt(url, timeout_sec, max_body, cache)
+        delay = scheduler.backoff(host, attempt, hint) if rec["error"] is not None else None
+        if delay is None:
+            rec["attempts"] = attempt
+            return rec
+        if not hint[1]:
+            time.sleep(delay)
+
+def host_key(url: str) -> str:
+    # Group URLs by host for per-host limits (unparseable URLs share one bucket)
+    try:
+        return urlsplit(url).netloc.lower()
+    except ValueError:
+        return ""
+
+def iter_fetch(urls: list[str], timeout_sec: float = 10.0,
+               max_workers: int = FETCH_WORKERS, per_host: int = FETCH_PER_HOST,
+               scheduler: RetryScheduler | None = None):
+    # Fetch URLs with a global cap, a per-host cap and the scheduler's per-host rate and backoff.
+    # Yields (input_index, record) in completion order.
+    scheduler = scheduler or SCHEDULER
+    if max_workers <= 1 or len(urls) <= 1:
+        for i, u in enumerate(urls):
+            yield i, fetch_one(u, timeout_sec=timeout_sec, scheduler=scheduler)
+        return
+    fetch = PROFILER.wrap(fetch_attempt)
+
+    # Pending URL indexes per host, so a busy or backing-off host never holds a worker idle
+    pending: dict[str, deque] = {}
+    for i, u in enumerate(urls):
+        pending.setdefault(host_key(u), deque()).append(i)
+    active: dict[str, int] = {h: 0 for h in pending}
+    attempts = [0] * len(urls)
+    delayed: list[tuple[float, int, str]] = []  # heap of (due, index, host) for URLs waiting to retry
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or in_flight or delayed:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                _, i, h = heapq.heappop(delayed)
+                pending.setdefault(h, deque()).appendleft(i)
+            # Dispatch as many URLs as both limits and the hosts' schedules allow
+            next_ready = delayed[0][0] if delayed else math.inf
+            for h in list(pending):
+                while pending[h] and active[h] < per_host and len(in_flight) < max_workers:
+                    ready = scheduler.ready_at(h)
+                    if ready > now:
+                        next_ready = min(next_ready, ready)
+                        break
+                    scheduler.take(h)
+                    i = pending[h].popleft()
+                    attempts[i] += 1
+                    in_flight[pool.submit(fetch, urls[i], timeout_sec)] = (i, h)
+                    active[h] += 1
+                if not pending[h]:
+                    del pending[h]
+            if not in_flight:
+                # Every remaining URL or host is backing off or out of tokens
+                time.sleep(max(0.0, next_ready - time.monotonic()))
+                continue
+            timeout = None if next_ready == math.inf else max(0.0, next_ready - time.monotonic())
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, h = in_flight.pop(fut)
+                active[h] -= 1
+                rec, hint = fut.result()
+                delay = scheduler.backoff(h, attempts[i], hint) if rec["error"] is not None else None
+                if delay is not None:
+                    # Other URLs and hosts carry on while this one (or its whole host) waits
+                    if hint[1]:
+                        pending.setdefault(h, deque()).appendleft(i)
+                    else:
+                        heapq.heappush(delayed, (time.monotonic() + delay, i, h))
+                    continue
+                rec["attempts"] = attempts[i]
+                yield i, rec
+
+class SummaryAccumulator:
+    # Running totals for summary.json, updated one record at a time
+    def __init__(self):
+        self.total_urls = 0
+        self.successful = 0
+        self.failed = 0
+        self.total_bytes = 0
+        self.time_sum_ms = 0.0
+        self.time_count = 0
+        self.status_dist: dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_bytes_saved = 0
+
+    def add(self, r: dict) -> None:
+        code = r["status_code"]
+        err = r["error"]
+        rt = r["response_time_ms"]
+        self.total_urls += 1
+        if isinstance(rt, (int, float)):
+            self.time_sum_ms += float(rt)
+            self.time_count += 1
+
+        if err is not None or code is None or not (200 <= int(code) <= 399):
+            self.failed += 1
+        else:
+            self.successful += 1
+            self.total_bytes += int(r.get("content_length", 0))
+
+        k = str(int(code)) if code is not None else "ERR"
+        self.status_dist[k] = self.status_dist.get(k, 0) + 1
 
-    return rec
+        if r.get("cache") == "hit":
+            self.cache_hits += 1
+            self.cache_bytes_saved += int(r.get("content_length", 0))
+        elif r.get("cache") == "miss":
+            self.cache_misses += 1
+
+    def summary(self) -> dict:
+        avg_ms = (self.time_sum_ms / self.time_count) if self.time_count else 0.0
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "total_urls": self.total_urls,
+            "successful_requests": self.successful,
+            "failed_requests": self.failed,
+            "average_response_time_ms": avg_ms,
+            "total_bytes_downloaded": self.total_bytes,
+            "status_code_distribution": self.status_dist,
+            "cache_hits": self.cache_hits,
+            "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "cache_bytes_saved": self.cache_bytes_saved,
+        }
+
+class JsonlWriter:
+    # Append one JSON object per line, flushing every flush_every records or flush_sec seconds
+    def __init__(self, path: str, flush_every: int = JSONL_FLUSH_EVERY, flush_sec: float = 1.0):
+        self._f = open(path, "w", encoding="utf-8")
+        self._flush_every = flush_every
+        self._flush_sec = flush_sec
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, obj: dict) -> None:
+        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_sec:
+            self.flush()
+
+    def flush(self) -> None:
+        self._f.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Checkpoint:
+    # Crash-safe manifest of completed work: key -> {"hash": ..., "result": ...}.
+    # Each update is appended to <path>.journal right away; compact() folds the
+    # journal into <path> with an atomic rename. A torn last journal line is ignored.
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.entries: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries.update(json.load(f))
+        replayed = os.path.exists(self.journal_path)
+        if replayed:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self.entries[key] = entry
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if replayed:
+            # Fold the previous run's journal in so new lines never follow a torn one
+            self.compact()
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def record(self, key: str, content_hash: str | None, result: dict) -> None:
+        entry = {"hash": content_hash, "result": result}
+        self.entries[key] = entry
+        self._journal.write(json.dumps([key, entry], ensure_ascii=False) + "\n")
+        self._journal.flush()
+
+    def compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # Replaying a journal that is already folded in is harmless, so truncating last is safe
+        self._journal.seek(0)
+        self._journal.truncate()
+
+    def close(self) -> None:
+        self.compact()
+        self._journal.close()
+        os.remove(self.journal_path)
+
+def iter_resumable(urls: list[str], checkpoint: Checkpoint, resume: bool = RESUME,
+                   timeout_sec: float = 10.0):
+    # Like iter_fetch, but replays URLs already fetched successfully and records new results
+    todo = []
+    for i, u in enumerate(urls):
+        done = checkpoint.get(u) if resume else None
+        if done is not None and done["result"]["error"] is None:
+            yield i, done["result"]
+        else:
+            todo.append(i)
+    for j, r in iter_fetch([urls[i] for i in todo], timeout_sec=timeout_sec):
+        checkpoint.record(r["url"], r["content_sha256"], r)
+        yield todo[j], r
+
+def error_line(r: dict) -> str:
+    # One errors.log entry
+    return f"[{r['timestamp']}] [{r['url']}]: {r['error']}"
+
+def convert_jsonl(output_dir: str) -> None:
+    # Rebuild the legacy responses.json array (input order) from responses.jsonl
+    rows = []
+    with open(os.path.join(output_dir, "responses.jsonl"), "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rows.append(json.loads(line))
+    rows.sort(key=lambda r: r["index"])
+    responses = [{k: v for k, v in r.items() if k != "index"} for r in rows]
+    with open(os.path.join(output_dir, "responses.json"), "w", encoding="utf-8") as f:
+        json.dump(responses, f, ensure_ascii=False, indent=2)
 
 def main():
+    # Convert mode: rebuild responses.json from a streamed run
+    if len(sys.argv) == 3 and sys.argv[1] == "--convert":
+        convert_jsonl(sys.argv[2])
+        return
+
     # Verify arguments: must have input file and output dir
     if len(sys.argv) != 3:
         print(f"Usage: {os.path.basename(sys.argv[0])} <input_file> <output_directory>", file=sys.stderr)
+        print(f"       {os.path.basename(sys.argv[0])} --convert <output_directory>", file=sys.stderr)
         sys.exit(1)
 
     input_file = sys.argv[1]
@@ -112,56 +1001,63 @@ def main():
         urls = [line.strip() for line in f if line.strip()]
 
     # Start processing
+    PROFILER.start()
+    checkpoint = Checkpoint(os.path.join(output_dir, "manifest.json"))
+    acc = SummaryAccumulator()
     processing_start = utc_now_iso()
-    responses: list[dict] = [fetch_one(u, timeout_sec=10.0) for u in urls]
+    wall_started = time.perf_counter()
+    if OUTPUT_FORMAT == "jsonl":
+        # Streaming mode: each record (and error) is written as soon as it completes
+        with JsonlWriter(os.path.join(output_dir, "responses.jsonl")) as out, \
+                open(os.path.join(output_dir, "errors.log"), "w", encoding="utf-8") as errf:
+            for i, r in iter_resumable(urls, checkpoint, timeout_sec=10.0):
+                acc.add(r)
+                out.write({"index": i, **r})
+                if r["error"]:
+                    errf.write(error_line(r) + "\n")
+                    errf.flush()
+        responses = None
+    else:
+        responses = [None] * len(urls)
+        for i, r in iter_resumable(urls, checkpoint, timeout_sec=10.0):
+            acc.add(r)
+            responses[i] = r
+    wall_sec = time.perf_counter() - wall_started
+    POOL.close()
+    checkpoint.close()
+    if CACHE:
+        CACHE.save()
     processing_end = utc_now_iso()
 
-    # Save detailed responses.json
-    with open(os.path.join(output_dir, "responses.json"), "w", encoding="utf-8") as f:
-        json.dump(responses, f, ensure_ascii=False, indent=2)
-
-    # Build summary.json
-    total_urls = len(responses)
-    successful = 0
-    failed = 0
-    total_bytes = 0
-    times_ms: list[float] = []
-    status_dist: dict[str, int] = {}
-
-    for r in responses:
-        code = r["status_code"]
-        err = r["error"]
-        rt = r["response_time_ms"]
-        if isinstance(rt, (int, float)):
-            times_ms.append(float(rt))
-
-        if err is not None or code is None or not (200 <= int(code) <= 399):
-            failed += 1
-        else:
-            successful += 1
-            total_bytes += int(r.get("content_length", 0))
+    if responses is not None:
+        # Save detailed responses.json
+        with open(os.path.join(output_dir, "responses.json"), "w", encoding="utf-8") as f:
+            json.dump(responses, f, ensure_ascii=False, indent=2)
 
-        k = str(int(code)) if code is not None else "ERR"
-        status_dist[k] = status_dist.get(k, 0) + 1
+        # Save errors.log (only failed requests)
+        err_lines = [error_line(r) for r in responses if r["error"]]
+        with open(os.path.join(output_dir, "errors.log"), "w", encoding="utf-8") as f:
+            f.write("\n".join(err_lines))
 
-    avg_ms = (sum(times_ms) / len(times_ms)) if times_ms else 0.0
+    # Build summary.json
+    total_urls = len(urls)
     summary = {
-        "total_urls": total_urls,
-        "successful_requests": successful,
-        "failed_requests": failed,
-        "average_response_time_ms": avg_ms,
-        "total_bytes_downloaded": total_bytes,
-        "status_code_distribution": status_dist,
+        **acc.summary(),
         "processing_start": processing_start,
         "processing_end": processing_end,
+        "wall_clock_seconds": round(wall_sec, 3),
+        "throughput_urls_per_sec": round(total_urls / wall_sec, 3) if wall_sec > 0 else 0.0,
+        "connections_opened": POOL.opened,
+        "connections_reused": POOL.reused,
+        "retries": SCHEDULER.retries,
+        "retries_abandoned_at_deadline": SCHEDULER.gave_up,
     }
     with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
-    # Save errors.log (only failed requests)
-    err_lines = [f"[{r['timestamp']}] [{r['url']}]: {r['error']}" for r in responses if r["error"]]
-    with open(os.path.join(output_dir, "errors.log"), "w", encoding="utf-8") as f:
-        f.write("\n".join(err_lines))
+    PROFILER.dump(os.path.join(output_dir, "profile.pstats"))
+    METRICS.write(os.path.join(output_dir, "metrics.json"), tool="fetch_and_process", urls=total_urls,
+                  fetch_workers=FETCH_WORKERS, fetch_per_host=FETCH_PER_HOST)
 
 if __name__ == "__main__":
     main()
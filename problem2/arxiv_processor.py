@@ -6,16 +6,79 @@ Uses only Python standard libraries.
 
 import sys
 import os
+import argparse
+import atexit
+import cProfile
 import json
+import hashlib
+import http.client
+import math
+import pstats
+import queue
+import random
 import re
+import socket
+import sqlite3
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from urllib.parse import urlencode
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, urlsplit
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 import xml.etree.ElementTree as ET
+from contextlib import contextmanager
 
-ARXIV_ENDPOINT = "http://export.arxiv.org/api/query"
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ARXIV_ENDPOINT = os.environ.get("ARXIV_ENDPOINT", "http://export.arxiv.org/api/query")
+
+# Harvesting: max_results above ARXIV_PAGE_SIZE is fetched page by page,
+# at most one API call every ARXIV_MIN_INTERVAL seconds (arXiv asks for 3s)
+ARXIV_PAGE_SIZE = int(os.environ.get("ARXIV_PAGE_SIZE", "100"))
+ARXIV_MIN_INTERVAL = float(os.environ.get("ARXIV_MIN_INTERVAL", "3"))
+PREFETCH_PAGES = 2
+
+# Retries: up to ARXIV_MAX_ATTEMPTS tries for 429/5xx responses and connection errors, waiting
+# ARXIV_BACKOFF_BASE_SEC doubling per try (capped at ARXIV_BACKOFF_CAP_SEC, full jitter) or the
+# server's Retry-After if longer. No retry starts after ARXIV_DEADLINE_SEC of harvesting (0 = never).
+ARXIV_MAX_ATTEMPTS = int(os.environ.get("ARXIV_MAX_ATTEMPTS", "3"))
+ARXIV_BACKOFF_BASE_SEC = float(os.environ.get("ARXIV_BACKOFF_BASE_SEC", "3"))
+ARXIV_BACKOFF_CAP_SEC = float(os.environ.get("ARXIV_BACKOFF_CAP_SEC", "60"))
+ARXIV_DEADLINE_SEC = float(os.environ.get("ARXIV_DEADLINE_SEC", "0"))
+
+# Abstract analysis: papers are analyzed in batches of ANALYSIS_BATCH; batches of at least
+# ANALYSIS_MIN_PARALLEL papers go to a process pool of ANALYSIS_WORKERS (0 = one per CPU, 1 = serial)
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "0"))
+ANALYSIS_BATCH = 512
+ANALYSIS_MIN_PARALLEL = 64
+
+# OUTPUT_FORMAT=jsonl writes papers.jsonl/stats.jsonl one record at a time
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "json").lower()
+JSONL_FLUSH_EVERY = 50
+
+# LOG_FORMAT=json writes processing.log as JSON lines, with per-stage timings on the
+# completion record; LOG_FLUSH_SEC > 0 flushes the log from a background thread
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_FLUSH_SEC = float(os.environ.get("LOG_FLUSH_SEC", "0"))
+
+# METRICS=1 writes <output_dir>/metrics.json: per-stage latency percentiles, throughput and
+# peak RSS. PROFILE=1 writes a cProfile dump of the main and prefetch threads to
+# <output_dir>/profile.pstats (analysis worker processes are not included)
+METRICS_ENABLED = os.environ.get("METRICS", "0") == "1"
+PROFILE_ENABLED = os.environ.get("PROFILE", "0") == "1"
+
+# RESUME=1 reuses analyses from <output_dir>/manifest.json for unchanged abstracts, and
+# continues an interrupted harvest of the same query from its first unfetched page
+RESUME = os.environ.get("RESUME", "0") == "1"
+
+# PAPER_STORE=<path> also upserts every paper and its analysis into a SQLite store indexed by
+# author, category, published date and abstract terms; query it offline with --search
+PAPER_STORE = os.environ.get("PAPER_STORE", "")
 
 # Stopwords provided in the assignment
 STOPWORDS = { ... }  # keep same content
@@ -24,68 +87,821 @@ def utc_now_iso() -> str:
     # Return current UTC time in ISO-8601 format
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def log_line(log_path: str, message: str) -> None:
-    # Append one log line to processing.log
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{utc_now_iso()}] {message}\n")
+def peak_rss_mb() -> dict:
+    # Peak resident set size of this process and of its finished children, in MB
+    if resource is None:
+        return {"self": None, "children": None}
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    return {"self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)}
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+class Metrics:
+    # Opt-in instrumentation: latency samples plus item/byte counts per named stage.
+    # Thread-safe; a disabled instance ignores every call, so call sites stay unconditional.
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict] = {}
+        self._started = time.perf_counter()
+
+    def observe(self, stage: str, seconds: float | None = None, items: int = 0, nbytes: int = 0) -> None:
+        # Record one latency sample (if given) and add items/bytes to the stage totals
+        if not self.enabled:
+            return
+        with self._lock:
+            st = self._stages.setdefault(stage, {"samples": [], "items": 0, "bytes": 0})
+            if seconds is not None:
+                st["samples"].append(seconds)
+            st["items"] += items
+            st["bytes"] += nbytes
+
+    def snapshot(self) -> dict:
+        # Percentiles in ms per stage; rates are over the wall time since the instance was created
+        wall = time.perf_counter() - self._started
+        stages = {}
+        with self._lock:
+            for name, st in self._stages.items():
+                samples = sorted(st["samples"])
+                row = {"count": len(samples), "total_sec": round(sum(samples), 6)}
+                if samples:
+                    row.update({f"p{p}_ms": round(percentile(samples, p) * 1000, 3) for p in (50, 95, 99)})
+                    row["max_ms"] = round(samples[-1] * 1000, 3)
+                if st["items"]:
+                    row["items"] = st["items"]
+                    row["items_per_sec"] = round(st["items"] / wall, 3) if wall > 0 else 0.0
+                if st["bytes"]:
+                    row["bytes"] = st["bytes"]
+                    row["bytes_per_sec"] = round(st["bytes"] / wall, 1) if wall > 0 else 0.0
+                stages[name] = row
+        return {"wall_clock_seconds": round(wall, 3), "peak_rss_mb": peak_rss_mb(), "stages": stages}
+
+    def write(self, path: str, **extra) -> None:
+        # Write metrics.json (no-op when disabled)
+        if not self.enabled:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**extra, **self.snapshot()}, f, ensure_ascii=False, indent=2)
+
+class Profiler:
+    # Opt-in cProfile: the main thread between start() and dump(), plus every call made
+    # through wrap() (other threads get their own profiler), merged into one pstats file
+    def __init__(self, enabled: bool = PROFILE_ENABLED):
+        self.enabled = enabled
+        self._main = cProfile.Profile() if enabled else None
+        self._lock = threading.Lock()
+        self._workers: list = []
+
+    def start(self) -> None:
+        if self._main is not None:
+            self._main.enable()
+
+    def wrap(self, fn):
+        # Return fn profiled per call, or fn itself when profiling is off
+        if not self.enabled:
+            return fn
+
+        def run(*args, **kwargs):
+            prof = cProfile.Profile()
+            try:
+                return prof.runcall(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._workers.append(prof)
+        return run
+
+    def dump(self, path: str) -> None:
+        if self._main is None:
+            return
+        self._main.disable()
+        stats = pstats.Stats(self._main)
+        for prof in self._workers:
+            stats.add(prof)
+        stats.dump_stats(path)
+
+METRICS = Metrics()
+PROFILER = Profiler()
+
+class Logger:
+    # processing.log behind one long-lived buffered handle. Lines go out when the buffer
+    # fills, at every WARNING/ERROR, every flush_sec seconds if set, and at close().
+    # Stage timings are summed per stage from any thread and logged by timings(); each one is
+    # also a latency sample in METRICS.
+    def __init__(self, path: str, fmt: str = LOG_FORMAT, flush_sec: float = LOG_FLUSH_SEC):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "a", encoding="utf-8", buffering=1 << 16)
+        self._json = fmt == "json"
+        self._lock = threading.Lock()
+        self._stages: dict[str, list] = {}
+        self._stop = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)  # sys.exit() or a crash still writes out the buffer
+        if flush_sec > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_sec,), daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            with self._lock:
+                self._f.flush()
+
+    def log(self, message: str, level: str = "INFO", **fields) -> None:
+        # Text lines keep the original "[time] LEVEL message" form (no level for INFO);
+        # JSON lines carry the extra fields as well
+        if self._json:
+            line = json.dumps({"time": utc_now_iso(), "level": level, "message": message, **fields},
+                              ensure_ascii=False)
+        else:
+            line = f"[{utc_now_iso()}] {message if level == 'INFO' else f'{level} {message}'}"
+        with self._lock:
+            self._f.write(line + "\n")
+            if level != "INFO":
+                self._f.flush()
+
+    def warning(self, message: str, **fields) -> None:
+        self.log(message, "WARNING", **fields)
+
+    def error(self, message: str, **fields) -> None:
+        self.log(message, "ERROR", **fields)
+
+    def add_time(self, stage: str, seconds: float, items: int = 0, nbytes: int = 0) -> None:
+        with self._lock:
+            total = self._stages.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+        METRICS.observe(stage, seconds, items, nbytes)
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, nbytes: int = 0):
+        # Time the enclosed block under stage name
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t, items, nbytes)
+
+    def timed(self, iterable, name: str):
+        # Re-yield iterable, timing each step under stage name (for lazy parsers)
+        it = iter(iterable)
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - t)
+                return
+            self.add_time(name, time.perf_counter() - t, items=1)
+            yield item
+
+    def timings(self) -> dict:
+        with self._lock:
+            return {k: {"seconds": round(v[0], 4), "calls": v[1]} for k, v in self._stages.items()}
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self._f.close()
+        atexit.unregister(self.close)
+
+class JsonlWriter:
+    # Append one JSON object per line, flushing every flush_every records or flush_sec seconds
+    def __init__(self, path: str, flush_every: int = JSONL_FLUSH_EVERY, flush_sec: float = 1.0):
+        self._f = open(path, "w", encoding="utf-8")
+        self._flush_every = flush_every
+        self._flush_sec = flush_sec
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, obj: dict) -> None:
+        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_sec:
+            self.flush()
+
+    def flush(self) -> None:
+        self._f.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_jsonl(path: str):
+    # Yield each object from a JSON-lines file
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def convert_jsonl(output_dir: str) -> None:
+    # Rebuild the legacy papers.json/stats.json from papers.jsonl/stats.jsonl
+    papers = list(read_jsonl(os.path.join(output_dir, "papers.jsonl")))
+    with open(os.path.join(output_dir, "papers.json"), "w", encoding="utf-8") as f:
+        json.dump(papers, f, ensure_ascii=False, indent=2)
 
-def fetch_with_retries(url: str, headers=None, max_retries=3, sleep_seconds=3) -> bytes:
-    # Fetch URL with retry on HTTP 429 (rate limiting)
+    # The run header is the one line without an arxiv_id (written last)
+    header: dict = {}
+    analyses = []
+    for row in read_jsonl(os.path.join(output_dir, "stats.jsonl")):
+        if "arxiv_id" in row:
+            analyses.append(row)
+        else:
+            header = row
+    stats = {**header, "papers": analyses}
+    with open(os.path.join(output_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+class Checkpoint:
+    # Crash-safe manifest of completed work: key -> {"hash": ..., "result": ...}.
+    # Each update is appended to <path>.journal right away; compact() folds the
+    # journal into <path> with an atomic rename. A torn last journal line is ignored.
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.entries: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries.update(json.load(f))
+        replayed = os.path.exists(self.journal_path)
+        if replayed:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self.entries[key] = entry
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if replayed:
+            # Fold the previous run's journal in so new lines never follow a torn one
+            self.compact()
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def record(self, key: str, content_hash: str | None, result: dict) -> None:
+        entry = {"hash": content_hash, "result": result}
+        self.entries[key] = entry
+        self._journal.write(json.dumps([key, entry], ensure_ascii=False) + "\n")
+        self._journal.flush()
+
+    def compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # Replaying a journal that is already folded in is harmless, so truncating last is safe
+        self._journal.seek(0)
+        self._journal.truncate()
+
+    def close(self) -> None:
+        self.compact()
+        self._journal.close()
+        os.remove(self.journal_path)
+
+class PaperStore:
+    # Persistent SQLite store of papers and their abstract analyses, upserted by arxiv_id.
+    # Authors and categories live in (name, paper) tables keyed for lookup; title and
+    # abstract are indexed by an external-content FTS5 table that shares the papers rowid.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS papers (
+            id INTEGER PRIMARY KEY, arxiv_id TEXT NOT NULL UNIQUE, title TEXT NOT NULL,
+            abstract TEXT NOT NULL, published TEXT NOT NULL, updated TEXT NOT NULL,
+            authors TEXT NOT NULL, categories TEXT NOT NULL, abstract_hash TEXT NOT NULL, stats TEXT);
+        CREATE INDEX IF NOT EXISTS papers_published ON papers(published);
+        CREATE TABLE IF NOT EXISTS authors (
+            name TEXT COLLATE NOCASE, paper INTEGER, PRIMARY KEY (name, paper)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS authors_paper ON authors(paper);
+        CREATE TABLE IF NOT EXISTS categories (
+            term TEXT COLLATE NOCASE, paper INTEGER, PRIMARY KEY (term, paper)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS categories_paper ON categories(paper);
+        CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+            title, abstract, content='papers', content_rowid='id');
+    """
+    LOOKUP_CHUNK = 500
+    # Filters matching fewer papers than this drive a query; counting stops here
+    SELECTIVE = 5000
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def upsert_many(self, papers: list[dict], analyses: list[dict | None]) -> int:
+        # Insert new papers, rewrite changed ones, skip identical ones; one transaction
+        # per call. A None analysis keeps whatever stats the store already has.
+        # Returns the number of papers written.
+        c = self.conn
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            # A paper listed twice in one call is written once, with its last values
+            latest = {p["arxiv_id"]: (p, a) for p, a in zip(papers, analyses)}
+            existing = {}
+            ids = list(latest)
+            for i in range(0, len(ids), self.LOOKUP_CHUNK):
+                chunk = ids[i:i + self.LOOKUP_CHUNK]
+                rows = c.execute("SELECT arxiv_id, id, title, abstract, updated, abstract_hash, stats FROM papers "
+                                 f"WHERE arxiv_id IN ({','.join('?' * len(chunk))})", chunk)
+                existing.update((r[0], r[1:]) for r in rows)
+            next_id = c.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM papers").fetchone()[0]
+
+            rows, stale = [], []
+            for p, analysis in latest.values():
+                h = abstract_hash(p["abstract"])
+                stats = None
+                if analysis is not None:
+                    stats = json.dumps({k: v for k, v in analysis.items() if k != "arxiv_id"},
+                                       ensure_ascii=False, separators=(",", ":"))
+                old = existing.get(p["arxiv_id"])
+                if old is None:
+                    pid = next_id
+                    next_id += 1
+                else:
+                    pid, title, abstract, updated, old_hash, old_stats = old
+                    stats = stats if stats is not None else old_stats
+                    if (title, updated, old_hash, old_stats) == (p["title"], p["updated"], h, stats):
+                        continue
+                    stale.append((pid, title, abstract))
+                rows.append((pid, p, h, stats))
+
+            # Old FTS entries must be removed with their old text before the row changes
+            c.executemany("INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES('delete', ?, ?, ?)",
+                          stale)
+            c.executemany("DELETE FROM authors WHERE paper = ?", [(s[0],) for s in stale])
+            c.executemany("DELETE FROM categories WHERE paper = ?", [(s[0],) for s in stale])
+            c.executemany(
+                "INSERT INTO papers (id, arxiv_id, title, abstract, published, updated, authors, categories, "
+                "abstract_hash, stats) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                "title=excluded.title, abstract=excluded.abstract, published=excluded.published, "
+                "updated=excluded.updated, authors=excluded.authors, categories=excluded.categories, "
+                "abstract_hash=excluded.abstract_hash, stats=excluded.stats",
+                [(pid, p["arxiv_id"], p["title"], p["abstract"], p["published"], p["updated"],
+                  json.dumps(p["authors"], ensure_ascii=False), json.dumps(p["categories"], ensure_ascii=False),
+                  h, stats) for pid, p, h, stats in rows])
+            c.executemany("INSERT INTO papers_fts(rowid, title, abstract) VALUES (?, ?, ?)",
+                          [(pid, p["title"], p["abstract"]) for pid, p, _, _ in rows])
+            c.executemany("INSERT OR IGNORE INTO authors (name, paper) VALUES (?, ?)",
+                          [(a, pid) for pid, p, _, _ in rows for a in p["authors"]])
+            c.executemany("INSERT OR IGNORE INTO categories (term, paper) VALUES (?, ?)",
+                          [(t, pid) for pid, p, _, _ in rows for t in p["categories"]])
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def search(self, author: str | None = None, category: str | None = None, term: str | None = None,
+               since: str | None = None, until: str | None = None, limit: int = 20) -> list[dict]:
+        # Newest-first papers matching every given filter; term words must all occur
+        # in the title or abstract. Dates compare as ISO prefixes (2020, 2020-01-31).
+        # If some filter matches few papers, its ids drive the query and the rest are
+        # checked per paper; otherwise papers are walked newest-first until limit match.
+        filters = self._filters(author, category, term)
+        dates, date_args = self._dates(since, until)
+        cols = "p.arxiv_id, p.title, p.authors, p.categories, p.published"
+        driver = self._smallest(filters)
+        if driver is not None:
+            source, _, arg = filters.pop(driver)
+            checks = [check for _, check, _ in filters] + dates
+            rows = self.conn.execute(
+                f"WITH ids(id) AS MATERIALIZED ({source}) SELECT {cols} FROM ids CROSS JOIN papers p ON p.id = ids.id "
+                f"WHERE {' AND '.join(checks or ['1'])} ORDER BY p.published DESC LIMIT ?",
+                [arg, *[a for _, _, a in filters], *date_args, limit])
+        else:
+            checks = [check for _, check, _ in filters] + dates
+            rows = self.conn.execute(
+                f"SELECT {cols} FROM papers p INDEXED BY papers_published WHERE {' AND '.join(checks or ['1'])} "
+                "ORDER BY p.published DESC LIMIT ?", [*[a for _, _, a in filters], *date_args, limit])
+        return [{"arxiv_id": r[0], "title": r[1], "authors": json.loads(r[2]), "categories": json.loads(r[3]),
+                 "published": r[4]} for r in rows]
+
+    def facets(self, author: str | None = None, category: str | None = None, term: str | None = None,
+               since: str | None = None, until: str | None = None, limit: int = 10) -> dict:
+        # Match count plus the most frequent categories and authors among the matches
+        filters = self._filters(author, category, term)
+        dates, date_args = self._dates(since, until)
+        driver = self._smallest(filters)
+        if driver is not None:
+            source, _, arg = filters.pop(driver)
+            checks = [check for _, check, _ in filters] + dates
+            matches = (f"SELECT p.id FROM ({source}) AS ids CROSS JOIN papers p ON p.id = ids.paper "
+                       f"WHERE {' AND '.join(checks or ['1'])}")
+            args = [arg, *[a for _, _, a in filters], *date_args]
+        else:
+            # Every filter is broad: intersect the full id sets
+            clauses = [f"p.id IN ({source})" for source, _, _ in filters] + dates
+            matches = f"SELECT p.id FROM papers p WHERE {' AND '.join(clauses or ['1'])}"
+            args = [*[a for _, _, a in filters], *date_args]
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS matches (id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM temp.matches")
+        self.conn.execute(f"INSERT OR IGNORE INTO temp.matches {matches}", args)
+        out = {"total": self.conn.execute("SELECT COUNT(*) FROM temp.matches").fetchone()[0]}
+        for table, col in (("categories", "term"), ("authors", "name")):
+            rows = self.conn.execute(f"SELECT {col}, COUNT(*) AS n FROM temp.matches m CROSS JOIN {table} "
+                                     f"INDEXED BY {table}_paper ON {table}.paper = m.id "
+                                     f"GROUP BY {col} ORDER BY n DESC, {col} LIMIT ?", [limit])
+            out[table] = [list(r) for r in rows]
+        return out
+
+    def _filters(self, author, category, term) -> list[tuple[str, str, str]]:
+        # (id source, per-paper check, argument) for each given filter; sources yield a "paper" column
+        filters = []
+        if author:
+            filters.append(("SELECT paper FROM authors WHERE name = ?",
+                            "EXISTS (SELECT 1 FROM authors WHERE name = ? AND paper = p.id)", author))
+        if category:
+            filters.append(("SELECT paper FROM categories WHERE term = ?",
+                            "EXISTS (SELECT 1 FROM categories WHERE term = ? AND paper = p.id)", category))
+        words = term.split() if term else []
+        if words:
+            # Quote each word so FTS query syntax in user input is matched literally; a blank term is no filter
+            filters.append(("SELECT rowid AS paper FROM papers_fts WHERE papers_fts MATCH ?",
+                            "EXISTS (SELECT 1 FROM papers_fts WHERE papers_fts MATCH ? AND rowid = p.id)",
+                            " ".join('"' + w.replace('"', '""') + '"' for w in words)))
+        return filters
+
+    def _smallest(self, filters: list[tuple[str, str, str]]) -> int | None:
+        # Index of the most selective filter, or None if every filter matches SELECTIVE papers or more
+        best, best_n = None, self.SELECTIVE
+        for i, (source, _, arg) in enumerate(filters):
+            n = self.conn.execute(f"SELECT COUNT(*) FROM ({source} LIMIT ?)", [arg, best_n]).fetchone()[0]
+            if n < best_n:
+                best, best_n = i, n
+        return best
+
+    def _dates(self, since, until) -> tuple[list[str], list[str]]:
+        clauses, args = [], []
+        if since:
+            clauses.append("p.published >= ?")
+            args.append(since)
+        if until:
+            # '~' sorts after every character of an ISO timestamp, so the whole until day/month counts
+            clauses.append("p.published <= ?")
+            args.append(until + "~")
+        return clauses, args
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+
+def load_run(output_dir: str) -> tuple[list[dict], list[dict | None]]:
+    # Papers and matching analyses from one run's papers.json/stats.json (or the .jsonl pair)
+    if os.path.exists(os.path.join(output_dir, "papers.jsonl")):
+        papers = list(read_jsonl(os.path.join(output_dir, "papers.jsonl")))
+        stats_path = os.path.join(output_dir, "stats.jsonl")
+        rows = [r for r in read_jsonl(stats_path) if "arxiv_id" in r] if os.path.exists(stats_path) else []
+    else:
+        with open(os.path.join(output_dir, "papers.json"), "r", encoding="utf-8") as f:
+            papers = json.load(f)
+        stats_path = os.path.join(output_dir, "stats.json")
+        rows = []
+        if os.path.exists(stats_path):
+            with open(stats_path, "r", encoding="utf-8") as f:
+                rows = json.load(f).get("papers", [])
+    by_id = {r["arxiv_id"]: r for r in rows}
+    return papers, [by_id.get(p["arxiv_id"]) for p in papers]
+
+def ingest_runs(store_path: str, output_dirs: list[str]) -> None:
+    # Upsert earlier runs' output directories into the store
+    store = PaperStore(store_path)
+    for d in output_dirs:
+        papers, analyses = load_run(d)
+        written = 0
+        for i in range(0, len(papers), ANALYSIS_BATCH):
+            written += store.upsert_many(papers[i:i + ANALYSIS_BATCH], analyses[i:i + ANALYSIS_BATCH])
+        print(f"{d}: {len(papers)} papers, {written} new or changed", file=sys.stderr)
+    print(f"{store_path}: {store.count()} papers", file=sys.stderr)
+    store.close()
+
+def search_store(argv: list[str]) -> None:
+    # Offline query mode: one JSON object per matching paper on stdout
+    parser = argparse.ArgumentParser(prog=f"{sys.argv[0]} --search")
+    parser.add_argument("store")
+    parser.add_argument("--author")
+    parser.add_argument("--category")
+    parser.add_argument("--term", help="words that must all appear in the title or abstract")
+    parser.add_argument("--since", help="earliest published date, e.g. 2020 or 2020-01-31")
+    parser.add_argument("--until", help="latest published date (inclusive)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--facets", action="store_true", help="print match count and top categories/authors")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.store):
+        parser.error(f"no store at {args.store}")
+
+    store = PaperStore(args.store)
+    filters = dict(author=args.author, category=args.category, term=args.term, since=args.since,
+                   until=args.until)
+    t = time.perf_counter()
+    out = store.facets(**filters) if args.facets else store.search(**filters, limit=args.limit)
+    elapsed_ms = (time.perf_counter() - t) * 1000
+    store.close()
+    for row in ([out] if args.facets else out):
+        print(json.dumps(row, ensure_ascii=False))
+    print(f"{'facets' if args.facets else f'{len(out)} papers'} in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Everything fetch_with_retries may retry, and so may re-raise once it gives up
+NETWORK_ERRORS = (HTTPError, URLError, TimeoutError, ConnectionError, http.client.HTTPException)
+# Rate limiting/overload: the whole host waits, not just the URL that got the answer
+THROTTLE_STATUS = (429, 503)
+
+def parse_retry_after(value: str | None) -> float:
+    # Seconds requested by a Retry-After header (delta-seconds or HTTP-date), 0.0 if absent or invalid
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def retry_hint(ex: BaseException) -> tuple[float, bool] | None:
+    # None if the failure is not worth retrying, else (the server's Retry-After delay or 0.0,
+    # whether the whole host should back off)
+    if isinstance(ex, HTTPError):
+        if ex.code not in RETRY_STATUS:
+            return None
+        wait = parse_retry_after(ex.headers.get("Retry-After") if ex.headers else None)
+        return wait, ex.code in THROTTLE_STATUS or wait > 0
+    if isinstance(ex, URLError):
+        # DNS failures and redirect loops will not fix themselves; refused/reset/timeouts may
+        reason = ex.reason
+        return (0.0, False) if isinstance(reason, OSError) and not isinstance(reason, socket.gaierror) else None
+    if isinstance(ex, (TimeoutError, ConnectionError, http.client.HTTPException)):
+        return 0.0, False
+    return None
+
+class RetryScheduler:
+    # Decides when each host may be sent its next request and when failed URLs are retried.
+    # Every host has a token bucket (rate per second, burst) and a backoff time. A retry waits
+    # exponential backoff with full jitter, or the server's Retry-After if longer; throttling
+    # answers push the whole host's next slot out by that delay, other failures only delay
+    # the URL itself. Retries that could not start before the deadline are dropped.
+    def __init__(self, max_attempts: int = ARXIV_MAX_ATTEMPTS, base_sec: float = ARXIV_BACKOFF_BASE_SEC,
+                 cap_sec: float = ARXIV_BACKOFF_CAP_SEC, rate: float = 0.0, burst: int = 1,
+                 budget_sec: float = ARXIV_DEADLINE_SEC, rng=None):
+        self.max_attempts = max_attempts
+        self.base_sec = base_sec
+        self.cap_sec = cap_sec
+        self.rate = rate
+        self.burst = burst
+        self.deadline = time.monotonic() + budget_sec if budget_sec > 0 else math.inf
+        self.rng = rng or random.Random()
+        self._hosts: dict[str, list] = {}  # host -> [tokens, last refill, not before]
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.gave_up = 0
+
+    def _state(self, host: str, now: float) -> list:
+        st = self._hosts.get(host)
+        if st is None:
+            st = self._hosts[host] = [float(self.burst), now, 0.0]
+        elif self.rate > 0:
+            st[0] = min(float(self.burst), st[0] + (now - st[1]) * self.rate)
+        st[1] = now
+        return st
+
+    def ready_at(self, host: str) -> float:
+        # Earliest time.monotonic() at which host may be sent a request (in the past if already free)
+        with self._lock:
+            now = time.monotonic()
+            st = self._state(host, now)
+            t = st[2]
+            if self.rate > 0 and st[0] < 1:
+                t = max(t, now + (1 - st[0]) / self.rate)
+            return t
+
+    def take(self, host: str) -> None:
+        # Spend one of host's tokens (call when a request is actually sent)
+        with self._lock:
+            st = self._state(host, time.monotonic())
+            if self.rate > 0:
+                st[0] -= 1
+
+    def wait(self, host: str) -> None:
+        # Block until host is ready, then take its token
+        while (delay := self.ready_at(host) - time.monotonic()) > 0:
+            time.sleep(delay)
+        self.take(host)
+
+    def backoff(self, host: str, attempt: int, hint: tuple[float, bool] | None) -> float | None:
+        # After failed attempt number attempt (1-based) with retry_hint() hint: the delay
+        # before retrying, or None to give up
+        if hint is None or attempt >= self.max_attempts:
+            return None
+        retry_after, host_wide = hint
+        delay = max(retry_after, self.rng.uniform(0, min(self.cap_sec, self.base_sec * 2 ** (attempt - 1))))
+        with self._lock:
+            now = time.monotonic()
+            if now + delay > self.deadline:
+                self.gave_up += 1
+                return None
+            if host_wide:
+                st = self._state(host, now)
+                st[2] = max(st[2], now + delay)
+            self.retries += 1
+        return delay
+
+def fetch_with_retries(url: str, headers=None, scheduler: RetryScheduler | None = None) -> bytes:
+    # Fetch URL, retrying 429/5xx responses and connection errors as the scheduler allows.
+    # The caller paces the first attempt; retries wait for the host's backoff and token.
+    scheduler = scheduler or RetryScheduler()
+    host = urlsplit(url).netloc
     attempt = 0
     while True:
         attempt += 1
+        if attempt > 1:
+            scheduler.wait(host)
         try:
             req = Request(url, headers=headers or {"User-Agent": "ee547-arxiv-processor"})
             with urlopen(req, timeout=30) as resp:
                 return resp.read()
-        except HTTPError as e:
-            if e.code == 429 and attempt < max_retries:
-                time.sleep(sleep_seconds)
+        except NETWORK_ERRORS as e:
+            hint = retry_hint(e)
+            delay = scheduler.backoff(host, attempt, hint)
+            if delay is None:
+                raise
+            if not hint[1]:
+                time.sleep(delay)
+
+TOTAL_RESULTS_RE = re.compile(rb"<opensearch:totalResults[^>]*>\s*(\d+)\s*<")
+
+def query_url(query: str, start: int, max_results: int) -> str:
+    # Build one API request URL
+    params = {"search_query": query, "start": start, "max_results": max_results}
+    return f"{ARXIV_ENDPOINT}?{urlencode(params)}"
+
+def harvest_pages(query: str, max_results: int, page_size: int = ARXIV_PAGE_SIZE,
+                  scheduler: RetryScheduler | None = None, log: Logger | None = None, start: int = 0):
+    # Yield (start, count, xml_bytes) for successive pages from start until max_results,
+    # the feed's totalResults, or an empty page is reached. With a log, rate-limit
+    # waits and requests are timed as the "throttle" and "fetch" stages.
+    # The token bucket spaces requests ARXIV_MIN_INTERVAL apart, retries included
+    scheduler = scheduler or RetryScheduler(rate=1 / ARXIV_MIN_INTERVAL if ARXIV_MIN_INTERVAL > 0 else 0.0)
+    host = urlsplit(ARXIV_ENDPOINT).netloc
+    while start < max_results:
+        n = min(page_size, max_results - start)
+        t = time.perf_counter()
+        scheduler.wait(host)
+        t_fetch = time.perf_counter()
+        xml_bytes = fetch_with_retries(query_url(query, start, n), scheduler=scheduler)
+        if log is not None:
+            log.add_time("throttle", t_fetch - t)
+            log.add_time("fetch", time.perf_counter() - t_fetch, nbytes=len(xml_bytes))
+        yield start, n, xml_bytes
+        m = TOTAL_RESULTS_RE.search(xml_bytes)
+        if m:
+            max_results = min(max_results, int(m.group(1)))
+        if b"<entry" not in xml_bytes:
+            break
+        start += n
+
+def saved_pages(checkpoint: Checkpoint, run: str, max_results: int,
+                page_size: int = ARXIV_PAGE_SIZE) -> tuple[list[list[dict]], int, int]:
+    # The leading pages harvest run already fetched, as recorded by main(), plus the start
+    # and max_results to continue with; stops where harvest_pages() would, and at the first
+    # page that is missing or was requested with a different size
+    pages = []
+    start = 0
+    while start < max_results:
+        done = checkpoint.get(f"page:{start}")
+        n = min(page_size, max_results - start)
+        if done is None or done["result"]["run"] != run or done["result"]["count"] != n:
+            break
+        page = done["result"]
+        pages.append(page["papers"])
+        if page["total"] is not None:
+            max_results = min(max_results, page["total"])
+        if not page["papers"]:
+            return pages, start, start
+        start += n
+    return pages, start, max_results
+
+_DONE = object()
+
+def prefetch(iterable, depth: int = PREFETCH_PAGES):
+    # Run a generator in a background thread, buffering up to depth items, so
+    # the consumer's parsing/analysis overlaps with the producer's network waits.
+    # An exception in the producer is re-raised in the consumer at that point.
+    q: queue.Queue = queue.Queue(maxsize=depth)
+
+    def run():
+        try:
+            for item in iterable:
+                q.put((item, None))
+        except BaseException as e:
+            q.put((None, e))
+        q.put((_DONE, None))
+
+    threading.Thread(target=PROFILER.wrap(run), daemon=True).start()
+    while True:
+        item, exc = q.get()
+        if exc is not None:
+            raise exc
+        if item is _DONE:
+            return
+        yield item
+
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+ATOM_ENTRY = "{http://www.w3.org/2005/Atom}entry"
+PARSE_CHUNK = 64 * 1024
+
+def entry_to_paper(entry) -> dict:
+    # Extract metadata from one <entry>; raises ValueError if a required field is missing
+    ns = ATOM_NS
+    id_full = entry.findtext("atom:id", default="", namespaces=ns)
+    arxiv_id = id_full.rsplit("/", 1)[-1]
+    title = entry.findtext("atom:title", default="", namespaces=ns).strip()
+    summary = entry.findtext("atom:summary", default="", namespaces=ns).strip()
+    published = entry.findtext("atom:published", default="", namespaces=ns).strip()
+    updated = entry.findtext("atom:updated", default="", namespaces=ns).strip()
+    authors = [a.findtext("atom:name", default="", namespaces=ns).strip()
+               for a in entry.findall("atom:author", ns)]
+    categories = [c.attrib.get("term", "").strip()
+                  for c in entry.findall("atom:category", ns)]
+
+    # Skip if required fields are missing
+    if not (arxiv_id and title and summary and published and updated and authors and categories):
+        raise ValueError("missing required field(s)")
+
+    return {
+        "arxiv_id": arxiv_id,
+        "title": title,
+        "authors": authors,
+        "abstract": summary,
+        "categories": categories,
+        "published": published,
+        "updated": updated
+    }
+
+def _iter_entries(chunks, log: Logger):
+    # Yield paper dicts as each </entry> closes, then drop the element so the
+    # tree never grows; raises ET.ParseError on malformed XML
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
                 continue
-            raise
-        except URLError:
-            raise
+            if elem.tag != ATOM_ENTRY:
+                continue
+            try:
+                yield entry_to_paper(elem)
+            except Exception as e:
+                log.warning(f"Skipping paper due to missing/invalid fields: {e}")
+            elem.clear()
+            if root is not None:
+                root.remove(elem)
+    parser.close()
+
+def _byte_chunks(xml_bytes: bytes, size: int = PARSE_CHUNK):
+    # Split a buffer into parser-sized slices without copying it
+    view = memoryview(xml_bytes)
+    for i in range(0, len(view), size):
+        yield view[i:i + size]
 
-def parse_atom(xml_bytes: bytes, log_path: str):
-    # Parse Atom XML and extract metadata for each paper
+def iter_atom(source, log: Logger):
+    # Stream papers out of an Atom feed given as bytes or an iterable of byte chunks.
+    # Papers before a parse error are still yielded; the error is logged.
+    chunks = _byte_chunks(source) if isinstance(source, (bytes, bytearray)) else source
     try:
-        root = ET.fromstring(xml_bytes)
+        yield from _iter_entries(chunks, log)
     except ET.ParseError as e:
-        log_line(log_path, f"ERROR Invalid XML: {e}")
-        return []
+        log.error(f"Invalid XML: {e}")
 
-    ns = {"atom": "http://www.w3.org/2005/Atom"}
-    entries = []
-    for entry in root.findall("atom:entry", ns):
-        try:
-            id_full = entry.findtext("atom:id", default="", namespaces=ns)
-            arxiv_id = id_full.rsplit("/", 1)[-1]
-            title = entry.findtext("atom:title", default="", namespaces=ns).strip()
-            summary = entry.findtext("atom:summary", default="", namespaces=ns).strip()
-            published = entry.findtext("atom:published", default="", namespaces=ns).strip()
-            updated = entry.findtext("atom:updated", default="", namespaces=ns).strip()
-            authors = [a.findtext("atom:name", default="", namespaces=ns).strip()
-                       for a in entry.findall("atom:author", ns)]
-            categories = [c.attrib.get("term", "").strip()
-                          for c in entry.findall("atom:category", ns)]
-
-            # Skip if required fields are missing
-            if not (arxiv_id and title and summary and published and updated and authors and categories):
-                raise ValueError("missing required field(s)")
-
-            entries.append({
-                "arxiv_id": arxiv_id,
-                "title": title,
-                "authors": authors,
-                "abstract": summary,
-                "categories": categories,
-                "published": published,
-                "updated": updated
-            })
-        except Exception as e:
-            log_line(log_path, f"WARNING Skipping paper due to missing/invalid fields: {e}")
-    return entries
+def parse_atom(xml_bytes: bytes, log: Logger):
+    # Parse Atom XML and extract metadata for each paper (all or nothing on invalid XML)
+    try:
+        return list(_iter_entries(_byte_chunks(xml_bytes), log))
+    except ET.ParseError as e:
+        log.error(f"Invalid XML: {e}")
+        return []
 
 WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
 SENT_SPLIT_RE = re.compile(r"[\.!?]+")
@@ -154,18 +970,190 @@ def technical_terms(text: str):
         "hyphenated_terms": hyphen
     }
 
-def analyze_abstract(abstract: str):
-    # Perform word, sentence, and technical term analysis
+def analyze_abstract_legacy(abstract: str):
+    # Reference implementation: one scan of the text per statistic
     return {
         "word_frequency": word_stats(abstract),
         "sentence_analysis": sentence_stats(abstract),
         "technical_terms": technical_terms(abstract)
     }
 
+# One scan splits the text into term runs (group 1), sentence terminators (group 2)
+# and any other non-space text. Words and technical terms never cross a run boundary,
+# so both are derived from the (short) runs instead of rescanning the whole text.
+FUSED_RE = re.compile(r"([A-Za-z0-9'\-]+)|([.!?]+)|[^\sA-Za-z0-9'\-.!?]+")
+DIGIT_RE = re.compile(r"[0-9]")
+
+def analyze_abstract(abstract: str):
+    # Perform word, sentence, and technical term analysis in a single pass;
+    # output is identical to analyze_abstract_legacy
+    counts: dict[str, int] = {}
+    total = 0
+    total_len = 0
+    upper: set[str] = set()
+    numeric: set[str] = set()
+    hyphen: set[str] = set()
+
+    n_sent = 0
+    sent_words_sum = 0
+    longest = 0
+    shortest = 0
+    sent_words = 0
+    sent_open = False
+
+    for run, stop in FUSED_RE.findall(abstract):
+        if stop:
+            # Sentence terminator: close the sentence if it had any text
+            if sent_open:
+                if n_sent == 0 or sent_words > longest:
+                    longest = sent_words
+                if n_sent == 0 or sent_words < shortest:
+                    shortest = sent_words
+                n_sent += 1
+                sent_words_sum += sent_words
+            sent_words = 0
+            sent_open = False
+            continue
+        sent_open = True
+        if not run:
+            continue
+
+        if run.isalpha():
+            # Common case: the run is exactly one word and one term
+            words = (run,)
+            if not run.islower():
+                upper.add(run)
+        else:
+            words = WORD_RE.findall(run)
+            for t in run.split("'"):
+                if not t:
+                    continue
+                if t != t.lower():
+                    upper.add(t)
+                if DIGIT_RE.search(t):
+                    numeric.add(t)
+                if "-" in t and len(t) > 1:
+                    hyphen.add(t)
+
+        for w in words:
+            total += 1
+            total_len += len(w)
+            wlwr = w.lower()
+            if wlwr in STOPWORDS:
+                continue
+            counts[wlwr] = counts.get(wlwr, 0) + 1
+        sent_words += len(words)
+
+    if sent_open:
+        if n_sent == 0 or sent_words > longest:
+            longest = sent_words
+        if n_sent == 0 or sent_words < shortest:
+            shortest = sent_words
+        n_sent += 1
+        sent_words_sum += sent_words
+
+    if total == 0:
+        word_frequency = {
+            "total_word_count": 0,
+            "unique_word_count": 0,
+            "top_20_terms": [],
+            "avg_word_length": 0.0
+        }
+    else:
+        word_frequency = {
+            "total_word_count": total,
+            "unique_word_count": len(counts),
+            "top_20_terms": sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:20],
+            "avg_word_length": round(total_len / total, 3)
+        }
+
+    if n_sent == 0:
+        sentence_analysis = {
+            "total_sentence_count": 0,
+            "avg_words_per_sentence": 0.0,
+            "longest_sentence_words": 0,
+            "shortest_sentence_words": 0
+        }
+    else:
+        sentence_analysis = {
+            "total_sentence_count": n_sent,
+            "avg_words_per_sentence": round(sent_words_sum / n_sent, 3),
+            "longest_sentence_words": longest,
+            "shortest_sentence_words": shortest
+        }
+
+    return {
+        "word_frequency": word_frequency,
+        "sentence_analysis": sentence_analysis,
+        "technical_terms": {
+            "uppercase_terms": sorted(upper),
+            "numeric_terms": sorted(numeric),
+            "hyphenated_terms": sorted(hyphen)
+        }
+    }
+
+def abstract_hash(abstract: str) -> str:
+    # Content hash used to tell whether a stored analysis is still valid
+    return hashlib.sha256(abstract.encode("utf-8")).hexdigest()
+
+def analysis_workers(requested: int = ANALYSIS_WORKERS) -> int:
+    # Worker count for the analysis pool: explicit setting, else the CPUs we may run on
+    if requested > 0:
+        return requested
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def analyze_papers(papers: list[dict], checkpoint: Checkpoint, executor=None, workers: int = 1,
+                   resume: bool = RESUME) -> list[dict]:
+    # Analyze a batch of papers in input order, reusing checkpointed results for
+    # unchanged abstracts. With an executor, large batches are fanned out in chunks
+    # (one IPC round trip per chunk); results are identical to the serial path.
+    hashes = [abstract_hash(p["abstract"]) for p in papers]
+    results: list[dict | None] = [None] * len(papers)
+    todo = []
+    for i, (p, h) in enumerate(zip(papers, hashes)):
+        done = checkpoint.get(p["arxiv_id"]) if resume else None
+        if done is not None and done["hash"] == h:
+            results[i] = done["result"]
+        else:
+            todo.append(i)
+
+    abstracts = [papers[i]["abstract"] for i in todo]
+    if executor is not None and len(todo) >= ANALYSIS_MIN_PARALLEL:
+        chunksize = max(1, len(todo) // (workers * 4))
+        analyzed = executor.map(analyze_abstract, abstracts, chunksize=chunksize)
+    else:
+        analyzed = map(analyze_abstract, abstracts)
+
+    for i, analysis in zip(todo, analyzed):
+        p = papers[i]
+        results[i] = {"arxiv_id": p["arxiv_id"], **analysis}
+        checkpoint.record(p["arxiv_id"], hashes[i], results[i])
+    return results
+
 def main():
+    # Convert mode: rebuild the legacy JSON files from a streamed run
+    if len(sys.argv) == 3 and sys.argv[1] == "--convert":
+        convert_jsonl(sys.argv[2])
+        return
+
+    # Paper store modes: load earlier runs, or query the store offline
+    if len(sys.argv) >= 4 and sys.argv[1] == "--ingest":
+        ingest_runs(sys.argv[2], sys.argv[3:])
+        return
+    if len(sys.argv) >= 3 and sys.argv[1] == "--search":
+        search_store(sys.argv[2:])
+        return
+
     # Parse command-line arguments
     if len(sys.argv) != 4:
-        print(f"Usage: {sys.argv[0]} <search_query> <max_results 1..100> <output_dir>", file=sys.stderr)
+        print(f"Usage: {sys.argv[0]} <search_query> <max_results> <output_dir>", file=sys.stderr)
+        print(f"       {sys.argv[0]} --convert <output_dir>", file=sys.stderr)
+        print(f"       {sys.argv[0]} --ingest <store.db> <output_dir>...", file=sys.stderr)
+        print(f"       {sys.argv[0]} --search <store.db> [--author A] [--category C] [--term T] "
+              "[--since D] [--until D] [--limit N] [--facets]", file=sys.stderr)
         sys.exit(1)
 
     query = sys.argv[1]
@@ -176,48 +1164,148 @@ def main():
     # Paths for output files
     papers_json_path = os.path.join(output_dir, "papers.json")
     stats_json_path = os.path.join(output_dir, "stats.json")
-    log_path = os.path.join(output_dir, "processing.log")
+    log = Logger(os.path.join(output_dir, "processing.log"))
 
     # Log start
+    PROFILER.start()
     t0 = time.time()
-    log_line(log_path, f"Starting ArXiv query: {query}")
+    log.log(f"Starting ArXiv query: {query}", query=query, max_results=max_results)
+
+    checkpoint = Checkpoint(os.path.join(output_dir, "manifest.json"))
+    store = PaperStore(PAPER_STORE) if PAPER_STORE else None
+    header = {
+        "query": query,
+        "generated_at_utc": utc_now_iso(),
+        "total_papers": 0,
+        # False when a page failed after retries; failed_start is that page's offset
+        "complete": True,
+        "failed_start": None,
+    }
+    streaming = OUTPUT_FORMAT == "jsonl"
+    if streaming:
+        papers_out = JsonlWriter(os.path.join(output_dir, "papers.jsonl"))
+        stats_out = JsonlWriter(os.path.join(output_dir, "stats.jsonl"))
+    else:
+        entries: list[dict] = []
+        analyses: list[dict] = []
+
+    # Analysis pool only pays off for harvests; single pages stay serial
+    paged = max_results > ARXIV_PAGE_SIZE
+    workers = analysis_workers()
+    executor = ProcessPoolExecutor(max_workers=workers) if paged and workers > 1 else None
+    batch: list[dict] = []
+
+    def flush_batch():
+        # Analyze the pending batch and emit papers plus analyses in order
+        with log.stage("analyze", items=len(batch)):
+            results = analyze_papers(batch, checkpoint, executor, workers)
+        with log.stage("write", items=len(batch)):
+            for p, analysis in zip(batch, results):
+                if streaming:
+                    papers_out.write(p)
+                    stats_out.write(analysis)
+                else:
+                    entries.append(p)
+                    analyses.append(analysis)
+        if store is not None:
+            with log.stage("store", items=len(batch)):
+                store.upsert_many(batch, results)
+        batch.clear()
 
-    # Build query URL
-    params = {"search_query": query, "start": 0, "max_results": max_results}
-    url = f"{ARXIV_ENDPOINT}?{urlencode(params)}"
+    seen: set[str] = set()
 
-    # Fetch XML from ArXiv
+    def take(p: dict):
+        # Pages can overlap when results shift between requests
+        if p["arxiv_id"] in seen:
+            return
+        seen.add(p["arxiv_id"])
+        log.log(f"Processing paper: {p['arxiv_id']}", arxiv_id=p["arxiv_id"])
+        batch.append(p)
+        if len(batch) >= ANALYSIS_BATCH:
+            flush_batch()
+
+    # Every fetched page is checkpointed under the harvest's run id. RESUME=1 continues an
+    # interrupted harvest of the same query: its pages are replayed from the manifest and
+    # fetching starts at the first page it did not get
+    start, limit, run = 0, max_results, header["generated_at_utc"]
+    harvest = (checkpoint.get("harvest") or {}).get("result")
+    if RESUME and harvest is not None and harvest["query"] == query and not harvest["complete"]:
+        run = harvest["run"]
+        pages, start, limit = saved_pages(checkpoint, run, max_results)
+        for page in pages:
+            for p in page:
+                take(p)
+        if pages:
+            log.log(f"Resumed {len(pages)} fetched pages, continuing at start={start}", pages=len(pages), start=start)
+    else:
+        checkpoint.record("harvest", None, {"query": query, "run": run, "complete": False})
+
+    # Fetch pages in the background while earlier pages are parsed and analyzed
+    next_start = start
     try:
-        xml_bytes = fetch_with_retries(url)
-    except (HTTPError, URLError) as e:
-        log_line(log_path, f"ERROR Network error: {e}")
-        sys.exit(1)
+        for start, n, xml_bytes in log.timed(prefetch(harvest_pages(query, limit, log=log, start=start)),
+                                             "fetch_wait"):
+            # Parse XML response; harvested pages are streamed entry by entry
+            if paged:
+                page = log.timed(iter_atom(xml_bytes, log), "parse")
+            else:
+                with log.stage("parse", nbytes=len(xml_bytes)):
+                    page = parse_atom(xml_bytes, log)
+                METRICS.observe("parse", items=len(page))
+                log.log(f"Fetched {len(page)} results from ArXiv API", results=len(page))
 
-    # Parse XML response
-    entries = parse_atom(xml_bytes, log_path)
-    log_line(log_path, f"Fetched {len(entries)} results from ArXiv API")
+            papers = []
+            for p in page:
+                papers.append(p)
+                take(p)
+            m = TOTAL_RESULTS_RE.search(xml_bytes)
+            checkpoint.record(f"page:{start}", None, {"run": run, "count": n, "papers": papers,
+                                                      "total": int(m.group(1)) if m else None})
+            if paged:
+                log.log(f"Fetched {len(papers)} results from ArXiv API (start={start})",
+                        results=len(papers), start=start)
+            next_start = start + n
+    except NETWORK_ERRORS as e:
+        log.error(f"Network error: {e!r}")
+        header["complete"] = False
+        header["failed_start"] = next_start
+        # Nothing fetched at all: fail like a single-request run
+        if not seen:
+            sys.exit(1)
+    else:
+        checkpoint.record("harvest", None, {"query": query, "run": run, "complete": True})
+    flush_batch()
+    if executor is not None:
+        executor.shutdown()
+    header["total_papers"] = len(seen)
 
-    # Write metadata to papers.json
-    with open(papers_json_path, "w", encoding="utf-8") as f:
-        json.dump(entries, f, ensure_ascii=False, indent=2)
+    with log.stage("write"):
+        if streaming:
+            # The header goes last because the total is only known now
+            stats_out.write(header)
+            papers_out.close()
+            stats_out.close()
+        else:
+            # Write metadata to papers.json
+            with open(papers_json_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
 
-    # Analyze abstracts and write to stats.json
-    stats = {
-        "query": query,
-        "generated_at_utc": utc_now_iso(),
-        "total_papers": len(entries),
-        "papers": []
-    }
-    for p in entries:
-        log_line(log_path, f"Processing paper: {p['arxiv_id']}")
-        stats["papers"].append({"arxiv_id": p["arxiv_id"], **analyze_abstract(p["abstract"])})
+            # Write abstract analyses to stats.json
+            with open(stats_json_path, "w", encoding="utf-8") as f:
+                json.dump({**header, "papers": analyses}, f, ensure_ascii=False, indent=2)
 
-    with open(stats_json_path, "w", encoding="utf-8") as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
+    checkpoint.close()
+    if store is not None:
+        store.close()
+    elapsed = time.time() - t0
 
     # Log completion
-    elapsed = time.time() - t0
-    log_line(log_path, f"Completed processing: {len(entries)} papers in [{elapsed:.2f}] seconds")
+    log.log(f"Completed processing: {len(seen)} papers in [{elapsed:.2f}] seconds",
+            papers=len(seen), elapsed_sec=round(elapsed, 3), stages=log.timings())
+    log.close()
+    PROFILER.dump(os.path.join(output_dir, "profile.pstats"))
+    METRICS.write(os.path.join(output_dir, "metrics.json"), tool="arxiv_processor", query=query,
+                  papers=len(seen), analysis_workers=workers if executor is not None else 1)
 
 if __name__ == "__main__":
     main()
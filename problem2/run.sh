@@ -11,13 +11,14 @@ QUERY="$1"
 MAX_RESULTS="$2"
 OUTPUT_DIR="$3"
 
-# Validate that max_results is an integer between 1 and 100
+# Validate that max_results is an integer between 1 and 30000
+# (above 100 the processor pages through results; arXiv serves at most 30000 per query)
 if ! [[ "$MAX_RESULTS" =~ ^[0-9]+$ ]]; then
   echo "Error: max_results must be an integer"
   exit 1
 fi
-if [ "$MAX_RESULTS" -lt 1 ] || [ "$MAX_RESULTS" -gt 100 ]; then
-  echo "Error: max_results must be between 1 and 100"
+if [ "$MAX_RESULTS" -lt 1 ] || [ "$MAX_RESULTS" -gt 30000 ]; then
+  echo "Error: max_results must be between 1 and 30000"
   exit 1
 fi
 
@@ -1,73 +1,456 @@
 #!/usr/bin/env python3
-import json, os, re, time
+import cProfile, hashlib, heapq, json, math, mmap, os, pickle, re, resource, struct, threading, time
+from array import array
 from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from glob import glob
-from itertools import combinations
+from itertools import combinations, filterfalse, repeat
+from operator import add, mul
 
 STATUS_PROCESS="/shared/status/process_complete.json"
+STATUS_DONE="/shared/status/analyze_complete.json"
+PROCESSED_QUEUE="/shared/queue/processed.ready"
+POLL_SEC=float(os.environ.get("PIPELINE_POLL_SEC","0.2"))
+# Set to the same value for all three stages, PIPELINE_RUN_ID ties queues and done markers to one run, so
+# stages started together on a reused /shared never act on the last run's files. Leave it unset to rerun
+# only later stages against an earlier run's output, starting them upstream first.
+RUN_ID=os.environ.get("PIPELINE_RUN_ID","")
+# Corpus statistics carried between runs. docker-compose keeps them on a bind mount, since
+# run_pipeline.sh wipes the shared volume before every run
+STATE_PATH=os.environ.get("CORPUS_STATE","/shared/analysis/corpus_state.pkl")
+TOKENS_PATH="/shared/processed/corpus.tok"
+# METRICS=1 writes /shared/status/analyze_metrics.json (per-step latency percentiles, throughput,
+# peak RSS); PROFILE=1 dumps cProfile stats to /shared/status/analyze_profile.pstats
+METRICS_ON=os.environ.get("METRICS","0")=="1"
+PROFILE_ON=os.environ.get("PROFILE","0")=="1"
+# Similarity: "exact" scores every pair; "minhash" scores only LSH candidate pairs.
+# TOP_K/MIN trim the pair list (0 = keep all). BINS/BANDS trade MinHash accuracy for speed;
+# MINHASH_EXACT=1 scores candidates with exact Jaccard, 0 reports the MinHash estimate.
+SIM_MODE=os.environ.get("SIMILARITY_MODE","exact")
+SIM_TOP_K=int(os.environ.get("SIMILARITY_TOP_K","0"))
+SIM_MIN=float(os.environ.get("SIMILARITY_MIN","0"))
+MINHASH_BINS=int(os.environ.get("MINHASH_BINS","128"))
+LSH_BANDS=int(os.environ.get("LSH_BANDS","32"))
+MINHASH_EXACT=os.environ.get("MINHASH_EXACT","1")=="1"
+# A page served by several URLs is processed once. REPORT_DUPLICATES=per_url still counts it once per URL
+# (word counts, similarity pairs), as if each had been fetched separately; "once" counts it a single
+# time, under the first URL that served it.
+REPORT_DUPLICATES=os.environ.get("REPORT_DUPLICATES","per_url")
+# Latency samples and item/byte totals per step; a disabled instance ignores every call
+class Metrics:
+    def __init__(self,enabled=METRICS_ON):
+        self.enabled=enabled; self.lock=threading.Lock(); self.stages={}; self.t0=time.perf_counter()
+
+    def observe(self,stage,sec=None,items=0,nbytes=0):
+        if not self.enabled: return
+        with self.lock:
+            st=self.stages.setdefault(stage,{"samples":[],"items":0,"bytes":0})
+            if sec is not None: st["samples"].append(sec)
+            st["items"]+=items; st["bytes"]+=nbytes
+
+    @contextmanager
+    def timer(self,stage,items=0,nbytes=0):
+        t=time.perf_counter()
+        try: yield
+        finally: self.observe(stage,time.perf_counter()-t,items,nbytes)
+
+    def report(self,**extra):
+        wall=time.perf_counter()-self.t0; stages={}
+        for name,st in self.stages.items():
+            s=sorted(st["samples"]); row={"count":len(s),"total_sec":round(sum(s),6)}
+            if s:
+                row.update({f"p{p}_ms":round(s[max(0,math.ceil(p/100*len(s))-1)]*1000,3) for p in (50,95,99)})
+                row["max_ms"]=round(s[-1]*1000,3)
+            if st["items"]: row.update(items=st["items"],items_per_sec=round(st["items"]/wall,3))
+            if st["bytes"]: row.update(bytes=st["bytes"],bytes_per_sec=round(st["bytes"]/wall,1))
+            stages[name]=row
+        rss=lambda who: round(resource.getrusage(who).ru_maxrss/1024,1)
+        return {**extra,"wall_clock_seconds":round(wall,3),
+                "peak_rss_mb":{"self":rss(resource.RUSAGE_SELF),"children":rss(resource.RUSAGE_CHILDREN)},"stages":stages}
+
+METRICS=Metrics()
+
 STOPWORDS=set("a an and are as at be by for from has have in is it its of on or that the this to was were will with".split())
 
 def tokenize(text): return [w for w in re.findall(r"[a-z]+",text.lower()) if w not in STOPWORDS]
 def ngrams(tokens,n): return [" ".join(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
 def jaccard(a,b): return len(a&b)/len(a|b) if a|b else 0.0
 
-def readability(all_tokens,sents):
-    tot=sum(len(t) for t in all_tokens); uniq=len(set(sum(all_tokens,[])))
-    tot_sent=sum(sents)
-    avg_sent=tot/tot_sent if tot_sent else 0.0
-    avg_word=(sum(len(w) for t in all_tokens for w in t)/tot) if tot else 0.0
-    comp=uniq/tot if tot else 0.0
-    return {"avg_sentence_length":round(avg_sent,4),"avg_word_length":round(avg_word,4),"complexity_score":round(comp,4)}
+def jaccard_sized(a,b):
+    # Same value as jaccard(), without building the union set
+    inter=len(a&b); union=len(a)+len(b)-inter
+    return inter/union if union else 0.0
+
+M64=(1<<64)-1
+def mix64(x):
+    x=(x+0x9E3779B97F4A7C15)&M64
+    x=((x^(x>>30))*0xBF58476D1CE4E5B9)&M64
+    x=((x^(x>>27))*0x94D049BB133111EB)&M64
+    return x^(x>>31)
+
+# One-permutation MinHash: hash every element once, keep the minimum per bin, then fill
+# empty bins from the next non-empty one (rotation densification). O(|set|) per document.
+def minhash(hashes,bins):
+    empty=M64+1; sig=[empty]*bins
+    for h in hashes:
+        b=h%bins; v=h//bins
+        if v<sig[b]: sig[b]=v
+    if empty in sig and len(set(sig))>1:
+        orig=sig[:]
+        for b in range(bins):
+            if orig[b]==empty:
+                off=1
+                while orig[(b+off)%bins]==empty: off+=1
+                sig[b]=orig[(b+off)%bins]+off*empty
+    return sig
+
+def minhash_estimate(s1,s2): return sum(a==b for a,b in zip(s1,s2))/len(s1)
+
+def lsh_candidates(sigs,bands):
+    # Pairs of documents (indexes) that share at least one band of their signatures
+    rows=max(1,len(sigs[0])//bands) if sigs else 1; pairs=set()
+    for band in range(bands):
+        buckets={}
+        for i,sig in enumerate(sigs):
+            if sig is None: continue
+            buckets.setdefault(tuple(sig[band*rows:(band+1)*rows]),[]).append(i)
+        for members in buckets.values():
+            if len(members)>1: pairs.update(combinations(members,2))
+    return sorted(pairs)
+
+# N-grams are counted as integers packed from word ids (key*ID_BASE+id per position) instead of
+# joined strings; only the reported top-k are turned back into text. An odd multiplier rather than a
+# shift mixes every id into the low bits a dict indexes by, which a shift leaves to the last id alone.
+ID_BASE=2654435761  # above any word id
+def pack_ngrams(ids,n):
+    keys=ids
+    for i in range(1,n): keys=list(map(add,map(mul,keys,repeat(ID_BASE)),ids[i:]))
+    return keys
+def unpack_ngram(key,n):
+    out=[]
+    for _ in range(n): key,i=divmod(key,ID_BASE); out.append(i)
+    return out[::-1]
+
+# NGRAM_CAPACITY>0 bounds the bigram/trigram tables Space-Saving style: once a table holds twice
+# the capacity it is cut back to the `capacity` heaviest keys, and keys seen later start from the
+# largest count cut so far (the floor). Reported counts then over-estimate by at most the floor,
+# and every n-gram that truly occurs more often than the floor is kept.
+NGRAM_CAPACITY=int(os.environ.get("NGRAM_CAPACITY","0"))
+
+# Mergeable corpus statistics: add() costs O(document length) and merge() combines two states.
+# Documents are kept as word-id arrays (4 bytes a token), which similarity() turns into sets and
+# top() rescans to order tied counts exactly as a from-scratch Counter over documents in name order.
+class CorpusStats:
+    VERSION=5
+
+    def __init__(self,capacity=None):
+        self.version=self.VERSION; self.capacity=NGRAM_CAPACITY if capacity is None else capacity
+        self.words=Counter(); self.bigrams=Counter(); self.trigrams=Counter()  # keyed by word id / packed ids
+        self.floor_b=0; self.floor_t=0
+        self.vocab={}; self.vocab_words=[]  # word <-> integer id
+        self.docs={}  # name -> {"fp","hash","ids" (array of word ids),"sents"}
+        self.total_words=0; self.total_chars=0; self.total_sents=0
+
+    def _ids(self,toks):
+        vocab=self.vocab; words=self.vocab_words
+        for w in dict.fromkeys(toks):
+            if w not in vocab: vocab[w]=len(words); words.append(w)
+        return list(map(vocab.__getitem__,toks))
+
+    @staticmethod
+    def _count(counter,grams,floor=0):
+        # Keys new to a bounded table start at its floor (set with dict.update: Counter.update would
+        # add them one by one in Python)
+        if floor: dict.update(counter,dict.fromkeys(filterfalse(counter.__contains__,grams),floor))
+        counter.update(grams)
+
+    def _prune(self,counter,floor):
+        # Cut a table back to the heaviest `capacity` keys; returns the new floor
+        if not self.capacity or len(counter)<=2*self.capacity: return floor
+        cut=sorted(counter.values(),reverse=True)[self.capacity]
+        keep={g:c for g,c in counter.items() if c>cut}
+        counter.clear(); counter.update(keep)
+        return max(floor,cut)
+
+    def add(self,name,toks,sents,fp=None,text_hash=None):
+        ids=self._ids(toks)
+        self._count(self.words,ids)
+        self._count(self.bigrams,pack_ngrams(ids,2),self.floor_b)
+        self._count(self.trigrams,pack_ngrams(ids,3),self.floor_t)
+        self.floor_b=self._prune(self.bigrams,self.floor_b)
+        self.floor_t=self._prune(self.trigrams,self.floor_t)
+        self.docs[name]={"fp":fp,"hash":text_hash,"ids":array("I",ids),"sents":sents}
+        self.total_words+=len(toks); self.total_chars+=sum(map(len,toks)); self.total_sents+=sents
+
+    def merge(self,other):
+        # Re-key the other state's word ids into this vocabulary
+        remap=self._ids(other.vocab_words)
+        def rekey(key,n):
+            out=0
+            for i in unpack_ngram(key,n): out=out*ID_BASE+remap[i]
+            return out
+        for name,doc in other.docs.items():
+            self.docs[name]={**doc,"ids":array("I",map(remap.__getitem__,doc["ids"]))}
+        # Bounded tables: a key missing on one side may have been cut there with up to that side's floor,
+        # so it is counted at the floor, as add() does for keys it has not seen, to keep over-estimating
+        for mine,theirs,n,floor,their_floor in ((self.words,other.words,1,0,0),
+                                                (self.bigrams,other.bigrams,2,self.floor_b,other.floor_b),
+                                                (self.trigrams,other.trigrams,3,self.floor_t,other.floor_t)):
+            theirs={rekey(g,n):c for g,c in theirs.items()}
+            if their_floor:
+                for g in mine.keys()-theirs.keys(): mine[g]+=their_floor
+            if floor:
+                for g in theirs.keys()-mine.keys(): theirs[g]+=floor
+            mine.update(theirs)
+        self.floor_b+=other.floor_b; self.floor_t+=other.floor_t
+        self.floor_b=self._prune(self.bigrams,self.floor_b)
+        self.floor_t=self._prune(self.trigrams,self.floor_t)
+        self.total_words+=other.total_words; self.total_chars+=other.total_chars; self.total_sents+=other.total_sents
+        return self
+
+    def top(self,counter,k,n):
+        # The k heaviest n-grams (n=1: words), tied counts in order of first occurrence over the documents
+        # in name order. Only keys at or above the k-th count can place, so the rescan stops once all of
+        # those above it and enough of those at it have been seen.
+        counts=heapq.nlargest(k,counter.values())
+        if not counts: return []
+        cut=counts[-1]; above=sum(c>cut for c in counts); at=k-above; seen={}
+        for name in sorted(self.docs):
+            ids=self.docs[name]["ids"]
+            for g in dict.fromkeys(ids if n==1 else pack_ngrams(ids,n)):
+                c=counter.get(g,0)
+                if c<cut or g in seen: continue
+                seen[g]=len(seen)
+                if c>cut: above-=1
+                else: at-=1
+            if above<=0 and at<=0: break
+        return sorted(seen.items(),key=lambda kv:(-counter[kv[0]],kv[1]))[:k]
+
+    def top_terms(self,counter,k,n):
+        words=self.vocab_words
+        return [(" ".join(words[i] for i in unpack_ngram(g,n)),counter[g]) for g,_ in self.top(counter,k,n)]
+
+    def readability(self):
+        tot=self.total_words; uniq=len(self.words)
+        avg_sent=tot/self.total_sents if self.total_sents else 0.0
+        avg_word=self.total_chars/tot if tot else 0.0
+        comp=uniq/tot if tot else 0.0
+        return {"avg_sentence_length":round(avg_sent,4),"avg_word_length":round(avg_word,4),"complexity_score":round(comp,4)}
+
+    def similarity(self,mode=None,top_k=None,min_sim=None,bins=None,bands=None,exact=None):
+        mode=mode or SIM_MODE; top_k=SIM_TOP_K if top_k is None else top_k; min_sim=SIM_MIN if min_sim is None else min_sim
+        names=sorted(self.docs); sets=[frozenset(self.docs[n]["ids"]) for n in names]
+        if mode=="minhash":
+            bins=bins or MINHASH_BINS; bands=bands or LSH_BANDS
+            exact=MINHASH_EXACT if exact is None else exact
+            hashes=[mix64(i) for i in range(len(self.vocab))]
+            sigs=[minhash([hashes[i] for i in st],bins) if st else None for st in sets]
+            scored=((i,j,jaccard_sized(sets[i],sets[j]) if exact else minhash_estimate(sigs[i],sigs[j]))
+                    for i,j in lsh_candidates(sigs,bands))
+        else:
+            scored=((i,j,jaccard_sized(sets[i],sets[j])) for i,j in combinations(range(len(names)),2))
+        if min_sim>0: scored=(x for x in scored if x[2]>=min_sim)
+        if top_k>0: scored=sorted(heapq.nlargest(top_k,scored,key=lambda x:x[2]),key=lambda x:(-x[2],x[0],x[1]))
+        return [{"doc1":names[i],"doc2":names[j],"similarity":round(sim,6)} for i,j,sim in scored]
+
+    def report(self):
+        tot=self.total_words
+        with METRICS.timer("similarity"): sim=self.similarity()
+        report={"processing_timestamp":datetime.now(timezone.utc).isoformat(),
+                "documents_processed":len(self.docs),
+                "total_words":tot,
+                "unique_words":len(self.words),
+                "top_100_words":[{"word":w,"count":c,"frequency":round(c/tot,6)} for w,c in self.top_terms(self.words,100,1)],
+                "document_similarity":sim,
+                "top_bigrams":[{"bigram":g,"count":c} for g,c in self.top_terms(self.bigrams,50,2)],
+                "top_trigrams":[{"trigram":g,"count":c} for g,c in self.top_terms(self.trigrams,50,3)],
+                "readability":self.readability()}
+        if self.capacity: report["ngram_count_error_bound"]={"bigrams":self.floor_b,"trigrams":self.floor_t}
+        return report
+
+    def save(self,path):
+        tmp=path+".tmp"
+        with open(tmp,"wb") as f: pickle.dump(self,f,protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp,path)
+
+    @classmethod
+    def load(cls,path):
+        if not os.path.exists(path): return cls()
+        try:
+            with open(path,"rb") as f: state=pickle.load(f)
+        except Exception:
+            return cls()
+        # A state built under another n-gram capacity would mix exact and bounded counts
+        if getattr(state,"version",1)!=cls.VERSION or state.capacity!=NGRAM_CAPACITY: return cls()
+        return state
+
+def write_atomic(path,text):
+    tmp=path+".tmp"
+    with open(tmp,"w") as f: f.write(text)
+    os.replace(tmp,path)
+
+def this_run(marker):
+    # A done marker counts only if this run wrote it (any marker when PIPELINE_RUN_ID is unset)
+    if not os.path.exists(marker): return False
+    if not RUN_ID: return True
+    try:
+        with open(marker) as f: return json.load(f).get("run_id")==RUN_ID
+    except (OSError,ValueError): return False
+
+# Yield names appended to an upstream queue file as they appear, until the upstream
+# done marker exists and the queue is drained. Without a queue file (older processor),
+# fall back to globbing fallback once the done marker appears. A queue opens with a
+# "#run <id>" line; one from another run is left alone until upstream rewrites it.
+def stream_ready(queue_path,done_path,fallback):
+    pos=0; buf=""
+    while True:
+        done=this_run(done_path)
+        lines=[]
+        if os.path.exists(queue_path):
+            with open(queue_path) as f:
+                # Shorter than what was read: upstream restarted and rewrote it, so start over
+                if f.seek(0,2)<pos: pos=0; buf=""
+                f.seek(pos); data=f.read(); pos=f.tell()
+            buf+=data; *lines,buf=buf.split("\n")
+            if RUN_ID and lines and lines[0].startswith("#run ") and lines[0]!=f"#run {RUN_ID}": pos=0; buf=""; lines=[]
+        elif done:
+            lines=[os.path.basename(p) for p in sorted(glob(fallback))]
+        yield from (l for l in lines if l and not l.startswith("#"))
+        if done: return
+        if not lines: time.sleep(POLL_SEC)
+
+# Reader for the processor's PROCESSED_FORMAT=tokens output (record layout in processor/process.py).
+# The file is mmapped and indexed as it grows; a document's ids become references into one shared
+# word list, so loading it allocates no per-word strings and never parses JSON or re-tokenizes.
+class TokenStore:
+    def __init__(self,path):
+        self.path=path; self.mm=None; self.head=b""; self.pos=0; self.words=[]; self.index={}
+
+    def refresh(self):
+        try: size=os.path.getsize(self.path)
+        except OSError: return
+        if size==self.pos: return
+        if self.mm: self.mm.close()
+        if not size: self.__init__(self.path); return
+        with open(self.path,"rb") as f: self.mm=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        mm=self.mm; pos=self.pos
+        if size<pos or mm[:len(self.head)]!=self.head:
+            # Rewritten by a new processor run: start over
+            self.head=b""; pos=0; self.words=[]; self.index={}
+        while pos+5<=size:
+            kind,n=struct.unpack_from("<cI",mm,pos); body=pos+5
+            if body+n>size: break  # record still being written
+            if kind==b"H": self.head=mm[pos:body+n]
+            elif kind==b"V": self.words.extend(mm[body:body+n].decode().split("\n"))
+            else:
+                ln,sents=struct.unpack_from("<HI",mm,body); start=body+6+ln
+                self.index[mm[body+6:start].decode()]=(start,body+n,sents)
+            pos=body+n
+        self.pos=pos
+
+    def __contains__(self,name):
+        if name not in self.index: self.refresh()
+        return name in self.index
+
+    def digest(self,name):
+        start=self.index[name][0]; return self.mm[start:start+32].hex()
+
+    def load(self,name):
+        start,end,sents=self.index[name]; words=self.words
+        return [words[i] for i in array("I",self.mm[start+32:end])],sents,self.digest(name)
+
+# The text's sha256 from the queue line or the token store; file size and mtime only for documents
+# from an older processor, which come with neither
+def fingerprint(name,store,digest=None):
+    if digest is None and name in store: digest=store.digest(name)
+    if digest: return ("text",digest)
+    st=os.stat(f"/shared/processed/{name}"); return (st.st_size,st.st_mtime_ns)
+
+def load_doc(name,store):
+    if name in store: return store.load(name)
+    with open(f"/shared/processed/{name}") as f: d=json.load(f)
+    text=d.get("text",""); toks=tokenize(text)
+    sc=d.get("statistics",{}).get("sentence_count",0)
+    if not sc: sc=max(1,text.count(".")+text.count("!")+text.count("?"))
+    return toks,sc,hashlib.sha256(text.encode()).hexdigest()
+
+# load_doc() once per source for the run: a page served under several URLs is read and tokenized
+# once. Documents are kept as word ids into one shared word list, 4 bytes a token.
+class DocCache:
+    def __init__(self): self.ids={}; self.words=[]; self.docs={}
+
+    def load(self,source,store):
+        hit=self.docs.get(source)
+        if hit:
+            words=self.words; return [words[i] for i in hit[0]],hit[1],hit[2]
+        toks,sc,h=load_doc(source,store); ids=self.ids; words=self.words
+        for w in dict.fromkeys(toks):
+            if w not in ids: ids[w]=len(words); words.append(w)
+        self.docs[source]=(array("I",map(ids.__getitem__,toks)),sc,h)
+        return toks,sc,h
+
+# Fold a document (read from source, default name) into the persisted state; False means the
+# state can't absorb it (a known document whose text changed) and must be rebuilt
+def absorb(state,name,store,source=None,digest=None,cache=None):
+    source=source or name; fp=fingerprint(source,store,digest); doc=state.docs.get(name)
+    if doc and doc["fp"]==fp: return True
+    toks,sc,h=cache.load(source,store) if cache else load_doc(source,store)
+    if doc:
+        if doc["hash"]!=h: return False
+        doc["fp"]=fp; return True
+    state.add(name,toks,sc,fp,h); return True
+
+def finish(prof,docs):
+    if prof: prof.disable(); prof.dump_stats("/shared/status/analyze_profile.pstats")
+    if METRICS.enabled:
+        write_atomic("/shared/status/analyze_metrics.json",json.dumps(METRICS.report(tool="analyzer",documents=docs),indent=2))
 
 def main():
     print(f"[{datetime.now(timezone.utc).isoformat()}] Analyzer start",flush=True)
-    while not os.path.exists(STATUS_PROCESS):
-        print("Waiting for process_complete.json ...",flush=True); time.sleep(2)
-
+    prof=cProfile.Profile() if PROFILE_ON else None
+    if prof: prof.enable()
     os.makedirs("/shared/analysis",exist_ok=True)
-    processed=sorted(glob("/shared/processed/*.json"))
+    os.makedirs(os.path.dirname(STATE_PATH),exist_ok=True)
+    if os.path.exists(STATUS_DONE): os.remove(STATUS_DONE)
+
+    # Fold each document into the persisted statistics as soon as the processor publishes it
+    print("Waiting for processed documents ...",flush=True)
+    # Queue lines are "<content>.json <page>.json <text sha256>" (or just a name from older processors);
+    # sources maps document -> (content, digest)
+    state=CorpusStats.load(STATE_PATH); store=TokenStore(TOKENS_PATH); sources={}; contents=set(); skipped=set(); consistent=True
+    cache=DocCache()
+    for line in stream_ready(PROCESSED_QUEUE,STATUS_PROCESS,"/shared/processed/*.json"):
+        source,name,digest=(line.split()+[None,None])[:3]; name=name or source
+        if name in sources or name in skipped: continue
+        if REPORT_DUPLICATES=="once" and source in contents: skipped.add(name); continue
+        sources[name]=(source,digest); contents.add(source)
+        with METRICS.timer("absorb",items=1): consistent=absorb(state,name,store,source,digest,cache) and consistent
+    names=sources.keys()
 
-    if not processed:
+    # Changed or vanished documents can't be subtracted out: rebuild from this run's files
+    if not consistent or set(state.docs)-names:
+        with METRICS.timer("rebuild",items=len(names)):
+            state=CorpusStats()
+            for name in sorted(names): absorb(state,name,store,*sources[name],cache)
+
+    if not names:
         report={"processing_timestamp":datetime.now(timezone.utc).isoformat(),
                 "documents_processed":0,"total_words":0,"unique_words":0,
                 "top_100_words":[],"document_similarity":[],"top_bigrams":[],"top_trigrams":[],
                 "readability":{"avg_sentence_length":0.0,"avg_word_length":0.0,"complexity_score":0.0}}
-        with open("/shared/analysis/final_report.json","w") as f: json.dump(report,f,indent=2)
+        write_atomic("/shared/analysis/final_report.json",json.dumps(report,indent=2))
+        finish(prof,0)
         print("Analyzer: no processed documents. Wrote empty report.",flush=True)
         return
 
-    docs=[]; names=[]; sents=[]
-    for p in processed:
-        with open(p) as f: d=json.load(f)
-        text=d.get("text",""); toks=tokenize(text)
-        docs.append(toks); names.append(os.path.basename(p))
-        sc=d.get("statistics",{}).get("sentence_count",0)
-        if not sc: sc=max(1,text.count(".")+text.count("!")+text.count("?"))
-        sents.append(sc)
-
-    counter=Counter(); [counter.update(t) for t in docs]
-    top100=[{"word":w,"count":c,"frequency":round(c/sum(counter.values()),6)} for w,c in counter.most_common(100)]
-
-    sim=[{"doc1":names[i],"doc2":names[j],"similarity":round(jaccard(set(docs[i]),set(docs[j])),6)} for i,j in combinations(range(len(docs)),2)]
-
-    big=Counter(); tri=Counter()
-    for t in docs: big.update(ngrams(t,2)); tri.update(ngrams(t,3))
-    top_b=[{"bigram":bg,"count":c} for bg,c in big.most_common(50)]
-    top_t=[{"trigram":tg,"count":c} for tg,c in tri.most_common(50)]
-
-    report={"processing_timestamp":datetime.now(timezone.utc).isoformat(),
-            "documents_processed":len(processed),
-            "total_words":sum(len(t) for t in docs),
-            "unique_words":len(set(sum(docs,[]))),
-            "top_100_words":top100,
-            "document_similarity":sim,
-            "top_bigrams":top_b,
-            "top_trigrams":top_t,
-            "readability":readability(docs,sents)}
-
-    with open("/shared/analysis/final_report.json","w") as f: json.dump(report,f,indent=2)
-    with open("/shared/status/analyze_complete.json","w") as f: json.dump({"timestamp":datetime.now(timezone.utc).isoformat()},f,indent=2)
+    with METRICS.timer("save_state"): state.save(STATE_PATH)
+    with METRICS.timer("report"): report=state.report()
+    if REPORT_DUPLICATES=="once": report["duplicate_documents_skipped"]=len(skipped)
+
+    with METRICS.timer("write_report"): write_atomic("/shared/analysis/final_report.json",json.dumps(report,indent=2))
+    finish(prof,len(names))
+    write_atomic(STATUS_DONE,json.dumps({"timestamp":datetime.now(timezone.utc).isoformat(),"run_id":RUN_ID},indent=2))
     print(f"[{datetime.now(timezone.utc).isoformat()}] Analyzer done",flush=True)
 
 if __name__=="__main__":
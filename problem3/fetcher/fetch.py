@@ -1,52 +1,391 @@
 #!/usr/bin/env python3
-import json, os, sys, time, urllib.request
+import cProfile, hashlib, heapq, http.client, json, math, os, random, resource, socket, sys, threading, time, uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+
+HEADERS={"User-Agent": "Mozilla/5.0 (EE547-HW1)"}
+REDIRECTS=(301,302,303,307,308)
+MANIFEST="/shared/status/fetch_manifest.json"
+# Each saved page is announced on this append-only queue so the processor can start right away.
+# Raw pages are content-addressed: a body is saved once as /shared/raw/<sha256>.html however many URLs
+# serve it, and every URL is announced as "<sha256>.html page_<i>.html" so downstream can tell them apart.
+QUEUE="/shared/queue/raw.ready"
+POLL_SEC=float(os.environ.get("PIPELINE_POLL_SEC","0.2"))
+# Set to the same value for all three stages, PIPELINE_RUN_ID ties queues and done markers to one run, so
+# stages started together on a reused /shared never act on the last run's files. Leave it unset to rerun
+# only later stages against an earlier run's output, starting them upstream first.
+RUN_ID=os.environ.get("PIPELINE_RUN_ID","")
+# Done markers of this stage and everything downstream; a new run clears them before queueing anything,
+# or consumers would take the last run's markers for this run's end of stream
+MARKERS=[f"/shared/status/{s}_complete.json" for s in ("fetch","process","analyze")]
+RESUME=os.environ.get("RESUME","0")=="1"
+CACHE_DIR=os.environ.get("FETCH_CACHE_DIR","")
+CACHE_MAX_BYTES=int(os.environ.get("FETCH_CACHE_MAX_MB","256"))*1024*1024
+# METRICS=1 writes /shared/status/fetch_metrics.json (per-step latency percentiles, throughput,
+# peak RSS); PROFILE=1 dumps cProfile stats to /shared/status/fetch_profile.pstats
+METRICS_ON=os.environ.get("METRICS","0")=="1"
+PROFILE_ON=os.environ.get("PROFILE","0")=="1"
+# Up to FETCH_MAX_ATTEMPTS tries for 429/5xx and connection errors, backing off FETCH_BACKOFF_BASE_MS doubling
+# (capped at FETCH_BACKOFF_CAP_SEC, full jitter) or Retry-After if longer. 429/503 or a Retry-After hold back
+# the whole host, other failures only that URL.
+# FETCH_HOST_RATE>0 caps requests/sec per host (bursts of FETCH_HOST_BURST); no retry starts after FETCH_DEADLINE_SEC
+RETRY_STATUS=(429,500,502,503,504); THROTTLE_STATUS=(429,503)
+MAX_ATTEMPTS=max(1,int(os.environ.get("FETCH_MAX_ATTEMPTS","3")))
+BACKOFF_BASE=float(os.environ.get("FETCH_BACKOFF_BASE_MS","500"))/1000
+BACKOFF_CAP=float(os.environ.get("FETCH_BACKOFF_CAP_SEC","30"))
+HOST_RATE=float(os.environ.get("FETCH_HOST_RATE","0"))
+HOST_BURST=max(1,int(os.environ.get("FETCH_HOST_BURST","1")))
+DEADLINE_SEC=float(os.environ.get("FETCH_DEADLINE_SEC","0"))
+
+# Latency samples and item/byte totals per step; a disabled instance ignores every call
+class Metrics:
+    def __init__(self,enabled=METRICS_ON):
+        self.enabled=enabled; self.lock=threading.Lock(); self.stages={}; self.t0=time.perf_counter()
+
+    def observe(self,stage,sec=None,items=0,nbytes=0):
+        if not self.enabled: return
+        with self.lock:
+            st=self.stages.setdefault(stage,{"samples":[],"items":0,"bytes":0})
+            if sec is not None: st["samples"].append(sec)
+            st["items"]+=items; st["bytes"]+=nbytes
+
+    @contextmanager
+    def timer(self,stage,items=0,nbytes=0):
+        t=time.perf_counter()
+        try: yield
+        finally: self.observe(stage,time.perf_counter()-t,items,nbytes)
+
+    def report(self,**extra):
+        wall=time.perf_counter()-self.t0; stages={}
+        for name,st in self.stages.items():
+            s=sorted(st["samples"]); row={"count":len(s),"total_sec":round(sum(s),6)}
+            if s:
+                row.update({f"p{p}_ms":round(s[max(0,math.ceil(p/100*len(s))-1)]*1000,3) for p in (50,95,99)})
+                row["max_ms"]=round(s[-1]*1000,3)
+            if st["items"]: row.update(items=st["items"],items_per_sec=round(st["items"]/wall,3))
+            if st["bytes"]: row.update(bytes=st["bytes"],bytes_per_sec=round(st["bytes"]/wall,1))
+            stages[name]=row
+        rss=lambda who: round(resource.getrusage(who).ru_maxrss/1024,1)
+        return {**extra,"wall_clock_seconds":round(wall,3),
+                "peak_rss_mb":{"self":rss(resource.RUSAGE_SELF),"children":rss(resource.RUSAGE_CHILDREN)},"stages":stages}
+
+METRICS=Metrics()
+
+# Keep-alive connections keyed by (scheme, host, port): at most max_per_host idle per key,
+# dropped after idle_sec; a reused connection the server closed is retried once fresh.
+class Pool:
+    def __init__(self,max_per_host=4,idle_sec=30):
+        self.max_per_host=max_per_host; self.idle_sec=idle_sec
+        self.idle={}; self.lock=threading.Lock(); self.opened=0; self.reused=0
+
+    def _checkout(self,key,timeout):
+        with self.lock:
+            idle=self.idle.get(key,[])
+            while idle:
+                conn,used=idle.pop()
+                if conn.sock is not None and time.monotonic()-used<=self.idle_sec:
+                    conn.sock.settimeout(timeout); self.reused+=1
+                    return conn,True
+                conn.close()
+            self.opened+=1
+        cls=http.client.HTTPSConnection if key[0]=="https" else http.client.HTTPConnection
+        return cls(key[1],key[2],timeout=timeout),False
+
+    def _checkin(self,key,conn,resp):
+        if resp.isclosed() and not resp.will_close:
+            with self.lock:
+                idle=self.idle.setdefault(key,[])
+                if len(idle)<self.max_per_host:
+                    idle.append((conn,time.monotonic())); return
+        conn.close()
+
+    def _send(self,key,target,timeout,headers):
+        while True:
+            conn,reused=self._checkout(key,timeout)
+            try:
+                conn.request("GET",target,headers={**HEADERS,**headers})
+                return conn,conn.getresponse()
+            except (ConnectionError,http.client.BadStatusLine):
+                conn.close()
+                if not reused: raise
+            except BaseException:
+                conn.close(); raise
+
+    def get(self,url,timeout=20,headers=None,max_redirects=10):
+        headers=headers or {}
+        for _ in range(max_redirects+1):
+            u=urlsplit(url); scheme=u.scheme.lower()
+            if scheme not in ("http","https"): raise ValueError(f"unknown url type: {url!r}")
+            if not u.hostname: raise URLError("no host given")
+            key=(scheme,u.hostname,u.port or (443 if scheme=="https" else 80))
+            target=(u.path or "/")+(f"?{u.query}" if u.query else "")
+            try:
+                with METRICS.timer("ttfb"): conn,resp=self._send(key,target,timeout,headers)
+                t=time.perf_counter(); body=resp.read()
+                METRICS.observe("body",time.perf_counter()-t,nbytes=len(body))
+            except OSError as e:
+                raise URLError(e) from e
+            self._checkin(key,conn,resp)
+            if resp.status in REDIRECTS and resp.getheader("Location"):
+                url=urljoin(url,resp.getheader("Location")); continue
+            # Like urlopen: anything but 2xx is an error, except 304 answering the cache's validators
+            if resp.status>=300 and not (resp.status==304 and ("If-None-Match" in headers or "If-Modified-Since" in headers)): raise HTTPError(url,resp.status,resp.reason,resp.headers,None)
+            return resp,body
+        raise URLError(f"too many redirects (>{max_redirects})")
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                for conn,_ in idle: conn.close()
+            self.idle.clear()
+
+POOL=Pool()
+
+def write_atomic(path,data):
+    tmp=path+".tmp"
+    with open(tmp,"wb") as f: f.write(data); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp,path)
+
+def sha256_file(path):
+    h=hashlib.sha256()
+    with open(path,"rb") as f:
+        for chunk in iter(lambda: f.read(1<<16),b""): h.update(chunk)
+    return h.hexdigest()
+
+# Crash-safe manifest url -> {"hash","result"}: updates go to an append-only journal,
+# compact() folds it into the manifest with an atomic rename; a torn last line is ignored.
+class Checkpoint:
+    def __init__(self,path):
+        self.path=path; self.journal_path=path+".journal"; self.entries={}
+        if os.path.exists(path):
+            with open(path) as f: self.entries.update(json.load(f))
+        replayed=os.path.exists(self.journal_path)
+        if replayed:
+            with open(self.journal_path) as f:
+                for line in f:
+                    try: key,entry=json.loads(line)
+                    except ValueError: break
+                    self.entries[key]=entry
+        self.journal=open(self.journal_path,"a")
+        if replayed: self.compact()
+
+    def get(self,key): return self.entries.get(key)
+
+    def record(self,key,content_hash,result):
+        self.entries[key]={"hash":content_hash,"result":result}
+        self.journal.write(json.dumps([key,self.entries[key]])+"\n"); self.journal.flush()
+
+    def compact(self):
+        write_atomic(self.path,json.dumps(self.entries).encode())
+        self.journal.seek(0); self.journal.truncate()
+
+    def close(self):
+        self.compact(); self.journal.close(); os.remove(self.journal_path)
+
+def already_fetched(cp,url):
+    done=cp.get(url) if RESUME else None
+    if not done or done["result"]["status"]!="success": return None
+    path=f"/shared/raw/{done['result']['file']}"
+    if not os.path.exists(path) or sha256_file(path)!=done["hash"]: return None
+    return done["result"]
+
+# On-disk body cache with ETag/Last-Modified validators. index.json keeps LRU order (oldest
+# first); each body has a uniquely named file so a stale index never pairs with a new body.
+class Cache:
+    def __init__(self,root,max_bytes):
+        os.makedirs(root,exist_ok=True)
+        self.root=root; self.max_bytes=max_bytes; self.index_path=f"{root}/index.json"; self.index=OrderedDict()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for key,meta in json.load(f):
+                    body=f"{root}/{meta['file']}"
+                    if os.path.exists(body) and os.path.getsize(body)==meta["size"]: self.index[key]=meta
+        live={m["file"] for m in self.index.values()}
+        for name in os.listdir(root):
+            if name.endswith(".body") and name not in live: os.remove(f"{root}/{name}")
+        self.total=sum(m["size"] for m in self.index.values())
+
+    def lookup(self,url):
+        key=hashlib.sha256(url.encode()).hexdigest(); meta=self.index.get(key)
+        if meta is None: return None,{}
+        self.index.move_to_end(key)
+        hdrs={}
+        if meta["etag"]: hdrs["If-None-Match"]=meta["etag"]
+        if meta["last_modified"]: hdrs["If-Modified-Since"]=meta["last_modified"]
+        return meta,hdrs
+
+    def body(self,meta):
+        with open(f"{self.root}/{meta['file']}","rb") as f: return f.read()
+
+    def store(self,url,resp,body):
+        etag=resp.getheader("ETag"); lm=resp.getheader("Last-Modified")
+        if resp.status!=200 or not (etag or lm) or "no-store" in (resp.getheader("Cache-Control") or "").lower(): return
+        key=hashlib.sha256(url.encode()).hexdigest(); name=f"{key}-{uuid.uuid4().hex[:8]}.body"
+        write_atomic(f"{self.root}/{name}",body)
+        old=self.index.pop(key,None); stale=[old] if old else []
+        self.index[key]={"url":url,"file":name,"size":len(body),"etag":etag,"last_modified":lm}
+        self.total+=len(body)-(old["size"] if old else 0)
+        while self.total>self.max_bytes and len(self.index)>1:
+            _,ev=self.index.popitem(last=False); self.total-=ev["size"]; stale.append(ev)
+        for m in stale:
+            try: os.remove(f"{self.root}/{m['file']}")
+            except FileNotFoundError: pass
+
+    def save(self):
+        write_atomic(self.index_path,json.dumps(list(self.index.items())).encode())
+
+CACHE=Cache(CACHE_DIR,CACHE_MAX_BYTES) if CACHE_DIR else None
+
+def retry_after(value):
+    if not value: return 0.0
+    try: return max(0.0,float(value))
+    except ValueError: pass
+    try: when=parsedate_to_datetime(value)
+    except (TypeError,ValueError): return 0.0
+    if when.tzinfo is None: when=when.replace(tzinfo=timezone.utc)
+    return max(0.0,(when-datetime.now(timezone.utc)).total_seconds())
+
+def retry_hint(e):
+    # None if the failure won't fix itself (4xx, DNS, bad URL), else (Retry-After or 0.0, whether the whole host waits)
+    if isinstance(e,HTTPError):
+        if e.code not in RETRY_STATUS: return None
+        wait=retry_after(e.headers.get("Retry-After") if e.headers else None)
+        return wait,e.code in THROTTLE_STATUS or wait>0
+    if isinstance(e,URLError): return (0.0,False) if isinstance(e.reason,OSError) and not isinstance(e.reason,socket.gaierror) else None
+    return (0.0,False) if isinstance(e,(TimeoutError,ConnectionError,http.client.HTTPException)) else None
+
+# Per-host token bucket (rate/sec, burst) and backoff time. A retry waits exponential backoff with full jitter
+# (at least Retry-After); throttling pushes the host's next slot out too. Retries past the deadline are dropped.
+class Scheduler:
+    def __init__(self,max_attempts=MAX_ATTEMPTS,base=BACKOFF_BASE,cap=BACKOFF_CAP,rate=HOST_RATE,burst=HOST_BURST,budget=DEADLINE_SEC,rng=None):
+        self.max_attempts=max_attempts; self.base=base; self.cap=cap; self.rate=rate; self.burst=burst
+        self.deadline=time.monotonic()+budget if budget>0 else math.inf; self.rng=rng or random.Random()
+        self.hosts={}; self.retries=0; self.gave_up=0
+
+    def _state(self,host,now):
+        st=self.hosts.get(host)
+        if st is None: st=self.hosts[host]=[float(self.burst),now,0.0]
+        elif self.rate>0: st[0]=min(float(self.burst),st[0]+(now-st[1])*self.rate)
+        st[1]=now; return st
+
+    def ready_at(self,host):
+        now=time.monotonic(); st=self._state(host,now)
+        return max(st[2],now+(1-st[0])/self.rate) if self.rate>0 and st[0]<1 else st[2]
+
+    def take(self,host):
+        st=self._state(host,time.monotonic())
+        if self.rate>0: st[0]-=1
+
+    def backoff(self,host,attempt,hint):
+        if hint is None or attempt>=self.max_attempts: return None
+        delay=max(hint[0],self.rng.uniform(0,min(self.cap,self.base*2**(attempt-1)))); now=time.monotonic()
+        if now+delay>self.deadline: self.gave_up+=1; return None
+        if hint[1]: st=self._state(host,now); st[2]=max(st[2],now+delay)
+        self.retries+=1; return delay
 
 def fetch_once(url, timeout=20):
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "Mozilla/5.0 (EE547-HW1)"},
-    )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read()
+    # Returns (content, "hit"/"miss"/None when the cache is off)
+    meta,hdrs=CACHE.lookup(url) if CACHE else (None,{})
+    resp,body=POOL.get(url,timeout=timeout,headers=hdrs)
+    if resp.status==304 and meta: return CACHE.body(meta),"hit"
+    if CACHE: CACHE.store(url,resp,body)
+    return body,("miss" if CACHE else None)
 
 def main():
     print(f"[{datetime.now(timezone.utc).isoformat()}] Fetcher start", flush=True)
+    prof=cProfile.Profile() if PROFILE_ON else None
+    if prof: prof.enable()
+    os.makedirs("/shared/raw",exist_ok=True)
+    os.makedirs("/shared/status",exist_ok=True)
+    os.makedirs(os.path.dirname(QUEUE),exist_ok=True)
+    for path in MARKERS:
+        if os.path.exists(path): os.remove(path)
+    queue=open(QUEUE,"w"); queue.write(f"#run {RUN_ID}\n"); queue.flush()
+
     input_file = "/shared/input/urls.txt"
-    while not os.path.exists(input_file):
+    if not os.path.exists(input_file):
         print(f"Waiting for {input_file}...", flush=True)
-        time.sleep(2)
+    while not os.path.exists(input_file):
+        time.sleep(POLL_SEC)
 
     with open(input_file) as f:
         urls=[line.strip() for line in f if line.strip()]
 
-    os.makedirs("/shared/raw",exist_ok=True)
-    os.makedirs("/shared/status",exist_ok=True)
-
-    results=[]
+    cp=Checkpoint(MANIFEST)
+    results=[None]*len(urls); pending={}; attempts=[0]*(len(urls)+1)
     for i,url in enumerate(urls,1):
-        out=f"/shared/raw/page_{i}.html"
-        ok=False; err=None
-        for attempt in range(3):
+        done=already_fetched(cp,url)
+        if done:
+            print(f"Skipping {url} (already fetched)",flush=True)
+            results[i-1]={**done,"page":f"page_{i}.html"}; queue.write(f"{done['file']} page_{i}.html\n"); queue.flush(); continue
+        pending.setdefault(urlsplit(url).netloc.lower(),deque()).append(i)
+
+    # One URL per free host per pass, so a URL or host that is backing off never stalls the others
+    sched=Scheduler(); delayed=[]
+    while pending or delayed:
+        while delayed and delayed[0][0]<=time.monotonic():
+            _,i,host=heapq.heappop(delayed); pending.setdefault(host,deque()).appendleft(i)
+        idle=True
+        for host in list(pending):
+            if sched.ready_at(host)>time.monotonic(): continue
+            idle=False; i=pending[host].popleft(); url=urls[i-1]; name=f"page_{i}.html"
+            sched.take(host); attempts[i]+=1
             try:
-                print(f"Fetching {url} try {attempt+1}/3",flush=True)
-                content=fetch_once(url,timeout=20)
-                with open(out,"wb") as f: f.write(content)
-                results.append({"url":url,"file":f"page_{i}.html","size":len(content),"status":"success"})
-                ok=True; break
+                print(f"Fetching {url} try {attempts[i]}/{sched.max_attempts}",flush=True)
+                t=time.perf_counter(); content,cache=fetch_once(url,timeout=20)
+                METRICS.observe("fetch",time.perf_counter()-t,items=1,nbytes=len(content))
+                digest=hashlib.sha256(content).hexdigest(); file=f"{digest}.html"
+                if os.path.exists(f"/shared/raw/{file}"): METRICS.observe("duplicate",items=1,nbytes=len(content))
+                else:
+                    with METRICS.timer("write"): write_atomic(f"/shared/raw/{file}",content)
+                results[i-1]={"url":url,"file":file,"page":name,"size":len(content),"status":"success","cache":cache,"attempts":attempts[i]}
+                ok=True
             except Exception as e:
-                err=e; time.sleep(1.5)
-        if not ok:
-            results.append({"url":url,"file":None,"error":str(err),"status":"failed"})
+                hint=retry_hint(e); delay=sched.backoff(host,attempts[i],hint)
+                if delay is not None:
+                    print(f"Retrying {url} in {delay:.2f}s: {e}",flush=True)
+                    if hint[1]: pending[host].appendleft(i); continue
+                    heapq.heappush(delayed,(time.monotonic()+delay,i,host))
+                    if not pending[host]: del pending[host]
+                    continue
+                results[i-1]={"url":url,"file":None,"error":str(e),"status":"failed","attempts":attempts[i]}; ok=False
+            if not pending[host]: del pending[host]
+            cp.record(url,digest if ok else None,results[i-1])
+            if ok: queue.write(f"{file} {name}\n"); queue.flush()
+        if idle: time.sleep(max(0.0,min([*map(sched.ready_at,pending),*(d[0] for d in delayed[:1])])-time.monotonic()))
+    queue.close()
+    POOL.close()
+    cp.close()
+    if CACHE: CACHE.save()
+    hits=[r for r in results if r.get("cache")=="hit"]
+    lookups=sum(r.get("cache") in ("hit","miss") for r in results)
+    fetched={r["url"]:r["file"] for r in results if r["status"]=="success"}
 
     status={
         "timestamp":datetime.now(timezone.utc).isoformat(),
+        "run_id":RUN_ID,
         "urls_processed":len(urls),
         "successful":sum(r["status"]=="success" for r in results),
         "failed":sum(r["status"]=="failed" for r in results),
+        "unique_pages":len(set(fetched.values())),
+        "connections_opened":POOL.opened,
+        "connections_reused":POOL.reused,
+        "retries":sched.retries,
+        "retries_abandoned_at_deadline":sched.gave_up,
+        "cache_hits":len(hits),
+        "cache_hit_ratio":round(len(hits)/lookups,4) if lookups else 0.0,
+        "cache_bytes_saved":sum(r["size"] for r in hits),
+        "url_content":fetched,
         "results":results
     }
-    with open("/shared/status/fetch_complete.json","w") as f: json.dump(status,f,indent=2)
+    if prof: prof.disable(); prof.dump_stats("/shared/status/fetch_profile.pstats")
+    if METRICS.enabled:
+        write_atomic("/shared/status/fetch_metrics.json",json.dumps(METRICS.report(tool="fetcher",urls=len(urls)),indent=2).encode())
+    write_atomic("/shared/status/fetch_complete.json",json.dumps(status,indent=2).encode())
     print(f"[{datetime.now(timezone.utc).isoformat()}] Fetcher done",flush=True)
 
 if __name__=="__main__":
@@ -1,55 +1,259 @@
 #!/usr/bin/env python3
-import json, os, re, time
+import cProfile, hashlib, json, math, os, re, resource, struct, threading, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from glob import glob
 from html import unescape
 
-def strip_html(html):
-    html=re.sub(r"<script[^>]*>.*?</script>","",html,flags=re.S|re.I)
-    html=re.sub(r"<style[^>]*>.*?</style>","",html,flags=re.S|re.I)
-    links=re.findall(r'href=[\'"]?([^\'" >]+)',html,flags=re.I)
-    images=re.findall(r'src=[\'"]?([^\'" >]+)',html,flags=re.I)
-    text=re.sub(r"<[^>]+>"," ",html)
-    text=unescape(text)
-    text=re.sub(r"\s+"," ",text).strip()
-    return text,links,images
-
-def count_stats(text):
-    words=re.findall(r"[A-Za-z]+(?:'[A-Za-z]+)?",text.lower())
-    sentences=re.split(r"[.!?]+",text)
-    paras=[p for p in re.split(r"\n\s*\n",text) if p.strip()]
-    wc=len(words); sc=len([s for s in sentences if s.strip()]); pc=max(len(paras),1)
-    avg=(sum(len(w) for w in words)/wc) if wc else 0.0
+# extract(page) -> (text, links, images), pass for pass the original inline regexes, precompiled:
+# script blocks are dropped, then style blocks; href=/src= values are collected from everything
+# left (escaped markup in the text included) and tags become spaces. HREF_RE/SRC_RE spell out what
+# re.I would match (U+017F included, for "s"), which scans faster.
+SCRIPT_RE=re.compile(r"<script[^>]*>.*?</script>",re.S|re.I)
+STYLE_RE=re.compile(r"<style[^>]*>.*?</style>",re.S|re.I)
+HREF_RE=re.compile(r'[hH][rR][eE][fF]=[\'"]?([^\'" >]+)')
+SRC_RE=re.compile(r'[sS\u017f][rR][cC]=[\'"]?([^\'" >]+)')
+TAG_RE=re.compile(r"<[^>]+>")
+WORD_RE=re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+SENTENCE_RE=re.compile(r"[^.!?\s][^.!?]*")
+
+def extract(html):
+    html=STYLE_RE.sub("",SCRIPT_RE.sub("",html))
+    return " ".join(unescape(TAG_RE.sub(" ",html)).split()),HREF_RE.findall(html),SRC_RE.findall(html)
+
+# Same counts as splitting into words, sentences and paragraphs, in two scans
+def text_stats(text):
+    words=WORD_RE.findall(text if text.isascii() else text.lower())
+    wc=len(words); sc=len(SENTENCE_RE.findall(text))
+    # Text out of extract() has no newlines left, so it is always one paragraph
+    pc=1 if "\n" not in text else max(len([p for p in re.split(r"\n\s*\n",text) if p.strip()]),1)
+    avg=(sum(map(len,words))/wc) if wc else 0.0
     return {"word_count":wc,"sentence_count":sc,"paragraph_count":pc,"avg_word_length":round(avg,4)}
 
+RAW_QUEUE="/shared/queue/raw.ready"
+OUT_QUEUE="/shared/queue/processed.ready"
+FETCH_DONE="/shared/status/fetch_complete.json"
+# This stage's done marker and the analyzer's, cleared at startup so a stale one never ends the next stage early
+MARKERS=["/shared/status/process_complete.json","/shared/status/analyze_complete.json"]
+POLL_SEC=float(os.environ.get("PIPELINE_POLL_SEC","0.2"))
+# Set to the same value for all three stages, PIPELINE_RUN_ID ties queues and done markers to one run, so
+# stages started together on a reused /shared never act on the last run's files. Leave it unset to rerun
+# only later stages against an earlier run's output, starting them upstream first.
+RUN_ID=os.environ.get("PIPELINE_RUN_ID","")
+# Pages are processed on a pool of PROCESS_WORKERS processes (0 = one per CPU, 1 = serial)
+PROCESS_WORKERS=int(os.environ.get("PROCESS_WORKERS","0"))
+# PROCESSED_FORMAT=tokens appends pre-tokenized pages to TOKENS_PATH for the analyzer instead of
+# writing one JSON file per page; PROCESSED_JSON=1 writes the JSON as well, for debugging
+PROCESSED_FORMAT=os.environ.get("PROCESSED_FORMAT","json")
+PROCESSED_JSON=PROCESSED_FORMAT!="tokens" or os.environ.get("PROCESSED_JSON","0")=="1"
+TOKENS_PATH="/shared/processed/corpus.tok"
+# METRICS=1 writes /shared/status/process_metrics.json (per-step latency percentiles, throughput,
+# peak RSS); PROFILE=1 dumps cProfile stats of the main process to /shared/status/process_profile.pstats
+METRICS_ON=os.environ.get("METRICS","0")=="1"
+PROFILE_ON=os.environ.get("PROFILE","0")=="1"
+
+# Latency samples and item/byte totals per step; a disabled instance ignores every call
+class Metrics:
+    def __init__(self,enabled=METRICS_ON):
+        self.enabled=enabled; self.lock=threading.Lock(); self.stages={}; self.t0=time.perf_counter()
+
+    def observe(self,stage,sec=None,items=0,nbytes=0):
+        if not self.enabled: return
+        with self.lock:
+            st=self.stages.setdefault(stage,{"samples":[],"items":0,"bytes":0})
+            if sec is not None: st["samples"].append(sec)
+            st["items"]+=items; st["bytes"]+=nbytes
+
+    @contextmanager
+    def timer(self,stage,items=0,nbytes=0):
+        t=time.perf_counter()
+        try: yield
+        finally: self.observe(stage,time.perf_counter()-t,items,nbytes)
+
+    def report(self,**extra):
+        wall=time.perf_counter()-self.t0; stages={}
+        for name,st in self.stages.items():
+            s=sorted(st["samples"]); row={"count":len(s),"total_sec":round(sum(s),6)}
+            if s:
+                row.update({f"p{p}_ms":round(s[max(0,math.ceil(p/100*len(s))-1)]*1000,3) for p in (50,95,99)})
+                row["max_ms"]=round(s[-1]*1000,3)
+            if st["items"]: row.update(items=st["items"],items_per_sec=round(st["items"]/wall,3))
+            if st["bytes"]: row.update(bytes=st["bytes"],bytes_per_sec=round(st["bytes"]/wall,1))
+            stages[name]=row
+        rss=lambda who: round(resource.getrusage(who).ru_maxrss/1024,1)
+        return {**extra,"wall_clock_seconds":round(wall,3),
+                "peak_rss_mb":{"self":rss(resource.RUSAGE_SELF),"children":rss(resource.RUSAGE_CHILDREN)},"stages":stages}
+
+METRICS=Metrics()
+
+# Must match tokenize() in analyzer/analyze.py: the analyzer takes these ids as its tokens
+STOPWORDS=set("a an and are as at be by for from has have in is it its of on or that the this to was were will with".split())
+def tokenize(text): return [w for w in re.findall(r"[a-z]+",text.lower()) if w not in STOPWORDS]
+
+# TOKENS_PATH is a stream of length-prefixed records, each "<cI" (kind, payload length) + payload:
+#   b"H"  "<Q" time_ns the file was started; always first, so readers can tell a rewritten file
+#   b"V"  new vocabulary words, "\n"-joined UTF-8; they take the next ids in order
+#   b"D"  "<HI" (name length, sentence count) + name + 32-byte sha256 of the text + native uint32 ids
+# Words are always announced before the first document that uses them, so a reader can tail the file.
+class TokenWriter:
+    def __init__(self,path):
+        self.f=open(path,"wb"); self.vocab={}
+        self._record(b"H",struct.pack("<Q",time.time_ns())); self.f.flush()
+
+    def _record(self,kind,payload):
+        self.f.write(struct.pack("<cI",kind,len(payload))); self.f.write(payload)
+
+    def add(self,name,words,ids,sents,digest):
+        # words/ids are page-local (ids index words); rewrite them against the shared vocabulary
+        vocab=self.vocab; new=[w for w in words if w not in vocab]
+        if new:
+            for w in new: vocab[w]=len(vocab)
+            self._record(b"V","\n".join(new).encode())
+        remap=[vocab[w] for w in words]
+        nb=name.encode()
+        self._record(b"D",struct.pack("<HI",len(nb),sents)+nb+digest+array("I",map(remap.__getitem__,ids)).tobytes())
+        self.f.flush()
+
+    def close(self): self.f.close()
+
+def write_atomic(path,text):
+    tmp=path+".tmp"
+    with open(tmp,"w") as f: f.write(text)
+    os.replace(tmp,path)
+
+def this_run(marker):
+    # A done marker counts only if this run wrote it (any marker when PIPELINE_RUN_ID is unset)
+    if not os.path.exists(marker): return False
+    if not RUN_ID: return True
+    try:
+        with open(marker) as f: return json.load(f).get("run_id")==RUN_ID
+    except (OSError,ValueError): return False
+
+# Yield names appended to an upstream queue file as they appear, until the upstream
+# done marker exists and the queue is drained. Without a queue file (older fetcher),
+# fall back to globbing fallback once the done marker appears. A queue opens with a
+# "#run <id>" line; one from another run is left alone until upstream rewrites it.
+def stream_ready(queue_path,done_path,fallback):
+    pos=0; buf=""
+    while True:
+        done=this_run(done_path)
+        lines=[]
+        if os.path.exists(queue_path):
+            with open(queue_path) as f:
+                # Shorter than what was read: upstream restarted and rewrote it, so start over
+                if f.seek(0,2)<pos: pos=0; buf=""
+                f.seek(pos); data=f.read(); pos=f.tell()
+            buf+=data; *lines,buf=buf.split("\n")
+            if RUN_ID and lines and lines[0].startswith("#run ") and lines[0]!=f"#run {RUN_ID}": pos=0; buf=""; lines=[]
+        elif done:
+            lines=[os.path.basename(p) for p in sorted(glob(fallback))]
+        yield from (l for l in lines if l and not l.startswith("#"))
+        if done: return
+        if not lines: time.sleep(POLL_SEC)
+
+# A fetcher line is "<content>.html <page>.html" (just the name from older fetchers); returns the raw
+# file to process and the name the analyzer should file that URL's document under
+def route(line):
+    name,_,page=line.partition(" ")
+    return name,os.path.splitext(page or name)[0]+".json"
+
+# Returns (output name, token payload or None, sha256 of the text, step timings); timings come back
+# to the parent because a pool worker's METRICS is its own copy
+def process_page(name):
+    t0=time.perf_counter()
+    with open(f"/shared/raw/{name}",errors="ignore") as f: html=f.read()
+    t1=time.perf_counter()
+    text,links,images=extract(html)
+    stats=text_stats(text)
+    t2=time.perf_counter()
+    base=os.path.splitext(name)[0]
+    if PROCESSED_JSON:
+        out={"source_file":name,"text":text,"statistics":stats,"links":links,"images":images,
+             "processed_at":datetime.now(timezone.utc).isoformat()}
+        write_atomic(f"/shared/processed/{base}.json",json.dumps(out,indent=2))
+    tokens=None; digest=hashlib.sha256(text.encode()).digest()
+    if PROCESSED_FORMAT=="tokens":
+        local={}; ids=array("I",[local.setdefault(w,len(local)) for w in tokenize(text)])
+        # The analyzer's sentence count: it falls back to counting terminators when there are none
+        sents=stats["sentence_count"] or max(1,text.count(".")+text.count("!")+text.count("?"))
+        tokens=(list(local),ids,sents,digest)
+    t3=time.perf_counter()
+    steps=[("read",t1-t0,0,len(html)),("extract",t2-t1,1,len(html)),("output",t3-t2,0,0),("page",t3-t0,1,0)]
+    return f"{base}.json",tokens,digest.hex(),steps
+
 def main():
     print(f"[{datetime.now(timezone.utc).isoformat()}] Processor start",flush=True)
-    while not os.path.exists("/shared/status/fetch_complete.json"):
-        print("Waiting for fetch_complete.json ...",flush=True); time.sleep(2)
-
+    prof=cProfile.Profile() if PROFILE_ON else None
+    if prof: prof.enable()
     os.makedirs("/shared/processed",exist_ok=True)
     os.makedirs("/shared/status",exist_ok=True)
+    os.makedirs(os.path.dirname(OUT_QUEUE),exist_ok=True)
+    for path in MARKERS:
+        if os.path.exists(path): os.remove(path)
+
+    # Process each page as soon as the fetcher publishes it
+    print("Waiting for fetched pages ...",flush=True)
+    files=set(); aliases=set(); workers=PROCESS_WORKERS or len(os.sched_getaffinity(0))
+    writer=TokenWriter(TOKENS_PATH) if PROCESSED_FORMAT=="tokens" else None
+    if writer is None and os.path.exists(TOKENS_PATH): os.remove(TOKENS_PATH)
+    # Each raw file is processed once; every URL that served it is queued as "<content>.json <page>.json
+    # <text sha256>", the digest letting the analyzer skip documents it already holds without reading them.
+    # waiting holds the pages of a file still being processed, queued when its output is published.
+    lock=threading.Lock(); waiting={}; digests={}
+    with open(OUT_QUEUE,"w") as queue:
+        queue.write(f"#run {RUN_ID}\n"); queue.flush()
+        def announce(out,alias): queue.write(f"{out} {alias} {digests[out]}\n")
+        # Token records are flushed before the name is queued, so the analyzer always finds them
+        def publish(result):
+            out,tokens,digest,steps=result
+            for step in steps: METRICS.observe(*step)
+            with lock:
+                if tokens: writer.add(out,*tokens)
+                digests[out]=digest
+                for alias in waiting.pop(out): announce(out,alias)
+                queue.flush()
+        # True if name is new and must be processed; pages of an already known file are queued or parked
+        def claim(name,alias):
+            if alias in aliases: return False
+            aliases.add(alias); out=os.path.splitext(name)[0]+".json"
+            with lock:
+                if out in waiting: waiting[out].append(alias); return False
+                if name in files: announce(out,alias); queue.flush(); return False
+                files.add(name); waiting[out]=[alias]; return True
+        ready=map(route,stream_ready(RAW_QUEUE,FETCH_DONE,"/shared/raw/*.html"))
+        if workers==1:
+            for name,alias in ready:
+                if claim(name,alias): publish(process_page(name))
+        else:
+            # Publish each page from a done-callback so slow pages never hold back fast ones. A failed publish
+            # is kept and re-raised below like a worker failure, so process_complete is never written without it.
+            futures=[]; failed=[]
+            def done(fut):
+                if fut.exception() is not None: return
+                try: publish(fut.result())
+                except Exception as e:
+                    print(f"Publishing {fut.result()[0]} failed: {e!r}",flush=True); failed.append(e)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for name,alias in ready:
+                    if not claim(name,alias): continue
+                    futures.append(pool.submit(process_page,name)); futures[-1].add_done_callback(done)
+            for fut in futures: fut.result()  # re-raise worker failures as the serial loop would
+            if failed: raise failed[0]
+    if writer: writer.close()
+    if prof: prof.disable(); prof.dump_stats("/shared/status/process_profile.pstats")
+    if METRICS.enabled:
+        write_atomic("/shared/status/process_metrics.json",
+                     json.dumps(METRICS.report(tool="processor",pages=len(files),urls=len(aliases),workers=workers),indent=2))
 
-    pages=sorted(glob("/shared/raw/*.html"))
-    if not pages:
-        with open("/shared/status/process_complete.json","w") as f:
-            json.dump({"timestamp":datetime.now(timezone.utc).isoformat(),"files":[]},f,indent=2)
+    write_atomic("/shared/status/process_complete.json",
+                 json.dumps({"timestamp":datetime.now(timezone.utc).isoformat(),"run_id":RUN_ID,"files":sorted(files),
+                             "duplicates":len(aliases)-len(files)},indent=2))
+    if not files:
         print("No raw pages found. Processor done (0 files).",flush=True)
         return
 
-    for p in pages:
-        name=os.path.basename(p)
-        with open(p,errors="ignore") as f: html=f.read()
-        text,links,images=strip_html(html)
-        stats=count_stats(text)
-        out={"source_file":name,"text":text,"statistics":stats,"links":links,"images":images,
-             "processed_at":datetime.now(timezone.utc).isoformat()}
-        base=os.path.splitext(name)[0]
-        with open(f"/shared/processed/{base}.json","w") as f: json.dump(out,f,indent=2)
-
-    with open("/shared/status/process_complete.json","w") as f:
-        json.dump({"timestamp":datetime.now(timezone.utc).isoformat(),"files":[os.path.basename(p) for p in pages]},f,indent=2)
-
     print(f"[{datetime.now(timezone.utc).isoformat()}] Processor done",flush=True)
 
 if __name__=="__main__":
@@ -9,7 +9,15 @@ fi
 echo "Starting Multi-Container Pipeline"
 echo "================================="
 
-docker-compose down -v >/dev/null 2>&1 || true
+# RESUME=1 keeps the shared volume, whose fetch manifest and raw pages let the fetcher skip
+# URLs it already has; only the last run's input and report are cleared. Otherwise start clean.
+if [ "${RESUME:-0}" = "1" ]; then
+  docker-compose down >/dev/null 2>&1 || true
+  docker run --rm -v pipeline-shared-data:/shared alpine \
+    rm -f /shared/input/urls.txt /shared/analysis/final_report.json >/dev/null 2>&1 || true
+else
+  docker-compose down -v >/dev/null 2>&1 || true
+fi
 
 TEMP_DIR=$(mktemp -d)
 trap "rm -rf \"$TEMP_DIR\"" EXIT
@@ -22,6 +30,9 @@ echo "URLs to process:"
 cat "$TEMP_DIR/urls.txt"
 echo ""
 
+# Lets the stages tell this run's queues and done markers from a previous run's
+export PIPELINE_RUN_ID="$(date +%s)-$$"
+
 echo "Building containers..."
 docker-compose build --quiet
 echo "Starting pipeline..."
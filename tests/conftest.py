@@ -0,0 +1,56 @@
+"""
+Shared local http.server stub for the fetcher tests.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+class Stub(BaseHTTPRequestHandler):
+    # /<name>?fail=N&status=S&retry_after=R answers the first N requests for a path with S
+    # (default 503), plus Retry-After: R when given, then 200. status alone without fail is
+    # permanent; location=L adds a Location header. close=1 drops the connection after the
+    # answer without saying so, like a server timing out an idle keep-alive connection.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        q = {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        with self.server.lock:
+            seen = self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        status = int(q.get("status", 503 if "fail" in q else 200))
+        if "fail" in q and seen > int(q["fail"]):
+            status = 200
+        body = b"ok ok ok" if status == 200 else b"" if status in (204, 304) else b"try again"
+        self.send_response(status)
+        if status != 200 and "retry_after" in q:
+            self.send_header("Retry-After", q["retry_after"])
+        if "location" in q:
+            self.send_header("Location", q["location"])
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if q.get("close") == "1":
+            self.close_connection = True
+
+@pytest.fixture(scope="module")
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    srv.daemon_threads = True
+    srv.hits = {}
+    srv.connections = 0
+    srv.lock = threading.Lock()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.base = f"http://127.0.0.1:{srv.server_address[1]}"
+    yield srv
+    srv.shutdown()
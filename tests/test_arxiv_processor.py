@@ -0,0 +1,184 @@
+"""
+The problem2 harvester (harvest_pages, fetch_with_retries, main) against a
+local http.server stub serving canned Atom pages, including retries, pacing
+and the ARXIV_DEADLINE_SEC budget.
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem2", "arxiv_processor.py")
+sys.path.insert(0, os.path.dirname(SCRIPT))
+import arxiv_processor as ap  # noqa: E402
+
+def atom_page(ids: list[int], total: int) -> bytes:
+    # One API response holding entries ids, announcing total results
+    entries = "".join(
+        f"<entry><id>http://arxiv.org/abs/2001.{i:05d}v1</id>"
+        "<updated>2020-01-02T00:00:00Z</updated><published>2020-01-01T00:00:00Z</published>"
+        f"<title>Paper {i}</title><summary>{escape(f'Abstract of paper {i}. We train a CNN on a GPU.')}</summary>"
+        f"<author><name>Author {i}</name></author><category term=\"cs.LG\"/></entry>" for i in ids)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+            f"<opensearch:totalResults>{total}</opensearch:totalResults>{entries}</feed>").encode()
+
+class Feed(BaseHTTPRequestHandler):
+    # Answers /api/query with server.answer(start, count, nth request for start) -> (status, headers, body)
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        q = parse_qs(urlsplit(self.path).query)
+        start, count = int(q["start"][0]), int(q["max_results"][0])
+        with self.server.lock:
+            self.server.requests.append((start, time.monotonic()))
+            nth = sum(1 for s, _ in self.server.requests if s == start)
+        status, headers, body = self.server.answer(start, count, nth)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def pages(total: int, overlap: int = 0):
+    # Entries start..start+count of a feed of total papers; each page after the first
+    # repeats the last overlap entries of the one before, as when results shift
+    def answer(start, count, nth):
+        first = max(0, start - overlap)
+        return 200, {}, atom_page(list(range(first, min(start + count, total))), total)
+    return answer
+
+@pytest.fixture
+def feed(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Feed)
+    srv.daemon_threads = True
+    srv.lock = threading.Lock()
+    srv.requests = []
+    srv.answer = pages(0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.endpoint = f"http://127.0.0.1:{srv.server_address[1]}/api/query"
+    monkeypatch.setattr(ap, "ARXIV_ENDPOINT", srv.endpoint)
+    yield srv
+    srv.shutdown()
+
+def scheduler(**kw) -> ap.RetryScheduler:
+    # No pacing and short backoff so tests stay fast; a seeded rng keeps the jitter reproducible
+    return ap.RetryScheduler(**{"max_attempts": 3, "base_sec": 0.05, "cap_sec": 0.2, "rng": random.Random(0), **kw})
+
+def starts(feed) -> list[int]:
+    return [s for s, _ in feed.requests]
+
+def test_pages_are_walked_until_total_results(feed):
+    feed.answer = pages(250)
+    got = [(start, n) for start, n, _ in ap.harvest_pages("q", 1000, page_size=100, scheduler=scheduler())]
+    # totalResults on the first page shortens the last request and ends the walk
+    assert got == [(0, 100), (100, 100), (200, 50)]
+    assert starts(feed) == [0, 100, 200]
+
+def test_walk_stops_at_max_results(feed):
+    feed.answer = pages(1000)
+    got = [(start, n) for start, n, _ in ap.harvest_pages("q", 150, page_size=100, scheduler=scheduler())]
+    assert got == [(0, 100), (100, 50)]
+
+def test_walk_stops_at_an_empty_page(feed):
+    # The feed claims 1000 results but runs dry after 200
+    feed.answer = lambda start, count, nth: (200, {}, atom_page(list(range(start, min(start + count, 200))), 1000))
+    got = [start for start, _, _ in ap.harvest_pages("q", 1000, page_size=100, scheduler=scheduler())]
+    assert got == [0, 100, 200]
+    assert starts(feed) == [0, 100, 200]
+
+def test_throttled_page_waits_for_retry_after(feed):
+    answer = pages(300)
+    feed.answer = lambda start, count, nth: ((429, {"Retry-After": "1"}, b"slow down") if start == 100 and nth == 1
+                                            else answer(start, count, nth))
+    sched = scheduler()
+    got = [start for start, _, _ in ap.harvest_pages("q", 300, page_size=100, scheduler=sched)]
+    assert got == [0, 100, 200]
+    assert starts(feed) == [0, 100, 100, 200] and sched.retries == 1
+    # Backoff alone is capped at 0.2s, so only the header explains a wait this long
+    (_, t1), (_, t2) = [r for r in feed.requests if r[0] == 100]
+    assert t2 - t1 >= 1.0
+
+def run_main(feed, tmp_path, max_results: int, **env) -> tuple[subprocess.CompletedProcess, dict, list]:
+    out = tmp_path / "out"
+    proc = subprocess.run(
+        [sys.executable, SCRIPT, "cat:cs.LG", str(max_results), str(out)], capture_output=True, text=True,
+        env={**os.environ, "ARXIV_ENDPOINT": feed.endpoint, "ARXIV_PAGE_SIZE": "100", "ARXIV_MIN_INTERVAL": "0",
+             "ARXIV_BACKOFF_BASE_SEC": "0.01", "ARXIV_MAX_ATTEMPTS": "2", "ANALYSIS_WORKERS": "1", **env})
+    stats = json.loads((out / "stats.json").read_text()) if (out / "stats.json").exists() else None
+    papers = json.loads((out / "papers.json").read_text()) if (out / "papers.json").exists() else None
+    return proc, stats, papers
+
+def test_overlapping_pages_are_deduplicated(feed, tmp_path):
+    feed.answer = pages(250, overlap=5)
+    proc, stats, papers = run_main(feed, tmp_path, 250)
+    assert proc.returncode == 0, proc.stderr
+    ids = [p["arxiv_id"] for p in papers]
+    assert ids == [f"2001.{i:05d}v1" for i in range(250)]
+    assert stats["total_papers"] == 250 and len(stats["papers"]) == 250
+    assert stats["complete"] is True and stats["failed_start"] is None
+
+def test_failed_page_marks_the_run_incomplete(feed, tmp_path):
+    answer = pages(300)
+    feed.answer = lambda start, count, nth: (500, {}, b"down") if start == 200 else answer(start, count, nth)
+    proc, stats, papers = run_main(feed, tmp_path, 300)
+    # Whatever was fetched is still written, and the header says where the harvest stopped
+    assert proc.returncode == 0, proc.stderr
+    assert len(papers) == 200 and stats["total_papers"] == 200
+    assert stats["complete"] is False and stats["failed_start"] == 200
+    assert starts(feed) == [0, 100, 200, 200]
+
+def test_streamed_header_marks_the_run_incomplete(feed, tmp_path):
+    answer = pages(300)
+    feed.answer = lambda start, count, nth: (500, {}, b"down") if start == 100 else answer(start, count, nth)
+    proc, _, _ = run_main(feed, tmp_path, 300, OUTPUT_FORMAT="jsonl")
+    assert proc.returncode == 0, proc.stderr
+    rows = [json.loads(line) for line in (tmp_path / "out" / "stats.jsonl").read_text().splitlines()]
+    assert rows[-1]["complete"] is False and rows[-1]["failed_start"] == 100 and rows[-1]["total_papers"] == 100
+
+def test_nothing_fetched_exits_nonzero(feed, tmp_path):
+    feed.answer = lambda start, count, nth: (503, {}, b"down")
+    proc, _, _ = run_main(feed, tmp_path, 300)
+    assert proc.returncode == 1
+
+def test_requests_are_paced_by_min_interval(feed, monkeypatch):
+    feed.answer = pages(300)
+    monkeypatch.setattr(ap, "ARXIV_MIN_INTERVAL", 0.3)
+    assert [start for start, _, _ in ap.harvest_pages("q", 300, page_size=100)] == [0, 100, 200]
+    times = [t for _, t in feed.requests]
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.29
+
+def test_client_errors_are_not_retried(feed):
+    feed.answer = lambda start, count, nth: (400, {}, b"bad query")
+    sched = scheduler()
+    with pytest.raises(HTTPError) as e:
+        ap.fetch_with_retries(ap.query_url("q", 0, 10), scheduler=sched)
+    assert e.value.code == 400 and starts(feed) == [0] and sched.retries == 0
+
+def test_retries_stop_at_max_attempts(feed):
+    feed.answer = lambda start, count, nth: (502, {}, b"bad gateway")
+    sched = scheduler()
+    with pytest.raises(HTTPError):
+        ap.fetch_with_retries(ap.query_url("q", 0, 10), scheduler=sched)
+    assert starts(feed) == [0, 0, 0] and sched.retries == 2
+
+def test_deadline_drops_retries_that_cannot_start_in_time(feed):
+    feed.answer = lambda start, count, nth: (503, {"Retry-After": "5"}, b"down") if nth == 1 else pages(10)(start, count, nth)
+    sched = scheduler(budget_sec=0.5)
+    started = time.monotonic()
+    with pytest.raises(HTTPError):
+        ap.fetch_with_retries(ap.query_url("q", 0, 10), scheduler=sched)
+    assert starts(feed) == [0] and sched.gave_up == 1 and sched.retries == 0
+    assert time.monotonic() - started < 1.0
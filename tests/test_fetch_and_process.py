@@ -0,0 +1,62 @@
+"""
+The problem1 fetcher's HTTP handling: charset selection for streamed word
+counts, and the keep-alive connection pool against the http.server stub in
+conftest.py.
+"""
+
+import http.client
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem1"))
+import fetch_and_process as fp  # noqa: E402
+
+@pytest.mark.parametrize("charset", ["base64", "hex", "zlib_codec", "rot13", "no-such-codec", None])
+def test_unusable_charsets_fall_back_to_utf8(charset):
+    assert fp.pick_encoding(charset) == "utf-8"
+    counter = fp.WordCounter(fp.pick_encoding(charset))
+    counter.feed("héllo wörld 42".encode("utf-8"), final=True)
+    assert counter.count == 5
+
+def test_declared_text_charset_is_used():
+    assert fp.pick_encoding(fp.extract_charset("text/html; charset=ISO-8859-1")) == "iso-8859-1"
+
+def test_same_host_urls_reuse_one_connection(server):
+    pool = fp.ConnectionPool(max_per_host=2)
+    for i in range(5):
+        with pool.open(f"{server.base}/reuse/{i}", timeout=5) as resp:
+            assert resp.status == 200 and resp.read() == b"ok ok ok"
+    assert pool.opened == 1 and pool.reused == 4
+    pool.close()
+
+def test_connection_closed_by_server_is_retried_once(server):
+    pool = fp.ConnectionPool(max_per_host=2)
+    connections = server.connections
+    with pool.open(f"{server.base}/drop?close=1", timeout=5) as resp:
+        resp.read()
+    # The pool still holds the connection the server has dropped; the next request fails on
+    # it and goes out again on a fresh one
+    with pool.open(f"{server.base}/after-drop", timeout=5) as resp:
+        assert resp.status == 200 and resp.read() == b"ok ok ok"
+    assert pool.opened == 2 and pool.reused == 1
+    assert server.connections - connections == 2 and server.hits["/after-drop"] == 1
+    pool.close()
+
+@pytest.mark.parametrize("status", [300, 304, 305])
+def test_unhandled_3xx_is_an_error(server, status):
+    path = f"/odd/{status}?status={status}"
+    rec, hint = fp.fetch_attempt(server.base + path, timeout_sec=5)
+    assert rec["error"] == f"HTTP Error {status}: {http.client.responses[status]}"
+    assert rec["word_count"] is None and hint is None
+
+def test_304_answering_validators_is_returned(server):
+    pool = fp.ConnectionPool()
+    with pool.open(f"{server.base}/cached?status=304", timeout=5, headers={"If-None-Match": '"v1"'}) as resp:
+        assert resp.status == 304
+    pool.close()
+
+def test_redirect_is_followed(server):
+    rec, _ = fp.fetch_attempt(f"{server.base}/moved?status=302&location=/target", timeout_sec=5)
+    assert rec["error"] is None and rec["status_code"] == 200 and rec["word_count"] == 3
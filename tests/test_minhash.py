@@ -0,0 +1,82 @@
+"""
+MinHash + LSH similarity in the problem3 analyzer (SIMILARITY_MODE=minhash):
+estimates against exact Jaccard, and LSH recall above the threshold with the
+default bins and bands.
+"""
+
+import math
+import os
+import random
+import sys
+from itertools import combinations
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "analyzer"))
+import analyze as an  # noqa: E402
+
+BINS = 128
+BANDS = 32
+# Four standard deviations of a 128-bin estimate at its worst case, J = 0.5
+EPSILON = 4 * math.sqrt(0.25 / BINS)
+# With 32 bands of 4 rows a pair at J = 0.7 is missed with probability (1 - 0.7**4)**32 < 2e-4
+RECALL_THRESHOLD = 0.7
+
+@pytest.fixture(scope="module")
+def state() -> an.CorpusStats:
+    # Random documents plus edits of earlier ones (2-60% of tokens replaced), so Jaccard spans 0..1
+    rnd = random.Random(1)
+    vocab = [f"w{i}" for i in range(5000)]
+    docs = []
+    for i in range(300):
+        if docs and i % 2 == 0:
+            toks = list(rnd.choice(docs))
+            for k in rnd.sample(range(len(toks)), int(len(toks) * rnd.uniform(0.02, 0.6))):
+                toks[k] = rnd.choice(vocab)
+        else:
+            toks = rnd.choices(vocab, k=150)
+        docs.append(toks)
+    st = an.CorpusStats()
+    for i, toks in enumerate(docs):
+        st.add(f"page_{i}.json", toks, 10)
+    return st
+
+def exact_pairs(state: an.CorpusStats) -> dict:
+    return {(p["doc1"], p["doc2"]): p["similarity"]
+            for p in state.similarity(mode="exact", top_k=0, min_sim=1e-9)}
+
+def test_estimates_within_epsilon_of_exact_jaccard(state):
+    names = sorted(state.docs)
+    hashes = [an.mix64(i) for i in range(len(state.vocab))]
+    sets = [frozenset(state.docs[n]["ids"]) for n in names]
+    sigs = [an.minhash([hashes[i] for i in s], BINS) for s in sets]
+    errors = []
+    for i, j in combinations(range(len(names)), 2):
+        errors.append(abs(an.minhash_estimate(sigs[i], sigs[j]) - an.jaccard(sets[i], sets[j])))
+    assert max(errors) <= EPSILON
+    assert sum(errors) / len(errors) <= 0.02
+
+def test_reported_estimates_match_exact_jaccard(state):
+    truth = exact_pairs(state)
+    est = state.similarity(mode="minhash", top_k=0, min_sim=0, bins=BINS, bands=BANDS, exact=False)
+    assert est
+    assert max(abs(p["similarity"] - truth.get((p["doc1"], p["doc2"]), 0.0)) for p in est) <= EPSILON
+
+def test_lsh_finds_every_pair_above_threshold(state):
+    truth = exact_pairs(state)
+    wanted = {k for k, sim in truth.items() if sim >= RECALL_THRESHOLD}
+    assert len(wanted) >= 20, "fixture has too few similar pairs to test recall"
+    found = state.similarity(mode="minhash", top_k=0, min_sim=RECALL_THRESHOLD, bins=BINS, bands=BANDS, exact=True)
+    assert {(p["doc1"], p["doc2"]) for p in found} == wanted
+    # Candidates scored exactly report the exact value
+    assert all(p["similarity"] == truth[(p["doc1"], p["doc2"])] for p in found)
+
+def test_identical_and_disjoint_sets():
+    hashes = [an.mix64(i) for i in range(200)]
+    a = an.minhash(hashes[:100], BINS)
+    assert an.minhash_estimate(a, an.minhash(hashes[:100], BINS)) == 1.0
+    assert an.minhash_estimate(a, an.minhash(hashes[100:], BINS)) == 0.0
+    # Fewer elements than bins: empty bins are filled in and still compare correctly
+    small = an.minhash(hashes[:5], BINS)
+    assert an.minhash_estimate(small, an.minhash(hashes[:5], BINS)) == 1.0
+    assert an.minhash_estimate(small, an.minhash(hashes[150:155], BINS)) == 0.0
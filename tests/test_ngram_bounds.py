@@ -0,0 +1,98 @@
+"""
+Bounded n-gram tables in the problem3 analyzer (NGRAM_CAPACITY): checks the
+Space-Saving guarantees CorpusStats documents, after add() and after merge(),
+against exact counts of the same documents.
+"""
+
+import os
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "analyzer"))
+import analyze as an  # noqa: E402
+
+TOP_K = 50
+
+def synthetic_docs(n: int, tokens_per_doc: int, vocab_size: int = 3000, seed: int = 0) -> list[list[str]]:
+    rnd = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    return [rnd.choices(vocab, weights, k=tokens_per_doc) for _ in range(n)]
+
+def build(docs: list[list[str]], capacity: int, offset: int = 0) -> an.CorpusStats:
+    state = an.CorpusStats(capacity=capacity)
+    for i, toks in enumerate(docs, offset):
+        state.add(f"page_{i:06d}.json", toks, 10)
+    return state
+
+def exact_counts(docs: list[list[str]], n: int) -> Counter:
+    counts = Counter()
+    for toks in docs:
+        counts.update(an.ngrams(toks, n))
+    return counts
+
+def check_bounds(state: an.CorpusStats, exact: Counter, n: int) -> int:
+    table, floor = (state.bigrams, state.floor_b) if n == 2 else (state.trigrams, state.floor_t)
+    words = state.vocab_words
+    est = {" ".join(words[i] for i in an.unpack_ngram(g, n)): c for g, c in table.items()}
+    # Reported counts over-estimate by at most the floor
+    off = {g: (c, exact[g]) for g, c in est.items() if not 0 <= c - exact[g] <= floor}
+    assert not off, f"counts outside [true, true + {floor}]: {list(off.items())[:5]}"
+    # Every n-gram that occurs more often than the floor is still in the table
+    lost = [g for g, c in exact.items() if c > floor and g not in est]
+    assert not lost, f"n-grams above the floor {floor} were cut: {lost[:5]}"
+    # Top-k can only differ from the exact one among counts within the floor of the (k+1)-th
+    counts = sorted(exact.values(), reverse=True)
+    cutoff = counts[TOP_K] + floor if len(counts) > TOP_K else -1
+    top = {g for g, _ in state.top_terms(table, TOP_K, n)}
+    missed = [g for g, c in exact.items() if c > cutoff and g not in top]
+    assert not missed, f"exact top-{TOP_K} n-grams missing from the reported top-{TOP_K}: {missed[:5]}"
+    return floor
+
+@pytest.fixture(scope="module")
+def docs():
+    return synthetic_docs(300, 300)
+
+def test_unbounded_counts_are_exact(docs):
+    state = build(docs, capacity=0)
+    for n in (2, 3):
+        assert check_bounds(state, exact_counts(docs, n), n) == 0
+
+@pytest.mark.parametrize("capacity", [4000, 1000])
+def test_bounded_add(docs, capacity):
+    state = build(docs, capacity)
+    for n in (2, 3):
+        # The tables must actually have been cut, or the check proves nothing
+        assert check_bounds(state, exact_counts(docs, n), n) > 0
+
+@pytest.mark.parametrize("capacity", [4000, 1000])
+def test_bounded_merge(docs, capacity):
+    # Keys cut on only one side are where merge() can under-count
+    parts = [docs[:100], docs[100:220], docs[220:]]
+    state = build(parts[0], capacity)
+    offset = len(parts[0])
+    for part in parts[1:]:
+        state.merge(build(part, capacity, offset))
+        offset += len(part)
+    for n in (2, 3):
+        assert check_bounds(state, exact_counts(docs, n), n) > 0
+
+def test_ties_follow_name_order(docs):
+    # Unpadded names sort page_10 before page_2; adding and merging out of that order must
+    # still rank tied counts as a Counter over the documents in name order does
+    small = [toks[:40] for toks in docs[:60]]
+    names = [f"page_{i}.json" for i in range(len(small))]
+    halves = [an.CorpusStats(capacity=0), an.CorpusStats(capacity=0)]
+    for i in reversed(range(len(small))):
+        halves[i % 2].add(names[i], small[i], 1)
+    state = halves[1]
+    state.merge(halves[0])
+    order = sorted(range(len(small)), key=names.__getitem__)
+    for n, table in ((1, state.words), (2, state.bigrams), (3, state.trigrams)):
+        exact = Counter()
+        for i in order:
+            exact.update(an.ngrams(small[i], n) if n > 1 else small[i])
+        assert state.top_terms(table, TOP_K, n) == exact.most_common(TOP_K)
@@ -0,0 +1,107 @@
+"""
+The problem3 fetcher stage against the http.server stub in conftest.py: its
+HTTP handling (Pool, fetch_once) and its retries (Scheduler and the stage's
+main loop, run against /shared as bench_suite.py does).
+"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from urllib.error import HTTPError
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem3", "fetcher"))
+import fetch  # noqa: E402
+
+SHARED = "/shared"
+SHARED_DIRS = ("input", "raw", "processed", "queue", "status", "analysis")
+
+def test_same_host_urls_reuse_one_connection(server):
+    pool = fetch.Pool()
+    for i in range(5):
+        resp, body = pool.get(f"{server.base}/p3/reuse/{i}", timeout=5)
+        assert resp.status == 200 and body == b"ok ok ok"
+    assert pool.opened == 1 and pool.reused == 4
+    pool.close()
+
+def test_connection_closed_by_server_is_retried_once(server):
+    pool = fetch.Pool()
+    pool.get(f"{server.base}/p3/drop?close=1", timeout=5)
+    resp, body = pool.get(f"{server.base}/p3/after-drop", timeout=5)
+    assert resp.status == 200 and body == b"ok ok ok"
+    assert pool.opened == 2 and pool.reused == 1
+    pool.close()
+
+@pytest.mark.parametrize("status", [300, 304, 305])
+def test_unhandled_3xx_is_an_error(server, status):
+    with pytest.raises(HTTPError) as e:
+        fetch.fetch_once(f"{server.base}/p3/odd?status={status}", timeout=5)
+    assert e.value.code == status
+
+def test_304_answering_validators_is_returned(server):
+    pool = fetch.Pool()
+    resp, body = pool.get(f"{server.base}/p3/cached?status=304", timeout=5, headers={"If-Modified-Since": "x"})
+    assert resp.status == 304 and body == b""
+    pool.close()
+
+def test_retry_hints(server):
+    with pytest.raises(HTTPError) as e:
+        fetch.fetch_once(f"{server.base}/p3/hint-404?status=404", timeout=5)
+    assert fetch.retry_hint(e.value) is None
+    with pytest.raises(HTTPError) as e:
+        fetch.fetch_once(f"{server.base}/p3/hint-429?status=429&retry_after=2", timeout=5)
+    assert fetch.retry_hint(e.value) == (2.0, True)
+
+def test_scheduler_honors_retry_after_and_deadline():
+    sched = fetch.Scheduler(base=0.05, cap=0.2, budget=0.5, rng=random.Random(0))
+    now = time.monotonic()
+    # Retry-After beats the 0.2s backoff cap and holds back the whole host
+    assert sched.backoff("h", 1, (0.4, True)) >= 0.4 and sched.ready_at("h") >= now + 0.4
+    # A retry that could not start before the 0.5s budget runs out is dropped
+    assert sched.backoff("h", 1, (5.0, True)) is None
+    assert sched.backoff("h", 3, (0.0, False)) is None
+    assert sched.retries == 1 and sched.gave_up == 1
+
+def run_stage(server, urls: list[str], **env) -> tuple[dict, float]:
+    # Run the fetcher stage the way bench_suite.py does, against a cleared /shared
+    for d in SHARED_DIRS:
+        shutil.rmtree(os.path.join(SHARED, d), ignore_errors=True)
+    os.makedirs(os.path.join(SHARED, "input"))
+    with open(os.path.join(SHARED, "input", "urls.txt"), "w") as f:
+        f.write("".join(f"{server.base}{u}\n" for u in urls))
+    started = time.monotonic()
+    subprocess.run([sys.executable, fetch.__file__], check=True, capture_output=True, timeout=60,
+                   env={**os.environ, "FETCH_BACKOFF_BASE_MS": "50", "FETCH_BACKOFF_CAP_SEC": "0.2", **env})
+    with open(os.path.join(SHARED, "status", "fetch_complete.json")) as f:
+        return json.load(f), time.monotonic() - started
+
+def shared_writable() -> bool:
+    try:
+        os.makedirs(SHARED, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(SHARED, os.W_OK)
+
+needs_shared = pytest.mark.skipif(not shared_writable(), reason="the fetcher stage writes to /shared")
+
+@needs_shared
+def test_stage_retries(server):
+    status, elapsed = run_stage(server, ["/p3/stage/ok", "/p3/stage/flaky?fail=1", "/p3/stage/gone?status=404",
+                                         "/p3/stage/slow?fail=1&status=429&retry_after=1"])
+    assert [r["attempts"] for r in status["results"]] == [1, 2, 1, 2]
+    assert [r["status"] for r in status["results"]] == ["success", "success", "failed", "success"]
+    assert status["retries"] == 2 and status["retries_abandoned_at_deadline"] == 0
+    assert server.hits["/p3/stage/gone?status=404"] == 1
+    assert elapsed >= 1.0
+
+@needs_shared
+def test_stage_deadline(server):
+    status, elapsed = run_stage(server, ["/p3/stage/late?fail=1&status=503&retry_after=5"], FETCH_DEADLINE_SEC="0.5")
+    assert [(r["status"], r["attempts"]) for r in status["results"]] == [("failed", 1)]
+    assert status["retries"] == 0 and status["retries_abandoned_at_deadline"] == 1
+    assert elapsed < 5
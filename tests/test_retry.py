@@ -0,0 +1,71 @@
+"""
+Retries in the problem1 fetcher (RetryScheduler, fetch_one, iter_fetch)
+against the http.server stub in conftest.py: attempt counts, Retry-After,
+no retry of permanent failures, and the FETCH_DEADLINE_SEC budget.
+"""
+
+import os
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "problem1"))
+import fetch_and_process as fp  # noqa: E402
+
+def scheduler(**kw) -> fp.RetryScheduler:
+    # Short backoff so tests stay fast; a seeded rng keeps the jitter reproducible
+    return fp.RetryScheduler(**{"max_attempts": 3, "base_sec": 0.05, "cap_sec": 0.2, "rng": random.Random(0), **kw})
+
+def test_transient_failures_are_retried(server):
+    sched = scheduler()
+    rec = fp.fetch_one(f"{server.base}/transient?fail=2", timeout_sec=5, scheduler=sched)
+    assert rec["error"] is None and rec["status_code"] == 200 and rec["word_count"] == 3
+    assert rec["attempts"] == 3 and sched.retries == 2
+    assert server.hits["/transient?fail=2"] == 3
+
+def test_attempts_stop_at_max_attempts(server):
+    sched = scheduler()
+    rec = fp.fetch_one(f"{server.base}/down?fail=10&status=500", timeout_sec=5, scheduler=sched)
+    assert "500" in rec["error"]
+    assert rec["attempts"] == 3 and sched.retries == 2
+    assert server.hits["/down?fail=10&status=500"] == 3
+
+def test_permanent_failure_is_not_retried(server):
+    sched = scheduler()
+    rec = fp.fetch_one(f"{server.base}/missing?status=404", timeout_sec=5, scheduler=sched)
+    assert "404" in rec["error"]
+    assert rec["attempts"] == 1 and sched.retries == 0
+    assert server.hits["/missing?status=404"] == 1
+
+def test_retry_after_is_honored(server):
+    sched = scheduler()
+    started = time.monotonic()
+    rec = fp.fetch_one(f"{server.base}/throttled?fail=1&status=429&retry_after=1", timeout_sec=5, scheduler=sched)
+    assert rec["error"] is None and rec["attempts"] == 2
+    # Backoff alone is capped at 0.2s, so only the header explains a wait this long
+    assert time.monotonic() - started >= 1.0
+    # 429 holds back the whole host, not just the URL that got it
+    assert sched.ready_at(urlsplit(server.base).netloc) >= started + 1.0
+
+def test_deadline_drops_retries_that_cannot_start_in_time(server):
+    sched = scheduler(budget_sec=0.5)
+    started = time.monotonic()
+    rec = fp.fetch_one(f"{server.base}/late?fail=1&status=503&retry_after=5", timeout_sec=5, scheduler=sched)
+    assert "503" in rec["error"]
+    assert rec["attempts"] == 1 and sched.retries == 0 and sched.gave_up == 1
+    assert time.monotonic() - started < 1.0
+
+def test_iter_fetch_retries_each_url_independently(server):
+    sched = scheduler()
+    urls = [f"{server.base}/batch/{i}" for i in range(4)]
+    urls += [f"{server.base}/batch/flaky?fail=1", f"{server.base}/batch/gone?status=404",
+             f"{server.base}/batch/slow?fail=1&status=429&retry_after=1"]
+    started = time.monotonic()
+    recs = dict(fp.iter_fetch(urls, timeout_sec=5, max_workers=4, per_host=2, scheduler=sched))
+    assert sorted(recs) == list(range(len(urls)))
+    assert [recs[i]["attempts"] for i in range(len(urls))] == [1, 1, 1, 1, 2, 1, 2]
+    assert [recs[i]["status_code"] for i in range(4)] == [200] * 4
+    assert recs[4]["error"] is None and recs[6]["error"] is None and "404" in recs[5]["error"]
+    assert sched.retries == 2 and sched.gave_up == 0
+    assert time.monotonic() - started >= 1.0